@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from database import email_exists, get_emails_after
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Вероятностное множество строк: `in` может ошибочно вернуть True,
+    но никогда не вернет False для добавленного значения.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class EmailLookup:
+    """
+    Быстрая проверка занятости почты для формы регистрации.
+
+    Фильтр Блума с почтами всех пользователей отвечает "свободна" без запроса
+    к базе. Фильтр загружается при старте и пополняется новыми пользователями
+    (по возрастанию ID) не реже раза в refresh_interval секунд, поэтому видит
+    регистрации из других процессов с этой задержкой. Остальные ответы проверяются
+    запросом EXISTS и кешируются на cache_ttl секунд.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, cache_ttl: float, refresh_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache_ttl = cache_ttl
+        self.refresh_interval = refresh_interval
+        self._bloom: Optional[BloomFilter] = None
+        self._last_user_id = 0
+        self._refreshed_at = 0.0
+        self._cache: Dict[str, Tuple[float, bool]] = {}
+
+    async def warm(self, session_maker: async_sessionmaker) -> None:
+        """
+        Загружает в фильтр почты всех зарегистрированных пользователей.
+        """
+        async with session_maker() as session:
+            self._last_user_id, emails = await get_emails_after(0, session)
+        bloom = BloomFilter(max(self.capacity, 2 * len(emails)), self.error_rate)
+        for email in emails:
+            bloom.add(email)
+        self._bloom = bloom
+        self._refreshed_at = time.monotonic()
+        logger.info(f"Email filter loaded with {len(emails)} addresses")
+
+    async def _refresh(self, session: AsyncSession) -> None:
+        self._refreshed_at = time.monotonic()
+        self._last_user_id, emails = await get_emails_after(self._last_user_id, session)
+        for email in emails:
+            self.add(email)
+
+    def add(self, email: str) -> None:
+        """
+        Отмечает почту как занятую; вызывается после регистрации.
+        """
+        email = email.lower()
+        if self._bloom is not None:
+            self._bloom.add(email)
+        self._cache[email] = (time.monotonic() + self.cache_ttl, True)
+
+    async def is_registered(self, email: str, session: AsyncSession) -> bool:
+        email = email.lower()
+        now = time.monotonic()
+        if self._bloom is not None:
+            if now - self._refreshed_at >= self.refresh_interval:
+                await self._refresh(session)
+            if email not in self._bloom:
+                return False
+
+        cached = self._cache.get(email)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        exists = await email_exists(email, session)
+        if len(self._cache) >= self.capacity:
+            self._cache = {key: value for key, value in self._cache.items() if value[0] > now}
+        self._cache[email] = (now + self.cache_ttl, exists)
+        return exists
+
+
+class IPRateLimiter:
+    """
+    Ограничение частоты запросов по IP: отдельный token bucket на каждый адрес.
+    Хранит не больше max_clients адресов, самые старые вытесняются.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def allow(self, client_ip: str) -> bool:
+        bucket = self._buckets.pop(client_ip, None)
+        if bucket is None:
+            bucket = TokenBucket(rate=self.rate, capacity=self.burst)
+            while len(self._buckets) >= self.max_clients:
+                del self._buckets[next(iter(self._buckets))]
+        # Повторная вставка держит недавно активные адреса в конце словаря
+        self._buckets[client_ip] = bucket
+        return bucket.try_acquire()
+
+
+email_lookup = EmailLookup(
+    capacity=settings.EMAIL_FILTER_CAPACITY,
+    error_rate=settings.EMAIL_FILTER_ERROR_RATE,
+    cache_ttl=settings.CHECK_EMAIL_CACHE_TTL,
+    refresh_interval=settings.EMAIL_FILTER_REFRESH_INTERVAL,
+)
+check_email_limiter = IPRateLimiter(
+    rate=settings.CHECK_EMAIL_RATE,
+    burst=settings.CHECK_EMAIL_BURST,
+)
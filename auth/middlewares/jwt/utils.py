@@ -2,6 +2,7 @@ import uuid
 import jwt
 
 from auth.middlewares.jwt.base.auth import JWTAuth
+from db_routing import replica_read
 from models import IssuedJWTToken
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,6 +12,7 @@ def generate_device_id() -> str:
     return str(uuid.uuid4())
 
 
+@replica_read
 async def check_revoked(jti: str, session) -> bool:
     """Check if a token has been revoked"""
     query = select(IssuedJWTToken).filter_by(jti=jti, revoked=True)
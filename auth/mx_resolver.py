@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import dns.asyncresolver
+import dns.resolver
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MXResolver:
+    """
+    Асинхронная проверка MX-записей домена с кешем.
+
+    Положительный ответ кешируется на TTL записи (но не дольше positive_ttl),
+    отсутствие домена или MX-записей - на negative_ttl. Одновременные запросы
+    одного домена ждут один общий DNS-запрос, а общее число запросов в полете
+    ограничено max_concurrency. Ошибки сети (таймаут, недоступные серверы)
+    не кешируются.
+    """
+
+    def __init__(
+        self,
+        nameservers: Optional[List[str]] = None,
+        port: int = 53,
+        timeout: float = 5,
+        positive_ttl: int = 3600,
+        negative_ttl: int = 300,
+        max_concurrency: int = 10,
+        max_entries: int = 10000,
+    ):
+        self.nameservers = nameservers or []
+        self.port = port
+        self.timeout = timeout
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._resolver: Optional[dns.asyncresolver.Resolver] = None
+        self._cache: Dict[str, Tuple[float, bool]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+
+    def _get_resolver(self) -> dns.asyncresolver.Resolver:
+        # Создается при первом запросе: системная конфигурация читается только если нужна
+        if self._resolver is None:
+            resolver = dns.asyncresolver.Resolver(configure=not self.nameservers)
+            if self.nameservers:
+                resolver.nameservers = self.nameservers
+            resolver.port = self.port
+            resolver.lifetime = self.timeout
+            self._resolver = resolver
+        return self._resolver
+
+    def _cached(self, domain: str) -> Optional[bool]:
+        entry = self._cache.get(domain)
+        if entry is None:
+            return None
+        expires_at, has_mx = entry
+        if expires_at <= time.monotonic():
+            del self._cache[domain]
+            return None
+        return has_mx
+
+    def _store(self, domain: str, has_mx: bool, ttl: float) -> None:
+        if len(self._cache) >= self.max_entries:
+            now = time.monotonic()
+            self._cache = {key: value for key, value in self._cache.items() if value[0] > now}
+            while len(self._cache) >= self.max_entries:
+                del self._cache[next(iter(self._cache))]
+        self._cache[domain] = (time.monotonic() + ttl, has_mx)
+
+    async def _lookup(self, domain: str) -> bool:
+        async with self._slots:
+            try:
+                answer = await self._get_resolver().resolve(domain, 'MX')
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                self._store(domain, False, self.negative_ttl)
+                return False
+        has_mx = len(answer) > 0
+        ttl = min(self.positive_ttl, answer.rrset.ttl) if has_mx else self.negative_ttl
+        self._store(domain, has_mx, ttl)
+        return has_mx
+
+    async def has_mx(self, domain: str) -> bool:
+        """
+        Проверяет, что у домена есть MX-записи.
+
+        :raises dns.exception.DNSException: Если DNS-сервер не ответил.
+        """
+        domain = domain.lower().rstrip('.')
+        cached = self._cached(domain)
+        if cached is not None:
+            return cached
+
+        future = self._in_flight.get(domain)
+        if future is None:
+            future = asyncio.ensure_future(self._lookup(domain))
+            self._in_flight[domain] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(domain, None))
+        # shield: отмена одного ожидающего запроса не отменяет общий запрос для остальных
+        return await asyncio.shield(future)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def create_mx_resolver() -> MXResolver:
+    """
+    Создает резолвер по настройкам. MX_NAMESERVERS позволяет направить запросы
+    на локальный DNS-сервер, например в тестах.
+    """
+    return MXResolver(
+        nameservers=settings.MX_NAMESERVERS,
+        port=settings.MX_RESOLVER_PORT,
+        timeout=settings.MX_RESOLVER_TIMEOUT,
+        positive_ttl=settings.MX_CACHE_TTL,
+        negative_ttl=settings.MX_NEGATIVE_CACHE_TTL,
+        max_concurrency=settings.MX_RESOLVER_CONCURRENCY,
+    )
+
+
+mx_resolver = create_mx_resolver()
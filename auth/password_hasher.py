@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+import bcrypt
+
+from config import settings
+
+T = TypeVar("T")
+
+SUPPORTED_ALGORITHMS = ("bcrypt", "scrypt")
+
+
+class PasswordHasher:
+    """
+    Хеширование паролей в отдельном ограниченном пуле потоков.
+
+    bcrypt и scrypt отпускают GIL, поэтому работа в пуле не блокирует event loop,
+    а max_workers ограничивает число одновременно занятых ядер. Запросы сверх
+    этого ждут в очереди пула; глубина очереди и время ожидания/хеширования
+    доступны через stats().
+
+    Поддерживаются хеши bcrypt ($2b$...), scrypt ($scrypt$...) и старые
+    sha256 hex-хеши, которые проверяются, но не создаются: needs_rehash()
+    сообщает, что такой хеш (или хеш с другим алгоритмом/стоимостью) пора обновить.
+    """
+
+    def __init__(self, algorithm: str = "bcrypt", cost: int = 12, max_workers: int = 4):
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.cost = cost
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+        self._queued = 0
+        self._dummy_hash = None
+        self._metrics: Dict[str, float] = {
+            "operations": 0,
+            "wait_seconds_total": 0.0,
+            "hash_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+            "legacy_verifications": 0,
+        }
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        submitted = time.perf_counter()
+        self._queued += 1
+        started = submitted
+
+        def call():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            finished = time.perf_counter()
+            self._queued -= 1
+            self._metrics["operations"] += 1
+            self._metrics["wait_seconds_total"] += started - submitted
+            self._metrics["hash_seconds_total"] += finished - started
+            self._metrics["hash_seconds_max"] = max(self._metrics["hash_seconds_max"], finished - started)
+
+    def _hash_sync(self, password: str) -> str:
+        if self.algorithm == "bcrypt":
+            return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.cost)).decode()
+        salt = os.urandom(16)
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=2 ** self.cost, r=8, p=1, maxmem=2 ** (self.cost + 11))
+        return "$scrypt${}${}${}".format(
+            self.cost,
+            base64.b64encode(salt).decode(),
+            base64.b64encode(digest).decode(),
+        )
+
+    @staticmethod
+    def _verify_sync(password: str, hashed: str) -> bool:
+        if hashed.startswith("$2"):
+            # bcrypt паникует (PanicException, а не ValueError) на обрезанном хеше
+            if len(hashed) != 60:
+                raise ValueError("Invalid bcrypt hash")
+            return bcrypt.checkpw(password.encode(), hashed.encode())
+        _, _, cost, salt, digest = hashed.split("$")
+        cost = int(cost)
+        expected = base64.b64decode(digest)
+        actual = hashlib.scrypt(
+            password.encode(), salt=base64.b64decode(salt), n=2 ** cost, r=8, p=1, maxmem=2 ** (cost + 11),
+        )
+        return hmac.compare_digest(actual, expected)
+
+    @staticmethod
+    def is_legacy(hashed: str) -> bool:
+        return not hashed.startswith("$")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """
+        Проверяет пароль. Старые sha256-хеши дешевые и проверяются без пула.
+        """
+        if not hashed:
+            return False
+        if self.is_legacy(hashed):
+            self._metrics["legacy_verifications"] += 1
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, hashed)
+        try:
+            return await self._run(self._verify_sync, password, hashed)
+        except ValueError:
+            # Поврежденный хеш
+            return False
+
+    async def dummy_hash(self) -> str:
+        """
+        Хеш случайного пароля с текущими алгоритмом и стоимостью. Проверка
+        пароля против него занимает столько же, сколько против настоящего хеша:
+        вход с незарегистрированной почтой не отличается по времени ответа.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def needs_rehash(self, hashed: str) -> bool:
+        if self.is_legacy(hashed):
+            return True
+        if self.algorithm == "bcrypt":
+            return not hashed.startswith("$2") or hashed.split("$")[2] != f"{self.cost:02d}"
+        return not hashed.startswith("$scrypt$") or hashed.split("$")[2] != str(self.cost)
+
+    def stats(self) -> dict:
+        operations = self._metrics["operations"]
+        return {
+            "algorithm": self.algorithm,
+            "cost": self.cost,
+            "max_workers": self.max_workers,
+            "queue_depth": max(0, self._queued - self.max_workers),
+            "in_flight": self._queued,
+            "operations": operations,
+            "avg_wait_seconds": self._metrics["wait_seconds_total"] / operations if operations else 0.0,
+            "avg_hash_seconds": self._metrics["hash_seconds_total"] / operations if operations else 0.0,
+            "max_hash_seconds": self._metrics["hash_seconds_max"],
+            "legacy_verifications": self._metrics["legacy_verifications"],
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    algorithm=settings.PASSWORD_HASH_ALGORITHM,
+    cost=settings.PASSWORD_HASH_COST,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+)
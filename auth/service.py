@@ -6,15 +6,14 @@ from auth.middlewares.jwt.utils import check_revoked, generate_device_id, try_de
 from auth.errors import AuthError
 from models import IssuedJWTToken
 from auth.dto import TokensDTO, UserCredentialsDTO
-from hashlib import sha256
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import create_user, is_email_registered, create_jwt_tokens
+from database import create_user, email_exists, get_user_credentials, create_jwt_tokens, change_password
+from router_notification import queue_email_after_register
+from auth.email_lookup import email_lookup
+from auth.password_hasher import password_hasher
 from sqlalchemy import update
 
 
-def get_sha256_hash(line: str) -> str:
-    return sha256(str.encode(line)).hexdigest()
-
 from pydantic import BaseModel
 
 class ErrorObj(BaseModel):
@@ -28,22 +27,27 @@ class AuthService:
 
     async def register(self, body: UserCredentialsDTO, username: str, session: AsyncSession) -> tuple[TokensDTO, None] | tuple[None, ErrorObj]:
         print("Starting registration...")
-        if await is_email_registered(email=body.email, session=session):
+        if await email_exists(email=body.email, session=session):
             return None, AuthError.get_email_occupied_error()
 
         user_dict = {
             "email": body.email,
             "username": username,
-            "password": get_sha256_hash(body.password)
+            "password": await password_hasher.hash(body.password)
         }
 
-        await create_user(**user_dict, session=session)
-        user = await is_email_registered(email=body.email, session=session)
-        print(f"User created: {user}")
+        # Письмо попадает в outbox и коммитится вместе с пользователем
+        subject = "Successfully registered"
+        message = "Hey %s, you have successfully registered in the MindSpace." % (username)
+        await queue_email_after_register(body.email, subject, message, session)
+
+        user_id = await create_user(**user_dict, session=session)
+        email_lookup.add(body.email)
+        print(f"User created: {user_id}")
 
-        print(f"About to create tokens for user {user.id}")
+        print(f"About to create tokens for user {user_id}")
         access_token, refresh_token = await self._issue_tokens_for_user(
-            user=user, 
+            user_id=user_id,
             device_id=generate_device_id(),
             session=session
         )
@@ -52,12 +56,21 @@ class AuthService:
 
     async def login(self, body: UserCredentialsDTO, session: AsyncSession) -> tuple[TokensDTO, None] | tuple[None, ErrorObj]:
         print("Starting login...")
-        user = await is_email_registered(email=body.email, session=session)
-        if not user or user.password != get_sha256_hash(body.password):
+        credentials = await get_user_credentials(email=body.email, session=session)
+        if not credentials:
+            # Та же проверка пароля, что и для существующего пользователя: иначе
+            # по времени ответа видно, зарегистрирована ли почта
+            await password_hasher.verify(body.password, await password_hasher.dummy_hash())
             return None, AuthError.get_invalid_credentials_error()
+        if not await password_hasher.verify(body.password, credentials.password):
+            return None, AuthError.get_invalid_credentials_error()
+
+        # Старые sha256-хеши и хеши с устаревшей стоимостью заменяются при входе
+        if password_hasher.needs_rehash(credentials.password):
+            await change_password(credentials.id, await password_hasher.hash(body.password), session=session)
 
-        print(f"User found: {user}")
-        access_token, refresh_token = await self._issue_tokens_for_user(user=user, session=session, device_id=generate_device_id())
+        print(f"User found: {credentials.id}")
+        access_token, refresh_token = await self._issue_tokens_for_user(user_id=credentials.id, session=session, device_id=generate_device_id())
 
         return TokensDTO(access_token=access_token, refresh_token=refresh_token), None
 
@@ -91,29 +104,29 @@ class AuthService:
         device_id = payload['device_id']
         await IssuedJWTToken.filter(subject=user, device_id=device_id).update(revoked=True)
 
-        access_token, refresh_token = await self._issue_tokens_for_user(user, device_id, session)
+        access_token, refresh_token = await self._issue_tokens_for_user(user.id, device_id, session)
 
         return TokensDTO(access_token=access_token, refresh_token=refresh_token), None
 
-    async def _issue_tokens_for_user(self, user: User, device_id: str, session: AsyncSession) -> tuple[str, str]:
+    async def _issue_tokens_for_user(self, user_id: int, device_id: str, session: AsyncSession) -> tuple[str, str]:
         try:
             import sys
             print('started creating tokens')
             sys.stdout.flush()
             
             # Добавим проверку параметров
-            print(f"User: {user}, ID: {user.id}, Device ID: {device_id}")
+            print(f"User ID: {user_id}, Device ID: {device_id}")
             sys.stdout.flush()
             
             try:
-                access_token = self._jwt_auth.generate_access_token(subject=str(user.id), payload={'device_id': device_id})
+                access_token = self._jwt_auth.generate_access_token(subject=str(user_id), payload={'device_id': device_id})
                 print("Access token generated")
             except Exception as e:
                 print(f"Error generating access token: {str(e)}")
                 raise
                 
             try:
-                refresh_token = self._jwt_auth.generate_refresh_token(subject=str(user.id), payload={'device_id': device_id})
+                refresh_token = self._jwt_auth.generate_refresh_token(subject=str(user_id), payload={'device_id': device_id})
                 print("Refresh token generated")
             except Exception as e:
                 print(f"Error generating refresh token: {str(e)}")
@@ -127,7 +140,7 @@ class AuthService:
                 raise
             
             try:
-                await create_jwt_tokens(raw_tokens, user, device_id, session)
+                await create_jwt_tokens(raw_tokens, user_id, device_id, session)
                 print("Tokens saved to database")
             except Exception as e:
                 print(f"Error saving tokens to database: {str(e)}")
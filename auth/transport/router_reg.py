@@ -14,14 +14,15 @@ from auth.middlewares.jwt.base.auth import JWTAuth
 from auth.transport.responses import TokensOut
 from auth.errors import AuthErrorTypes
 from auth.jwt_settings import jwt_config
-from router_notification import send_email_after_register
 
 from pydantic import BaseModel
 
 from fastapi.responses import HTMLResponse
 
 from email_validator import validate_email, EmailNotValidError
-import dns.resolver
+import dns.exception
+from auth.mx_resolver import mx_resolver
+from auth.email_lookup import check_email_limiter, email_lookup
 import asyncio
 import logging
 
@@ -50,21 +51,21 @@ router = APIRouter(
 )
 
 async def is_valid_email_domain(email: str) -> bool:
-    """Check if email domain exists and can accept emails."""
+    """
+    Check if email domain exists and can accept emails.
+
+    Only a definite answer (NXDOMAIN or no MX records) rejects the address. DNS
+    failures (timeout, SERVFAIL, unreachable servers) say nothing about the
+    domain, so the address is accepted and registration keeps working during
+    a resolver outage.
+    """
+    domain = email.rpartition('@')[2]
     try:
-        # Get domain from email
-        domain = email.split('@')[1]
-        
-        # Try to get MX records for the domain
-        try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
-            return len(mx_records) > 0
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error checking email domain: {str(e)}")
-        return False
+        # MX records are cached per domain, lookups do not block the event loop
+        return await mx_resolver.has_mx(domain)
+    except dns.exception.DNSException as e:
+        logger.warning(f"MX lookup for {domain} failed, accepting address: {e!r}")
+        return True
 
 async def validate_email_address(email: str) -> tuple[bool, str]:
     """
@@ -122,7 +123,18 @@ async def registration(
                 }
             )
 
-        
+        is_valid, email_error = await validate_email_address(email)
+        if not is_valid:
+            logger.warning(f"Invalid email during registration: {email}")
+            return templates.TemplateResponse(
+                "reg.html",
+                {
+                    "request": request,
+                    "email_error": email_error,
+                    "email": email,
+                    "username": username
+                }
+            )
 
         user_credentials = UserCredentialsDTO(
             email=email,
@@ -152,10 +164,6 @@ async def registration(
                 }
             )
         
-        subject = "Successfully registered"
-        message = "Hey %s, you have successfully registered in the MindSpace." % (username)
-        
-
         logger.info(f"Successfully registered user with email: {email}")
         return RedirectResponse(
             url="/users/login",
@@ -234,9 +242,12 @@ async def login(
 
 
 @router.get("/check_email/{email}")
-async def check_email(email: str, session: AsyncSession = Depends(get_session)):
-    user = await is_email_registered(email, session)
-    return {"exists": user is not None}
+async def check_email(email: str, request: Request, session: AsyncSession = Depends(get_session)):
+    # За обратным прокси это адрес клиента только при настроенном FORWARDED_ALLOW_IPS
+    client_ip = request.client.host if request.client else "unknown"
+    if not check_email_limiter.allow(client_ip):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests")
+    return {"exists": await email_lookup.is_registered(email, session)}
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
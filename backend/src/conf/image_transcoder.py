@@ -0,0 +1,399 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+from PIL import Image, ImageSequence
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+try:
+    # Кодек AVIF для Pillow (пакет pillow-avif-plugin) необязателен
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pillow_avif = None
+
+
+@dataclass(frozen=True)
+class EncodingPreset:
+    """
+    Параметры кодирования для одного назначения изображений (аватары, вложения досок).
+    method - усилие WebP от 0 (быстро) до 6 (меньше файл), avif_speed - от 0
+    (медленно, меньше файл) до 10.
+    """
+    quality: int = 80
+    method: int = 4
+    avif: bool = False
+    avif_quality: int = 60
+    avif_speed: int = 6
+
+
+def avif_supported() -> bool:
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+class ImageRejected(Exception):
+    """Изображение превышает лимиты по числу пикселей или кадров."""
+
+
+def limit_worker_memory(max_bytes: int) -> None:
+    """
+    Инициализатор процесса пула: ограничивает адресное пространство процесса.
+    Задача, которой не хватило памяти, завершается MemoryError, а не занимает
+    память сервера.
+    """
+    if resource is not None and max_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _fit(size: Tuple[int, int], max_dimension: int) -> Tuple[int, int]:
+    width, height = size
+    scale = max_dimension / max(width, height)
+    if scale >= 1:
+        return size
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _open_image(file_content: bytes, max_pixels: int, max_frames: int, max_dimension: int) -> Image.Image:
+    """
+    Открывает изображение и проверяет лимиты по заголовку, до декодирования.
+
+    JPEG больше max_dimension декодируется сразу в уменьшенном масштабе
+    (draft: 1/2, 1/4 или 1/8, но не меньше нужного размера). Лимит max_pixels
+    действует на декодируемые пиксели всех кадров, поэтому память на
+    декодирование не превышает max_pixels * 4 байта.
+    """
+    image = Image.open(io.BytesIO(file_content))
+    frames = getattr(image, "n_frames", 1)
+    if frames > max_frames:
+        raise ImageRejected(f"Image has {frames} frames, the limit is {max_frames}")
+    if image.format == "JPEG":
+        image.draft(None, _fit(image.size, max_dimension))
+    pixels = image.width * image.height * frames
+    if pixels > max_pixels:
+        raise ImageRejected(f"Image has {pixels} pixels, the limit is {max_pixels}")
+    return image
+
+
+def _encode_webp(image: Image.Image, preset: EncodingPreset = EncodingPreset()) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=preset.quality, method=preset.method)
+    return output.getvalue()
+
+
+def _encode_avif(image: Image.Image, preset: EncodingPreset) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format="AVIF", quality=preset.avif_quality, speed=preset.avif_speed)
+    return output.getvalue()
+
+
+def _resized(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    if image.size == size:
+        return image
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def _encode_animation(
+    image: Image.Image, max_dimension: int, preset: EncodingPreset
+) -> Tuple[bytes, Image.Image]:
+    """
+    Кодирует все кадры анимации в анимированный WebP. Возвращает его и
+    первый кадр, из которого строятся статичные уменьшенные копии.
+    """
+    size = _fit(image.size, max_dimension)
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        resized = _resized(frame, size)
+        # Итератор переиспользует объект кадра, поэтому он копируется
+        frames.append(resized.copy() if resized is frame else resized)
+        durations.append(frame.info.get("duration", 100))
+    output = io.BytesIO()
+    frames[0].save(
+        output,
+        format="WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get("loop", 0),
+        quality=preset.quality,
+        method=preset.method,
+    )
+    return output.getvalue(), frames[0]
+
+
+def transcode_to_webp(
+    file_content: bytes,
+    max_pixels: int = settings.IMAGE_MAX_PIXELS,
+    max_frames: int = settings.IMAGE_MAX_FRAMES,
+    max_dimension: int = settings.IMAGE_MAX_DIMENSION,
+    preset: EncodingPreset = EncodingPreset(),
+) -> bytes:
+    """
+    Декодирует изображение и кодирует его в WebP. Выполняется в процессе пула.
+    """
+    preset = replace(preset, avif=False)
+    return transcode_to_webp_variants(file_content, (), max_pixels, max_frames, max_dimension, preset)[0]
+
+
+def transcode_to_webp_variants(
+    file_content: bytes,
+    widths: Sequence[int],
+    max_pixels: int = settings.IMAGE_MAX_PIXELS,
+    max_frames: int = settings.IMAGE_MAX_FRAMES,
+    max_dimension: int = settings.IMAGE_MAX_DIMENSION,
+    preset: EncodingPreset = EncodingPreset(),
+) -> Tuple[bytes, int, Dict[int, bytes], Dict[int, bytes]]:
+    """
+    Кодирует изображение в WebP и строит уменьшенные копии заданных ширин
+    за одно декодирование: каждая копия получается из предыдущей, большей.
+    Оригинал уменьшается до max_dimension по большей стороне; анимация
+    остается анимацией, а копии строятся по ее первому кадру. С preset.avif
+    статичное изображение и его копии дополнительно кодируются в AVIF.
+    Возвращает оригинал, его ширину, копии по ширине и AVIF по ширине
+    (включая ширину оригинала); ширины не меньше оригинала пропускаются.
+    Выполняется в процессе пула.
+
+    :raises ImageRejected: Если изображение превышает лимиты.
+    """
+    image = _open_image(file_content, max_pixels, max_frames, max_dimension)
+    animated = getattr(image, "is_animated", False)
+    if animated:
+        original, current = _encode_animation(image, max_dimension, preset)
+    else:
+        image.load()
+        current = _resized(image, _fit(image.size, max_dimension))
+        original = _encode_webp(current, preset)
+    width, height = current.size
+
+    with_avif = preset.avif and not animated
+    avif: Dict[int, bytes] = {width: _encode_avif(current, preset)} if with_avif else {}
+    variants: Dict[int, bytes] = {}
+    for variant_width in sorted(set(widths), reverse=True):
+        if variant_width <= 0 or variant_width >= width:
+            continue
+        variant_height = max(1, round(height * variant_width / width))
+        current = current.resize((variant_width, variant_height), Image.Resampling.LANCZOS)
+        variants[variant_width] = _encode_webp(current, preset)
+        if with_avif:
+            avif[variant_width] = _encode_avif(current, preset)
+    return original, width, variants, avif
+
+
+class TranscoderBusy(Exception):
+    """Очередь транскодирования заполнена."""
+
+
+class TranscodeTimeout(Exception):
+    """Задача транскодирования не уложилась в таймаут."""
+
+
+class ImageTranscoder:
+    """
+    Транскодирование изображений в ограниченном пуле процессов.
+
+    Декодирование и кодирование Pillow занимают ядро на сотни миллисекунд,
+    поэтому выполняются в отдельных процессах: event loop не блокируется, а
+    одновременные загрузки распределяются по max_workers ядрам. Байты файла
+    передаются в процесс и обратно через pickle.
+
+    Одновременно в пуле не больше max_workers задач, еще queue_size ждут
+    своей очереди; сверх этого run() сразу отказывает (TranscoderBusy).
+    Задача, выполняющаяся дольше timeout, прерывается вместе с процессами пула
+    (TranscodeTimeout); задачи, попавшие под перезапуск пула, повторяются один раз.
+
+    Лимиты max_pixels и max_frames проверяются до декодирования (ImageRejected),
+    а адресное пространство каждого процесса ограничено memory_limit байт,
+    так что одна задача не может занять больше памяти, чем ей отведено.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 0,
+        queue_size: int = 32,
+        timeout: float = 30,
+        max_pixels: int = 40_000_000,
+        max_frames: int = 100,
+        max_dimension: int = 2560,
+        memory_limit: int = 0,
+    ):
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.max_pixels = max_pixels
+        self.max_frames = max_frames
+        self.max_dimension = max_dimension
+        self.memory_limit = memory_limit
+        self._avif_supported = avif_supported()
+        self._avif_warned = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._pending = 0
+        self._running = 0
+        self._metrics: Dict[str, float] = {
+            "jobs": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "oversized": 0,
+            "out_of_memory": 0,
+            "restarts": 0,
+            "wait_seconds_total": 0.0,
+            "transcode_seconds_total": 0.0,
+            "transcode_seconds_max": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn: процессы не наследуют потоки и соединения event loop
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=limit_worker_memory,
+                initargs=(self.memory_limit,),
+            )
+        return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Останавливает процессы пула; следующий вызов создаст новый пул.
+        """
+        if self._executor is not executor:
+            return
+        self._executor = None
+        self._metrics["restarts"] += 1
+        terminate_workers = getattr(executor, "terminate_workers", None)
+        if terminate_workers is not None:
+            terminate_workers()
+        else:
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, executor: ProcessPoolExecutor, func: Callable[..., T], *args) -> T:
+        future = executor.submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            logger.error(f"Transcoding timed out after {self.timeout}s, restarting the pool")
+            self._restart(executor)
+            raise TranscodeTimeout() from None
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self._pending >= self.max_workers + self.queue_size:
+            self._metrics["rejected"] += 1
+            raise TranscoderBusy()
+
+        submitted = time.perf_counter()
+        self._pending += 1
+        try:
+            async with self._slots:
+                started = time.perf_counter()
+                self._metrics["wait_seconds_total"] += started - submitted
+                self._running += 1
+                executor = self._get_executor()
+                try:
+                    try:
+                        return await self._submit(executor, func, *args)
+                    except BrokenProcessPool:
+                        if executor is self._executor:
+                            # Процесс пула упал (например, нехватка памяти)
+                            self._restart(executor)
+                            raise
+                        # Пул перезапущен из-за таймаута другой задачи
+                        return await self._submit(self._get_executor(), func, *args)
+                except ImageRejected:
+                    self._metrics["oversized"] += 1
+                    raise
+                except MemoryError:
+                    self._metrics["out_of_memory"] += 1
+                    self._metrics["failures"] += 1
+                    raise
+                except Exception:
+                    self._metrics["failures"] += 1
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self._running -= 1
+                    self._metrics["jobs"] += 1
+                    self._metrics["transcode_seconds_total"] += elapsed
+                    self._metrics["transcode_seconds_max"] = max(self._metrics["transcode_seconds_max"], elapsed)
+        finally:
+            self._pending -= 1
+
+    def _checked_preset(self, preset: EncodingPreset) -> EncodingPreset:
+        if preset.avif and not self._avif_supported:
+            if not self._avif_warned:
+                self._avif_warned = True
+                logger.warning("AVIF encoding requested, but Pillow has no AVIF codec; install pillow-avif-plugin")
+            return replace(preset, avif=False)
+        return preset
+
+    async def to_webp(self, file_content: bytes, preset: EncodingPreset = EncodingPreset()) -> bytes:
+        return await self.run(
+            transcode_to_webp, file_content, self.max_pixels, self.max_frames, self.max_dimension, preset
+        )
+
+    async def to_webp_variants(
+        self, file_content: bytes, widths: Sequence[int], preset: EncodingPreset = EncodingPreset()
+    ) -> Tuple[bytes, int, Dict[int, bytes], Dict[int, bytes]]:
+        return await self.run(
+            transcode_to_webp_variants, file_content, tuple(widths),
+            self.max_pixels, self.max_frames, self.max_dimension, self._checked_preset(preset),
+        )
+
+    def stats(self) -> dict:
+        jobs = self._metrics["jobs"]
+        return {
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "timeout": self.timeout,
+            "queue_depth": self._pending - self._running,
+            "in_flight": self._running,
+            "jobs": jobs,
+            "failures": self._metrics["failures"],
+            "timeouts": self._metrics["timeouts"],
+            "rejected": self._metrics["rejected"],
+            "oversized": self._metrics["oversized"],
+            "out_of_memory": self._metrics["out_of_memory"],
+            "restarts": self._metrics["restarts"],
+            "avg_wait_seconds": self._metrics["wait_seconds_total"] / jobs if jobs else 0.0,
+            "avg_transcode_seconds": self._metrics["transcode_seconds_total"] / jobs if jobs else 0.0,
+            "max_transcode_seconds": self._metrics["transcode_seconds_max"],
+        }
+
+    def close(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_transcoder = ImageTranscoder(
+    max_workers=settings.IMAGE_TRANSCODE_WORKERS,
+    queue_size=settings.IMAGE_TRANSCODE_QUEUE_SIZE,
+    timeout=settings.IMAGE_TRANSCODE_TIMEOUT,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+    max_frames=settings.IMAGE_MAX_FRAMES,
+    max_dimension=settings.IMAGE_MAX_DIMENSION,
+    memory_limit=settings.IMAGE_TRANSCODE_MEMORY_LIMIT,
+)
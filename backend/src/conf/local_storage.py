@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import hmac
+import mmap
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import filetype
+from fastapi import HTTPException, UploadFile
+
+from config import settings
+from backend.src.conf.storage_backend import StorageBackend
+
+TEMP_MARKER = ".tmp-"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """
+    Записывает файл через временный файл в том же каталоге и os.replace:
+    читатели видят либо старое содержимое, либо новое целиком.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}{TEMP_MARKER}{uuid.uuid4().hex}"
+    try:
+        with open(temp_path, "wb") as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class LocalStorageManager(StorageBackend):
+    """
+    Хранилище объектов в каталоге root_dir на локальном диске.
+
+    Ключ объекта - относительный путь файла. Запись атомарная (временный
+    файл и os.replace), чтение - через mmap без копирования файла в буфер
+    Python. Файлы отдает /image/media: само приложение или nginx
+    (X-Accel-Redirect), поэтому подписанные ссылки не нужны. Загрузка из
+    браузера принимается тем же приложением по подписанной HMAC политике.
+    """
+    root_dir = None
+    # Адрес, по которому приложение отдает файлы и принимает прямые загрузки
+    url_prefix = "/image/media/"
+    post_url = "/image/storage-upload"
+
+    def __init__(self):
+        super().__init__()
+        if not self.root_dir:
+            raise ValueError("The 'root_dir' class attribute is required and cannot be None.")
+        self.root = os.path.abspath(self.root_dir)
+
+    async def start(self) -> None:
+        await asyncio.to_thread(os.makedirs, self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise HTTPException(status_code=404, detail="File not found")
+        return path
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        # Недописанные файлы не отдаются
+        if TEMP_MARKER in os.path.basename(path):
+            raise HTTPException(status_code=404, detail="File not found")
+        return path
+
+    def storage_url(self, key: str) -> Optional[str]:
+        return f"{self.url_prefix}{key}"
+
+    async def _sign_urls(self, keys: List[str], expiration: int) -> Dict[str, str]:
+        return {key: self.storage_url(key) for key in keys}
+
+    async def put_objects(self, objects: Dict[str, bytes], content_type: str) -> None:
+        paths = [(self._path(key), content) for key, content in objects.items()]
+        try:
+            await asyncio.gather(*(asyncio.to_thread(_write_atomic, path, content) for path, content in paths))
+        except OSError as e:
+            raise HTTPException(status_code=500, detail="Error writing file to storage") from e
+
+    @asynccontextmanager
+    async def open_object(self, key: str) -> AsyncIterator[Tuple[int, AsyncIterator[bytes]]]:
+        path = self._path(key)
+        try:
+            file = await asyncio.to_thread(open, path, "rb")
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError) as e:
+            raise HTTPException(status_code=404, detail="File not found") from e
+        try:
+            size = os.fstat(file.fileno()).st_size
+            # mmap пустого файла невозможен
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+            async def chunks() -> AsyncIterator[bytes]:
+                for start in range(0, size, settings.UPLOAD_CHUNK_SIZE):
+                    yield mapped[start:start + settings.UPLOAD_CHUNK_SIZE]
+
+            try:
+                yield size, chunks()
+            finally:
+                if mapped is not None:
+                    mapped.close()
+        finally:
+            file.close()
+
+    async def read_object(self, key: str, max_size: int) -> bytearray:
+        path = self._path(key)
+
+        def read() -> Optional[bytearray]:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size > max_size:
+                    return None
+                if not size:
+                    return bytearray()
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return bytearray(mapped)
+
+        try:
+            content = await asyncio.to_thread(read)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError) as e:
+            raise HTTPException(status_code=404, detail="File not found") from e
+        if content is None:
+            raise HTTPException(status_code=413, detail="File too large")
+        return content
+
+    async def object_size(self, key: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(os.stat, self._path(key))).st_size
+        except FileNotFoundError:
+            return None
+
+    async def delete_object(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(_remove, self._path(key))
+        except OSError as e:
+            raise HTTPException(status_code=500, detail="Error deleting file from storage") from e
+
+    async def delete_objects(self, keys: Iterable[str]) -> List[str]:
+        paths = {key: self._path(key) for key in dict.fromkeys(keys)}
+
+        def remove_all() -> List[str]:
+            failed = []
+            for key, path in paths.items():
+                try:
+                    _remove(path)
+                except OSError:
+                    failed.append(key)
+            return failed
+
+        return await asyncio.to_thread(remove_all)
+
+    async def list_objects(self, prefix: str = "") -> AsyncIterator[List[Tuple[str, datetime]]]:
+        def scan() -> List[Tuple[str, datetime]]:
+            items = []
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    if not key.startswith(prefix):
+                        continue
+                    try:
+                        modified = os.stat(path).st_mtime
+                    except FileNotFoundError:
+                        continue
+                    items.append((key, datetime.fromtimestamp(modified, tz=timezone.utc)))
+            return items
+
+        items = await asyncio.to_thread(scan)
+        for start in range(0, len(items), self.delete_batch_size):
+            yield items[start:start + self.delete_batch_size]
+
+    def _post_signature(self, key: str, expires: str) -> str:
+        message = f"{key}\n{expires}".encode()
+        return hmac.new(settings.API_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+    async def presigned_post(self, owner_id: int, expiration: int = 600) -> dict:
+        """
+        Политика загрузки из браузера в приложение (post_url): ключ и срок
+        подписаны HMAC, размер и тип проверяет receive_post.
+        """
+        key = f"{self.upload_prefix(owner_id)}{uuid.uuid4().hex}"
+        expires = str(int(time.time()) + expiration)
+        fields = {"key": key, "expires": expires, "signature": self._post_signature(key, expires)}
+        return {"url": self.post_url, "fields": fields, "key": key}
+
+    async def receive_post(self, fields: Dict[str, str], file: UploadFile) -> None:
+        key, expires, signature = fields.get("key", ""), fields.get("expires", ""), fields.get("signature", "")
+        if not hmac.compare_digest(signature, self._post_signature(key, expires)):
+            raise HTTPException(status_code=403, detail="Invalid upload policy")
+        if not expires.isdigit() or int(expires) < time.time():
+            raise HTTPException(status_code=403, detail="Upload policy expired")
+        if not fields.get("Content-Type", "").startswith("image/"):
+            raise HTTPException(status_code=400, detail="Only images can be uploaded")
+
+        content = bytearray()
+        async for chunk in self._read_chunks(file, self.max_image_size):
+            content += chunk
+        kind = filetype.guess(bytes(content[:262]))
+        if not content or kind is None or not kind.mime.startswith("image"):
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        await self.put_objects({key: content}, kind.mime)
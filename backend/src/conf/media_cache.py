@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from backend.src.conf.storage_backend import StorageBackend
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ключи по sha256 содержимого (и их уменьшенные копии) никогда не меняются
+CONTENT_KEY_RE = re.compile(r"^(?:.*/)?[0-9a-f]{64}(?:_w\d+)?(?:\.[A-Za-z0-9]+)?$")
+EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
+# Сколько отсутствующих ключей помнить
+MAX_MISSING_KEYS = 10000
+
+
+def is_content_key(key: str) -> bool:
+    return CONTENT_KEY_RE.match(key) is not None
+
+
+class MediaCache:
+    """
+    Локальный кеш объектов S3 на диске с вытеснением давно не запрошенных (LRU).
+
+    Объект скачивается из S3 один раз (одновременные запросы одного ключа
+    ждут одну загрузку) и хранится в directory под именем sha256 ключа с
+    расширением ключа, поэтому путь не зависит от содержимого file_path.
+    Суммарный размер файлов не превышает max_bytes; объекты больше
+    max_object_size не кешируются. Порядок LRU переживает перезапуск:
+    при обращении у файла обновляется mtime, а load() сортирует по нему.
+    Отсутствие объекта запоминается на negative_ttl секунд: повторные
+    запросы (например, AVIF-версии старых изображений) не идут в S3.
+    Индекс меняется в цикле событий, а работа с файлами выполняется в
+    потоках, чтобы медленный диск не останавливал остальные запросы.
+
+    Файл, путь к которому вернул get(), закреплен до вызова release(): пока
+    ответ его отдает, вытеснение его пропускает (кеш при этом может
+    временно превысить max_bytes).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_object_size: int, negative_ttl: float = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_size = min(max_object_size, max_bytes)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._pins: Counter[str] = Counter()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.negative_ttl = negative_ttl
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._missing: OrderedDict[str, float] = OrderedDict()
+        self._metrics = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0, "not_found": 0}
+
+    def load(self) -> None:
+        """
+        Восстанавливает индекс по файлам каталога и удаляет недокачанные.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if ".tmp-" in entry.name:
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        self._entries.clear()
+        self._size = 0
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        self._loaded = True
+        self._remove_files(self._evict())
+        logger.info(f"Media cache loaded: {len(self._entries)} files, {self._size} bytes")
+
+    def filename(self, key: str) -> str:
+        extension = os.path.splitext(key)[1].lower()
+        if not EXTENSION_RE.match(extension):
+            extension = ""
+        return hashlib.sha256(key.encode()).hexdigest() + extension
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _evict(self) -> List[str]:
+        """
+        Убирает из индекса давно не запрошенные незакрепленные файлы сверх
+        max_bytes и возвращает их пути; сами файлы удаляет _remove_files.
+        """
+        paths = []
+        for name in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if self._pins[name]:
+                continue
+            self._size -= self._entries.pop(name)
+            self._metrics["evictions"] += 1
+            paths.append(self.path(name))
+        return paths
+
+    @staticmethod
+    def _remove_files(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _is_missing(self, filename: str) -> bool:
+        expires = self._missing.get(filename)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._missing[filename]
+            return False
+        return True
+
+    def _mark_missing(self, filename: str) -> None:
+        if self.negative_ttl <= 0:
+            return
+        self._missing[filename] = time.monotonic() + self.negative_ttl
+        self._missing.move_to_end(filename)
+        while len(self._missing) > MAX_MISSING_KEYS:
+            self._missing.popitem(last=False)
+
+    async def _download(self, key: str, filename: str, storage: StorageBackend) -> Optional[str]:
+        try:
+            async with storage.open_object(key) as (size, chunks):
+                return await self._save(filename, size, chunks)
+        except HTTPException as e:
+            if e.status_code == 404:
+                self._mark_missing(filename)
+            raise
+
+    async def _save(self, filename: str, size: int, chunks: AsyncIterator[bytes]) -> Optional[str]:
+        if size > self.max_object_size:
+            self._metrics["bypassed"] += 1
+            return None
+        temp_path = self.path(f"{filename}.tmp-{uuid.uuid4().hex}")
+        try:
+            output = await asyncio.to_thread(open, temp_path, "wb")
+            try:
+                async for chunk in chunks:
+                    await asyncio.to_thread(output.write, chunk)
+            finally:
+                await asyncio.to_thread(output.close)
+            await asyncio.to_thread(os.replace, temp_path, self.path(filename))
+        except BaseException:
+            await asyncio.to_thread(self._remove_files, [temp_path])
+            raise
+
+        self._entries[filename] = size
+        self._size += size
+        # Только что скачанный файл не вытесняется, даже если остальные закреплены
+        self._pins[filename] += 1
+        try:
+            paths = self._evict()
+        finally:
+            self.release(self.path(filename))
+        await asyncio.to_thread(self._remove_files, paths)
+        return self.path(filename)
+
+    async def get(self, key: str, storage: StorageBackend) -> Optional[str]:
+        """
+        Путь к локальной копии объекта; None, если объект слишком большой для кеша.
+
+        Возвращенный файл закреплен: после отдачи его нужно освободить
+        через release(path).
+
+        :raises HTTPException: 404, если объекта нет в хранилище.
+        """
+        if not self._loaded:
+            async with self._load_lock:
+                if not self._loaded:
+                    await asyncio.to_thread(self.load)
+        filename = self.filename(key)
+        while True:
+            if filename in self._entries:
+                path = self.path(filename)
+                self._pins[filename] += 1
+                try:
+                    await asyncio.to_thread(os.utime, path)
+                except FileNotFoundError:
+                    # Файл удалили снаружи: скачиваем заново
+                    self.release(path)
+                    if filename in self._entries:
+                        self._size -= self._entries.pop(filename)
+                except BaseException:
+                    self.release(path)
+                    raise
+                else:
+                    if filename in self._entries:
+                        self._entries.move_to_end(filename)
+                        self._metrics["hits"] += 1
+                        return path
+                    self.release(path)
+
+            if self._is_missing(filename):
+                self._metrics["not_found"] += 1
+                raise HTTPException(status_code=404, detail="File not found")
+
+            future = self._in_flight.get(filename)
+            if future is None:
+                self._metrics["misses"] += 1
+                future = asyncio.ensure_future(self._download(key, filename, storage))
+                self._in_flight[filename] = future
+                future.add_done_callback(lambda _: self._in_flight.pop(filename, None))
+            # shield: отмена одного запроса не прерывает загрузку для остальных
+            path = await asyncio.shield(future)
+            if path is None:
+                return None
+            # Пока ожидающие просыпались, файл мог быть вытеснен: тогда скачиваем снова
+            if filename in self._entries:
+                self._pins[filename] += 1
+                return path
+
+    def release(self, path: str) -> None:
+        """
+        Снимает закрепление файла, полученного из get().
+        """
+        filename = os.path.basename(path)
+        self._pins[filename] -= 1
+        if self._pins[filename] <= 0:
+            del self._pins[filename]
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self._size,
+            "pinned": len(self._pins),
+            "max_bytes": self.max_bytes,
+            "missing": len(self._missing),
+            **self._metrics,
+        }
+
+
+class CachedFileResponse(FileResponse):
+    """
+    FileResponse для файла из MediaCache: освобождает закрепленный get()
+    файл, когда ответ отправлен или соединение оборвалось.
+    """
+
+    def __init__(self, cache: MediaCache, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cache.release(self.path)
+
+
+media_cache = MediaCache(
+    directory=settings.MEDIA_CACHE_DIR,
+    max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+    max_object_size=settings.MEDIA_CACHE_MAX_OBJECT_SIZE,
+    negative_ttl=settings.MEDIA_CACHE_NEGATIVE_TTL,
+)
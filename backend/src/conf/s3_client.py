@@ -1,22 +1,36 @@
-import io
-import mimetypes
-import os
-from typing import List
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
 
 import aioboto3
-import aiohttp
-import filetype
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
-from fastapi import HTTPException, UploadFile
-from PIL import Image, UnidentifiedImageError
+from fastapi import HTTPException
 from config import settings
-#from database import logger
+from backend.src.conf.storage_backend import StorageBackend
+
+
 class S3AsyncClient:
+    """
+    Доступ к S3-клиенту aioboto3.
+
+    В приложении клиент один на процесс: он открывается в main.lifespan через
+    start() и закрывается через close(), а все операции используют его пул
+    соединений. Пока общий клиент не открыт (скрипты, тесты), `client` создает
+    временный клиент на время одной операции.
+    """
     _cached_session = None
+    _shared_client = None
+    _shared_client_context = None
 
     def __init__(self):
-        self.endpoint_domain = "s3.regru.cloud"
-        self.use_ssl = False
+        super().__init__()
+        # S3_ENDPOINT задается доменом или URL со схемой (docker-compose)
+        endpoint = settings.S3_ENDPOINT.strip().rstrip("/")
+        self.use_ssl = endpoint.startswith("https://")
+        self.endpoint_domain = endpoint.split("://", 1)[-1]
         if S3AsyncClient._cached_session is None:
             S3AsyncClient._cached_session = aioboto3.Session(
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
@@ -25,14 +39,50 @@ class S3AsyncClient:
             )
         self.endpoint_url = self._get_endpoint_url()
 
-    @property
-    def client(self):
+    def _create_client(self):
+        config = AioConfig(
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.S3_CONNECT_TIMEOUT,
+            read_timeout=settings.S3_READ_TIMEOUT,
+            tcp_keepalive=True,
+            retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+            connector_args={"keepalive_timeout": settings.S3_KEEPALIVE_TIMEOUT},
+        )
         return S3AsyncClient._cached_session.client(
             "s3",
             endpoint_url=self.endpoint_url,
-            use_ssl=self.use_ssl
+            use_ssl=self.use_ssl,
+            config=config,
         )
 
+    async def start(self) -> None:
+        """
+        Открывает общий клиент процесса. Повторный вызов ничего не делает.
+        """
+        if S3AsyncClient._shared_client is None:
+            context = self._create_client()
+            S3AsyncClient._shared_client = await context.__aenter__()
+            S3AsyncClient._shared_client_context = context
+
+    async def close(self) -> None:
+        context = S3AsyncClient._shared_client_context
+        S3AsyncClient._shared_client = None
+        S3AsyncClient._shared_client_context = None
+        if context is not None:
+            await context.__aexit__(None, None, None)
+
+    @asynccontextmanager
+    async def _client(self):
+        if S3AsyncClient._shared_client is not None:
+            yield S3AsyncClient._shared_client
+        else:
+            async with self._create_client() as s3_client:
+                yield s3_client
+
+    @property
+    def client(self):
+        return self._client()
+
     def _get_endpoint_url(self) -> str:
         if self.endpoint_domain.startswith("http"):
             raise ValueError(
@@ -49,7 +99,8 @@ class S3AsyncClient:
         await self.s3_client.__aexit__(exc_type, exc_val, exc_tb)
 
 
-class S3StorageManager(S3AsyncClient):
+
+class S3StorageManager(S3AsyncClient, StorageBackend):
     bucket_name = None
     default_acl = None
     custom_domain = None
@@ -69,97 +120,106 @@ class S3StorageManager(S3AsyncClient):
             if value is None:
                 raise ValueError(f"The '{attr}' class attribute is required and cannot be None.")
 
-    def _prepare_path(self, path: str) -> str:
-        if path and not path.endswith('/'):
-            path += '/'
-        return path
-
-    async def _read_file(self, file: UploadFile) -> tuple[bytes, str]:
-        file_content = await file.read()
-        file_name = file.filename
-        return file_content, file_name
-
-    async def _generate_unique_key(self, s3_client, file_name: str) -> str:
-        base_name, extension = os.path.splitext(file_name)
-        key = file_name
-        counter = 1
-        while True:
-            try:
-                await s3_client.head_object(Bucket=self.bucket_name, Key=key)
-                key = f"{base_name}_{counter}{extension}"
-                counter += 1
-            except ClientError as e:
-                if e.response['Error']['Code'] == '404':
-                    break
-                else:
-                    raise
-        return key
-
-    def _convert_to_webp(self, file_content: bytes) -> tuple[bytes, str]:
-        try:
-            image = Image.open(io.BytesIO(file_content))
-            image.load()
-            output = io.BytesIO()
-            image.save(output, format="WEBP")
-            return output.getvalue(), "image/webp"
-        except UnidentifiedImageError:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail="An error occurred while processing the image") from e
-
-    async def generate_url(self, key: str, expiration: int = 3600) -> str:
+    def storage_url(self, key: str) -> Optional[str]:
+        """
+        Постоянный URL объекта в хранилище, если бакет публичный или задан
+        custom_domain; иначе None - нужна подписанная ссылка (generate_urls).
+        """
+        protocol = "https" if self.use_ssl else "http"
+        if self.custom_domain:
+            return f"{protocol}://{self.custom_domain}/{key}"
+        if self.default_acl == 'public-read':
+            return f"{protocol}://{self.endpoint_domain}/{self.bucket_name}/{key}"
+        return None
+
+    async def _sign_urls(self, keys: List[str], expiration: int) -> Dict[str, str]:
+        urls = {}
         async with self.client as s3_client:
-            protocol = "https" if self.use_ssl else "http"
-            if self.custom_domain:
-                return f"{protocol}://{self.custom_domain}/{key}"
-            if self.default_acl == 'public-read':
-                return f"{protocol}://{self.endpoint_domain}/{self.bucket_name}/{key}"
             try:
-                url = await s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': self.bucket_name, 'Key': key},
-                    ExpiresIn=expiration
-                )
-                return url
+                for key in keys:
+                    urls[key] = await s3_client.generate_presigned_url(
+                        'get_object',
+                        Params={'Bucket': self.bucket_name, 'Key': key},
+                        ExpiresIn=expiration
+                    )
             except ClientError as e:
                 raise HTTPException(status_code=500, detail="Error generating presigned URL") from e
+        return urls
 
-    async def put_object(self, file: UploadFile, path: str = "", file_type: str = "image") -> str:
-        #logger.info("Начало загрузки файла: %s", file.filename)
+    async def put_objects(self, objects: Dict[str, bytes], content_type: str) -> None:
+        async with self.client as s3_client:
+            try:
+                await asyncio.gather(*(
+                    s3_client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=key,
+                        Body=file_content,
+                        ContentType=content_type,
+                        ACL=self.default_acl
+                    )
+                    for key, file_content in objects.items()
+                ))
+            except ClientError as e:
+                raise HTTPException(status_code=500, detail="Error uploading file to S3") from e
 
+    async def presigned_post(self, owner_id: int, expiration: int = 600) -> dict:
+        """
+        Политика presigned POST для загрузки изображения из браузера напрямую
+        в бакет. Хранилище само проверяет ключ, ACL, размер (не больше
+        max_image_size) и Content-Type (image/*). Возвращает url, поля формы
+        и ключ будущего объекта.
+        """
+        key = f"{self.upload_prefix(owner_id)}{uuid4().hex}"
         async with self.client as s3_client:
             try:
-                file_content, file_name = await self._read_file(file)
-                path = self._prepare_path(path)
-
-                kind = filetype.guess(file_content)
-                is_image = kind is not None and kind.mime.startswith("image")
-
-                if file_type == "image":
-                    if not is_image:
-                        #logger.error("Файл %s не является допустимым изображением", file.filename)
-                        raise HTTPException(status_code=400, detail="Invalid image file")
-                    file_content, content_type = self._convert_to_webp(file_content)
-                    file_name = os.path.splitext(file_name)[0] + ".webp"
-                else:
-                    content_type = kind.mime if kind else 'application/octet-stream'
-
-                key = await self._generate_unique_key(s3_client, path + file_name)
-                await s3_client.put_object(
+                post = await s3_client.generate_presigned_post(
                     Bucket=self.bucket_name,
                     Key=key,
-                    Body=file_content,
-                    ContentType=content_type,
-                    ACL=self.default_acl
+                    Fields={"acl": self.default_acl},
+                    Conditions=[
+                        {"acl": self.default_acl},
+                        ["content-length-range", 1, self.max_image_size],
+                        ["starts-with", "$Content-Type", "image/"],
+                    ],
+                    ExpiresIn=expiration,
                 )
+            except ClientError as e:
+                raise HTTPException(status_code=500, detail="Error generating presigned POST") from e
+        return {"url": post["url"], "fields": post["fields"], "key": key}
 
-                #logger.info("Файл успешно загружен в S3: %s", key)
-                return key
+    async def object_size(self, key: str) -> Optional[int]:
+        """
+        Размер объекта в байтах или None, если объекта нет.
+        """
+        async with self.client as s3_client:
+            try:
+                response = await s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            except ClientError as e:
+                if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                    return None
+                raise HTTPException(status_code=500, detail="Error reading file from S3") from e
+        return response["ContentLength"]
 
+    @asynccontextmanager
+    async def open_object(self, key: str) -> AsyncIterator[Tuple[int, AsyncIterator[bytes]]]:
+        async with self.client as s3_client:
+            try:
+                response = await s3_client.get_object(Bucket=self.bucket_name, Key=key)
             except ClientError as e:
-                #logger.error("Ошибка при загрузке файла %s: %s", file.filename, e)
-                raise HTTPException(status_code=500, detail="Error uploading file to S3") from e
+                if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                    raise HTTPException(status_code=404, detail="File not found") from e
+                raise HTTPException(status_code=502, detail="Error reading file from S3") from e
+
+            body = response["Body"]
 
+            async def chunks() -> AsyncIterator[bytes]:
+                while chunk := await body.read(settings.UPLOAD_CHUNK_SIZE):
+                    yield chunk
+
+            try:
+                yield response["ContentLength"], chunks()
+            finally:
+                body.close()
 
     async def delete_object(self, key: str) -> None:
         async with self.client as s3_client:
@@ -169,3 +229,35 @@ class S3StorageManager(S3AsyncClient):
                 error_code = e.response['Error']['Code']
                 if error_code != 'NoSuchKey':
                     raise HTTPException(status_code=500, detail="Error deleting file from S3") from e
+
+    async def delete_objects(self, keys: Iterable[str]) -> List[str]:
+        """
+        Удаляет объекты запросами DeleteObjects, не больше 1000 ключей в запросе.
+        Возвращает ключи, которые удалить не удалось.
+        """
+        keys = list(dict.fromkeys(keys))
+        failed: List[str] = []
+        async with self.client as s3_client:
+            for start in range(0, len(keys), self.delete_batch_size):
+                batch = keys[start:start + self.delete_batch_size]
+                try:
+                    response = await s3_client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                    )
+                except ClientError as e:
+                    raise HTTPException(status_code=500, detail="Error deleting files from S3") from e
+                failed.extend(
+                    error["Key"] for error in response.get("Errors", ())
+                    if error.get("Code") != "NoSuchKey"
+                )
+        return failed
+
+    async def list_objects(self, prefix: str = "") -> AsyncIterator[List[Tuple[str, datetime]]]:
+        """
+        Перебирает объекты бакета постранично: ключ и время последнего изменения.
+        """
+        async with self.client as s3_client:
+            paginator = s3_client.get_paginator("list_objects_v2")
+            async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                yield [(item["Key"], item["LastModified"]) for item in page.get("Contents", ())]
@@ -1,9 +1,32 @@
+from typing import Type
+
 from config import settings
+from backend.src.conf.image_transcoder import EncodingPreset
+from backend.src.conf.local_storage import LocalStorageManager
 from backend.src.conf.s3_client import S3StorageManager
+from backend.src.conf.storage_backend import StorageBackend
+
+
+def storage_backend_class() -> Type[StorageBackend]:
+    """
+    Класс хранилища согласно settings.STORAGE_BACKEND: s3 или local.
+    """
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "s3":
+        return S3StorageManager
+    if backend == "local":
+        return LocalStorageManager
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
 
 
-class MediaStorage(S3StorageManager):
+class MediaStorage(storage_backend_class()):
     bucket_name = settings.S3_BUCKET
     default_acl = 'public-read'
+    root_dir = settings.LOCAL_STORAGE_DIR
+    variant_widths = tuple(settings.IMAGE_VARIANT_WIDTHS)
+    encoding_presets = {
+        path: EncodingPreset(**preset) for path, preset in settings.IMAGE_ENCODING_PRESETS.items()
+    }
+    media_proxy_prefix = "/image/media/" if settings.MEDIA_PROXY_ENABLED else None
 
-media_storage = MediaStorage()
\ No newline at end of file
+media_storage = MediaStorage()
@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import filetype
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+
+from config import settings
+from backend.src.conf.image_transcoder import (
+    EncodingPreset, ImageRejected, TranscodeTimeout, TranscoderBusy, image_transcoder,
+)
+
+
+@dataclass
+class PreparedUpload:
+    key: str
+    # Исходное содержимое изображения
+    content: bytearray
+    content_type: str = "image/webp"
+    # Заполняется в store(): ключи копий изображения по ширине, включая key,
+    # и AVIF-версий под метками "avif:<ширина>"
+    variants: Dict[str, str] = field(default_factory=dict)
+
+
+class StorageBackend(ABC):
+    """
+    Общий интерфейс хранилища объектов.
+
+    Здесь реализованы загрузка (чтение частями, ключ по sha256, конвертация
+    изображений с уменьшенными копиями) и выдача ссылок с кешем подписанных
+    URL. Операции с самими объектами реализуют наследники: S3StorageManager
+    (S3 через aioboto3) и LocalStorageManager (файлы на локальном диске).
+    """
+    # Ширины уменьшенных копий, которые создаются при загрузке изображений
+    variant_widths = ()
+    max_image_size = settings.MAX_IMAGE_UPLOAD_SIZE
+    # Префикс временных объектов (загрузки из браузера до обработки)
+    staging_prefix = "staging/"
+    # Сколько ключей удаляется одним запросом delete_objects
+    delete_batch_size = 1000
+    # Если задан, ссылки на объекты ведут на прокси приложения, а не в хранилище
+    media_proxy_prefix = None
+    # Параметры кодирования изображений по каталогу загрузки
+    encoding_presets: Dict[str, EncodingPreset] = {}
+
+    def __init__(self):
+        # (ключ, срок) -> (подписанный URL, когда перестать его выдавать)
+        self._url_cache: Dict[Tuple[str, int], Tuple[str, float]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    # Операции с объектами
+
+    @abstractmethod
+    async def put_objects(self, objects: Dict[str, bytes], content_type: str) -> None:
+        """
+        Записывает объекты (ключ -> содержимое).
+        """
+
+    @abstractmethod
+    def open_object(self, key: str) -> AsyncContextManager[Tuple[int, AsyncIterator[bytes]]]:
+        """
+        Открывает объект для чтения: размер и итератор частей содержимого.
+        Наследники реализуют его через @asynccontextmanager.
+
+        :raises HTTPException: 404, если объекта нет.
+        """
+
+    @abstractmethod
+    async def object_size(self, key: str) -> Optional[int]:
+        """
+        Размер объекта в байтах или None, если объекта нет.
+        """
+
+    @abstractmethod
+    async def delete_object(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_objects(self, keys: Iterable[str]) -> List[str]:
+        """
+        Удаляет объекты пачками. Возвращает ключи, которые удалить не удалось.
+        """
+
+    @abstractmethod
+    def list_objects(self, prefix: str = "") -> AsyncIterator[List[Tuple[str, datetime]]]:
+        """
+        Перебирает объекты постранично: ключ и время последнего изменения.
+        Наследники реализуют его асинхронным генератором.
+        """
+
+    @abstractmethod
+    def storage_url(self, key: str) -> Optional[str]:
+        """
+        Постоянный URL объекта в хранилище или None, если нужна подписанная ссылка.
+        """
+
+    @abstractmethod
+    async def _sign_urls(self, keys: List[str], expiration: int) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    async def presigned_post(self, owner_id: int, expiration: int = 600) -> dict:
+        """
+        Политика загрузки изображения из браузера напрямую в хранилище:
+        url, поля формы и ключ будущего объекта.
+        """
+
+    async def receive_post(self, fields: Dict[str, str], file: UploadFile) -> None:
+        """
+        Принимает форму presigned_post, если загрузку принимает само приложение.
+        """
+        raise HTTPException(status_code=404, detail="Not found")
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Путь к файлу объекта, если хранилище находится на локальном диске.
+        """
+        return None
+
+    # Загрузка
+
+    def _prepare_path(self, path: str) -> str:
+        if path and not path.endswith('/'):
+            path += '/'
+        return path
+
+    async def _read_chunks(self, file: UploadFile, max_size: int) -> AsyncIterator[bytes]:
+        """
+        Читает файл частями по UPLOAD_CHUNK_SIZE и прерывает чтение, как только
+        размер превысил max_size.
+        """
+        size = 0
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size is {max_size // (1024 * 1024)}MB"
+                )
+            yield chunk
+
+    @staticmethod
+    def content_key(path: str, digest: str, extension: str) -> str:
+        """
+        Ключ объекта по sha256 содержимого исходного файла: одинаковые файлы
+        в одном каталоге получают один ключ, разные - разные, без проверок в хранилище.
+        """
+        return f"{path}{digest}{extension.lower()}"
+
+    @staticmethod
+    def variant_key(key: str, width: int) -> str:
+        return f"{os.path.splitext(key)[0]}_w{width}.webp"
+
+    @staticmethod
+    def avif_key(key: str) -> str:
+        """
+        Ключ AVIF-версии объекта WebP (оригинала или уменьшенной копии).
+        """
+        return f"{os.path.splitext(key)[0]}.avif"
+
+    def encoding_preset(self, key: str) -> EncodingPreset:
+        """
+        Параметры кодирования по каталогу объекта (Users - аватары, Boards - вложения досок).
+        """
+        return self.encoding_presets.get(os.path.dirname(key), EncodingPreset())
+
+    async def _convert_to_webp(
+        self, file_content: bytes, preset: EncodingPreset = EncodingPreset()
+    ) -> tuple[bytes, int, Dict[int, bytes], Dict[int, bytes]]:
+        try:
+            return await image_transcoder.to_webp_variants(file_content, self.variant_widths, preset)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        except (ImageRejected, Image.DecompressionBombError, MemoryError):
+            raise HTTPException(status_code=413, detail="Image dimensions are too large")
+        except TranscoderBusy:
+            raise HTTPException(status_code=503, detail="Too many images are being processed, try again later")
+        except TranscodeTimeout:
+            raise HTTPException(status_code=504, detail="Image processing timed out")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="An error occurred while processing the image") from e
+
+    async def prepare_upload(self, file: UploadFile, path: str = "") -> PreparedUpload:
+        """
+        Читает загружаемое изображение частями и вычисляет его ключ.
+
+        Тип определяется по первой части, поэтому не-изображение отклоняется
+        до чтения остального файла, а превышение лимита размера - сразу при
+        чтении. Изображение собирается в памяти целиком (его нужно
+        декодировать). Ключ зависит от хеша всего содержимого, поэтому
+        объекты создает store().
+        """
+        path = self._prepare_path(path)
+        digest = hashlib.sha256()
+        buffer = bytearray()
+
+        async for chunk in self._read_chunks(file, self.max_image_size):
+            if not buffer:
+                kind = filetype.guess(chunk)
+                if kind is None or not kind.mime.startswith("image"):
+                    raise HTTPException(status_code=400, detail="Invalid image file")
+            digest.update(chunk)
+            buffer += chunk
+
+        if not buffer:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        return PreparedUpload(key=self.content_key(path, digest.hexdigest(), ".webp"), content=buffer)
+
+    async def store(self, upload: PreparedUpload) -> str:
+        """
+        Конвертирует изображение в WebP вместе с уменьшенными копиями
+        (upload.variants) и записывает объекты в хранилище. Возвращает ключ.
+        """
+        original, width, resized, avif = await self._convert_to_webp(
+            upload.content, self.encoding_preset(upload.key)
+        )
+        objects = {upload.key: original}
+        upload.variants = {str(width): upload.key}
+        for variant_width, variant_content in resized.items():
+            key = self.variant_key(upload.key, variant_width)
+            objects[key] = variant_content
+            upload.variants[str(variant_width)] = key
+        # AVIF лежит рядом с WebP той же ширины
+        avif_objects = {}
+        for variant_width, variant_content in avif.items():
+            key = self.avif_key(upload.variants[str(variant_width)])
+            avif_objects[key] = variant_content
+            upload.variants[f"avif:{variant_width}"] = key
+
+        await asyncio.gather(
+            self.put_objects(objects, upload.content_type),
+            *([self.put_objects(avif_objects, "image/avif")] if avif_objects else []),
+        )
+        return upload.key
+
+    async def put_object(self, file: UploadFile, path: str = "") -> str:
+        upload = await self.prepare_upload(file, path)
+        return await self.store(upload)
+
+    def upload_prefix(self, owner_id: int) -> str:
+        """
+        Каталог временных объектов, которые браузер пользователя загружает напрямую.
+        """
+        return f"{self.staging_prefix}uploads/{owner_id}/"
+
+    async def read_object(self, key: str, max_size: int) -> bytearray:
+        """
+        Читает объект частями, не больше max_size байт.
+        """
+        content = bytearray()
+        async with self.open_object(key) as (size, chunks):
+            if size > max_size:
+                raise HTTPException(status_code=413, detail="File too large")
+            async for chunk in chunks:
+                content += chunk
+        return content
+
+    # Ссылки
+
+    def public_url(self, key: str) -> Optional[str]:
+        """
+        Постоянный URL объекта: через media_proxy_prefix, если задан, иначе
+        прямой URL хранилища (см. storage_url).
+        """
+        if self.media_proxy_prefix:
+            return f"{self.media_proxy_prefix}{key}"
+        return self.storage_url(key)
+
+    async def generate_urls(
+        self, keys: Iterable[str], expiration: Optional[int] = None, direct: bool = False
+    ) -> Dict[str, str]:
+        """
+        URL для набора ключей за один проход: постоянные собираются строкой,
+        остальные подписываются одним вызовом _sign_urls. Подписанная ссылка
+        кешируется на половину срока expiration, поэтому выданная из кеша ссылка
+        действует еще не меньше половины срока, а повторные страницы получают
+        тот же URL и попадают в кеш браузера. direct=True возвращает ссылки
+        на само хранилище в обход media_proxy_prefix.
+        """
+        expiration = expiration or settings.S3_URL_EXPIRATION
+        urls: Dict[str, str] = {}
+        unsigned = []
+        now = time.monotonic()
+        for key in dict.fromkeys(key for key in keys if key):
+            url = self.storage_url(key) if direct else self.public_url(key)
+            if url is None:
+                cached = self._url_cache.get((key, expiration))
+                if cached is not None and cached[1] > now:
+                    url = cached[0]
+            if url is None:
+                unsigned.append(key)
+            else:
+                urls[key] = url
+        if not unsigned:
+            return urls
+
+        urls.update(await self._sign_urls(unsigned, expiration))
+
+        if len(self._url_cache) + len(unsigned) > settings.S3_URL_CACHE_SIZE:
+            self._url_cache = {item: value for item, value in self._url_cache.items() if value[1] > now}
+            while self._url_cache and len(self._url_cache) + len(unsigned) > settings.S3_URL_CACHE_SIZE:
+                del self._url_cache[next(iter(self._url_cache))]
+        for key in unsigned:
+            self._url_cache[(key, expiration)] = (urls[key], now + expiration / 2)
+        return urls
+
+    async def generate_url(self, key: str, expiration: Optional[int] = None, direct: bool = False) -> str:
+        return (await self.generate_urls([key], expiration, direct))[key]
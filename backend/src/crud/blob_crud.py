@@ -0,0 +1,122 @@
+import logging
+import os
+from collections import Counter
+from typing import Iterable, List
+
+from fastapi import UploadFile
+from sqlalchemy import Integer, String, column, delete, func, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from backend.src.conf.storage_backend import StorageBackend
+from backend.src.crud.base_crud import GenericCRUD
+from models import PendingDeletion, StoredBlob
+from image_schemas import ImageCreate, ImageUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class StoredBlobDAO(GenericCRUD[StoredBlob, ImageCreate, ImageUpdate]):
+    """
+    Учет ссылок на объекты в S3.
+
+    Счетчик меняется одним UPSERT/UPDATE, который блокирует строку объекта до
+    конца транзакции. Поэтому параллельные загрузки одного файла и удаление
+    последней ссылки выполняются по очереди: объект загружается только первой
+    ссылкой и ставится в очередь на удаление только после того, как исчезла
+    последняя.
+    """
+
+    async def acquire(self, *, key: str, db_session: AsyncSession) -> tuple[int, dict | None]:
+        """
+        Добавляет ссылку на объект и возвращает новое число ссылок и его копии.
+        Значение 1 означает, что объекта еще нет и его нужно загрузить.
+        """
+        stmt = (
+            pg_insert(StoredBlob)
+            .values(key=key, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[StoredBlob.key],
+                set_={"ref_count": StoredBlob.ref_count + 1, "updated_at": func.now()},
+            )
+            .returning(StoredBlob.ref_count, StoredBlob.variants)
+        )
+        ref_count, variants = (await db_session.execute(stmt)).one()
+        return ref_count, variants
+
+    async def store_file(
+        self, *, file: UploadFile, storage: StorageBackend, path: str = "", db_session: AsyncSession
+    ) -> tuple[str, dict | None]:
+        """
+        Загружает файл с учетом дедупликации и возвращает ключ объекта и ключи
+        его уменьшенных копий. Если такой файл уже хранится, конвертация и PUT
+        в S3 пропускаются.
+        """
+        upload = await storage.prepare_upload(file, path)
+        ref_count, variants = await self.acquire(key=upload.key, db_session=db_session)
+        if ref_count == 1:
+            # Объект мог стоять в очереди на удаление после последней
+            # ссылки; запись снимается до PUT и ждет идущую очистку.
+            # Копии (root_w*.webp, root*.avif) начинаются с ключа без расширения
+            root = os.path.splitext(upload.key)[0]
+            await db_session.execute(
+                delete(PendingDeletion).where(PendingDeletion.key.startswith(root, autoescape=True))
+            )
+            await storage.store(upload)
+            variants = upload.variants or None
+            if variants:
+                await db_session.execute(
+                    update(StoredBlob).where(StoredBlob.key == upload.key).values(variants=variants)
+                )
+        else:
+            logger.info(f"Reusing stored object {upload.key}")
+        return upload.key, variants
+
+    async def release_many(self, *, keys: Iterable[str], db_session: AsyncSession) -> List[str]:
+        """
+        Убирает по одной ссылке на каждый ключ (ключ может повторяться) одним
+        UPDATE. Объекты, на которые не осталось ссылок, вместе с копиями
+        ставятся в очередь на удаление, записи их счетчиков удаляются. Сами
+        объекты удаляет фоновая задача media_cleanup, поэтому время запроса
+        не зависит от числа удаляемых файлов. Возвращает ключи из очереди.
+        """
+        counts = Counter(key for key in keys if key)
+        if not counts:
+            return []
+
+        refs = values(
+            column("key", String), column("n", Integer), name="refs"
+        ).data(list(counts.items()))
+        rows = (await db_session.execute(
+            update(StoredBlob)
+            .where(StoredBlob.key == refs.c.key)
+            .values(ref_count=StoredBlob.ref_count - refs.c.n)
+            .returning(StoredBlob.key, StoredBlob.ref_count, StoredBlob.variants)
+        )).all()
+
+        released = [row.key for row in rows if row.ref_count <= 0]
+        # Ключи без записи счетчика (загруженные до учета ссылок) тоже удаляются
+        orphaned = set(counts) - {row.key for row in rows}
+        pending = list(dict.fromkeys([
+            *orphaned,
+            *(key for row in rows if row.ref_count <= 0 for key in (row.key, *(row.variants or {}).values())),
+        ]))
+        if released:
+            await db_session.execute(delete(StoredBlob).where(StoredBlob.key.in_(released)))
+        if pending:
+            await db_session.execute(
+                pg_insert(PendingDeletion)
+                .values([{"key": key} for key in pending])
+                .on_conflict_do_nothing(index_elements=[PendingDeletion.key])
+            )
+        return pending
+
+    async def release(self, *, key: str, db_session: AsyncSession) -> bool:
+        """
+        Убирает ссылку на объект. Возвращает True, если объект поставлен в
+        очередь на удаление.
+        """
+        return bool(await self.release_many(keys=[key], db_session=db_session))
+
+
+stored_blob_dao = StoredBlobDAO(StoredBlob)
@@ -6,6 +6,7 @@ from sqlalchemy import UUID, Table, select, update
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import aliased
 from backend.src.crud.base_crud import GenericCRUD
+from backend.src.crud.blob_crud import stored_blob_dao
 from models import Base
 from models import Image, ImageBoard
 from models import Board
@@ -49,7 +50,9 @@ class ImageDAO(GenericCRUD[Image, ImageCreate, ImageUpdate]):
             id=uuid.uuid4(),
             user_id=model_instance.id
         )
-        db_obj.file = await db_obj.storage.put_object(file, path)
+        db_obj.file, db_obj.variants = await stored_blob_dao.store_file(
+            file=file, storage=db_obj.storage, path=path, db_session=db_session
+        )
         db_session.add(db_obj)
         await db_session.flush()
         await db_session.refresh(db_obj)
@@ -66,7 +69,7 @@ class ImageBoardDAO(GenericCRUD[ImageBoard, ImageCreate, ImageUpdate]):
     async def _get_image_url(self, db_obj: ImageBoard) -> ImageDAOResponse:
         """Получает URL к экземпляру ImageBoard."""
         try:
-            url = db_obj.url  # Предполагается, что URL генерируется через свойство url
+            url = await db_obj.storage.generate_url(db_obj.file)
             return ImageDAOResponse(image=db_obj, url=url)
         except Exception as e:
             logger.error(f"Error in _get_image_url: {str(e)}")
@@ -91,7 +94,7 @@ class ImageBoardDAO(GenericCRUD[ImageBoard, ImageCreate, ImageUpdate]):
                 image_with_url = await self._get_image_url(db_obj)
                 return image_with_url
             
-            url = db_obj.url
+            url = await db_obj.storage.generate_url(db_obj.file)
             return db_obj, url
         except HTTPException as e:
             logger.error(f"HTTPException in get: {e.detail}")
@@ -124,7 +127,9 @@ class ImageBoardDAO(GenericCRUD[ImageBoard, ImageCreate, ImageUpdate]):
                 id=uuid.uuid4(),
                 board_id=board_instance.id
             )
-            new_image.file = await new_image.storage.put_object(file, path)
+            new_image.file, new_image.variants = await stored_blob_dao.store_file(
+                file=file, storage=new_image.storage, path=path, db_session=db_session
+            )
             db_session.add(new_image)
             await db_session.flush()
             await db_session.refresh(new_image)
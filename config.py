@@ -1,5 +1,6 @@
 import os
 from enum import Enum
+from typing import Dict, List, Optional, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -15,24 +16,168 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: int
     DB_NAME: str
-    
+    # Пул соединений на процесс: при N воркерах uvicorn к базе открывается до
+    # N * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+    DB_POOL_TIMEOUT: float = 30
+    # Соединения старше этого числа секунд переоткрываются (-1 - без ограничения)
+    DB_POOL_RECYCLE: int = 1800
+    # Проверять соединение перед выдачей из пула (переживает рестарт базы)
+    DB_POOL_PRE_PING: bool = True
+    # Сколько соединений открыть при старте, чтобы первые запросы их не ждали
+    DB_POOL_WARMUP: int = 5
+    # Кеш подготовленных запросов на соединение; 0 - для pgbouncer в режиме transaction
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Ограничение времени одного запроса в базе, мс (0 - без ограничения)
+    DB_STATEMENT_TIMEOUT: int = 30000
+    # Имя приложения в pg_stat_activity
+    DB_APPLICATION_NAME: str = "almostnotion"
+    # Реплика для чтения (те же пользователь, пароль и база); без DB_REPLICA_HOST
+    # все запросы идут в основную базу
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None
+    # Сколько секунд после записи клиент читает из основной базы (задержка репликации)
+    DB_REPLICA_STICKY_SECONDS: int = 5
+
+
+    # Хранилище файлов: s3 или local (каталог LOCAL_STORAGE_DIR на диске)
+    STORAGE_BACKEND: str = "s3"
+    LOCAL_STORAGE_DIR: str = "media_storage"
+    # Префикс internal-location nginx для файлов LOCAL_STORAGE_DIR (X-Accel-Redirect)
+    LOCAL_STORAGE_ACCEL_PREFIX: Optional[str] = None
 
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
     S3_ENDPOINT: str
     S3_REGION: str
     S3_BUCKET: str
+    S3_MAX_POOL_CONNECTIONS: int = 20
+    S3_CONNECT_TIMEOUT: float = 5
+    S3_READ_TIMEOUT: float = 30
+    S3_KEEPALIVE_TIMEOUT: float = 60
+    S3_MAX_ATTEMPTS: int = 3
+    # Срок подписанных ссылок на объекты и размер их кеша
+    S3_URL_EXPIRATION: int = 3600
+    S3_URL_CACHE_SIZE: int = 10000
+
+    # Раздача медиа через /image/media с локальным дисковым кешем вместо ссылок на S3
+    MEDIA_PROXY_ENABLED: bool = False
+    MEDIA_CACHE_DIR: str = "media_cache"
+    MEDIA_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    MEDIA_CACHE_MAX_OBJECT_SIZE: int = 20 * 1024 * 1024
+    # Сколько секунд помнить, что объекта нет (например, AVIF-версии старого изображения)
+    MEDIA_CACHE_NEGATIVE_TTL: int = 300
+    # Префикс internal-location nginx: файл отдает nginx (sendfile) по X-Accel-Redirect
+    MEDIA_CACHE_ACCEL_PREFIX: Optional[str] = None
+
+    # Загрузка файлов читается частями; лимиты проверяются во время чтения,
+    # а тело multipart-запроса целиком - в UploadSizeLimitMiddleware
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024
+    MAX_IMAGE_UPLOAD_SIZE: int = 5 * 1024 * 1024
+    # Срок действия presigned POST для загрузки из браузера напрямую в бакет
+    PRESIGNED_UPLOAD_TTL: int = 600
+    # Попытки фоновой обработки загруженного изображения при сбоях хранилища
+    # или базы; пауза перед повтором удваивается с каждой попыткой
+    UPLOAD_PROCESS_ATTEMPTS: int = 3
+    UPLOAD_PROCESS_RETRY_DELAY: float = 5
+    # Фоновое удаление ненужных объектов: очередь - пачками DeleteObjects,
+    # сборка объектов без ссылок в бакете - не моложе MEDIA_GC_GRACE_PERIOD
+    MEDIA_PURGE_INTERVAL: int = 60
+    MEDIA_PURGE_BATCH_SIZE: int = 1000
+    MEDIA_GC_INTERVAL: int = 24 * 60 * 60
+    MEDIA_GC_GRACE_PERIOD: int = 24 * 60 * 60
+
+    # Пул процессов для конвертации изображений; 0 - по числу ядер
+    IMAGE_TRANSCODE_WORKERS: int = 0
+    IMAGE_TRANSCODE_QUEUE_SIZE: int = 32
+    IMAGE_TRANSCODE_TIMEOUT: float = 30
+    # Лимиты изображения, проверяемые до декодирования: пиксели всех кадров и число кадров.
+    # Больше IMAGE_MAX_DIMENSION по большей стороне оригинал не хранится (JPEG декодируется
+    # сразу в уменьшенном масштабе); память процесса пула ограничена (0 - без ограничения)
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    IMAGE_MAX_FRAMES: int = 100
+    IMAGE_MAX_DIMENSION: int = 2560
+    IMAGE_TRANSCODE_MEMORY_LIMIT: int = 1024 * 1024 * 1024
+    # Ширины уменьшенных копий изображений (srcset); больше оригинала не создаются
+    IMAGE_VARIANT_WIDTHS: List[int] = [160, 400, 800]
+    # Параметры кодирования по каталогу загрузки (поля EncodingPreset): аватары
+    # показываются маленькими и сжимаются сильнее; avif - еще и AVIF-версии
+    # (нужен pillow-avif-plugin), которые /image/media отдает по заголовку Accept
+    IMAGE_ENCODING_PRESETS: Dict[str, Dict[str, Union[int, bool]]] = {
+        "Users": {"quality": 75, "method": 6},
+        "Boards": {"quality": 80, "method": 5},
+    }
 
     API_SECRET: str
     HASH_SALT: str
     JWT_SECRET: str 
     ACCESS_TOKEN_TTL: int
     REFRESH_TOKEN_TTL: int  
+    # Общий токен для /metrics (заголовок Authorization: Bearer <токен>);
+    # пока он не задан, эндпоинт выключен
+    METRICS_TOKEN: Optional[str] = None
 
     GMAIL_USERNAME: str
     GMAIL_FROM: str
     GMAIL_PASSWORD: str
-    
+
+    # smtp - реальная отправка, file/maildir - локальный приемник писем
+    MAIL_BACKEND: str = "smtp"
+    MAIL_SINK_PATH: str = "mail_sink"
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 587
+    SMTP_TIMEOUT: float = 30
+    SMTP_POOL_SIZE: int = 4
+    SMTP_CONCURRENCY: int = 4
+    # Каталог bytecode-кеша шаблонов писем; None - системный временный каталог
+    MAIL_TEMPLATE_CACHE_DIR: Optional[str] = None
+
+    # Квота Gmail на отправку и параметры воркера outbox
+    GMAIL_DAILY_QUOTA: int = 500
+    GMAIL_BURST: int = 20
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL: float = 5
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: float = 30
+    OUTBOX_BACKOFF_MAX: float = 3600
+    # На сколько секунд письмо откладывается на время отправки (если воркер упадет)
+    OUTBOX_LEASE: float = 300
+
+    # Проверка MX-записей при регистрации; пустой список - системные DNS-серверы
+    MX_NAMESERVERS: List[str] = []
+    MX_RESOLVER_PORT: int = 53
+    MX_RESOLVER_TIMEOUT: float = 5
+    MX_RESOLVER_CONCURRENCY: int = 10
+    MX_CACHE_TTL: int = 3600
+    MX_NEGATIVE_CACHE_TTL: int = 300
+
+    # Хеширование паролей: bcrypt (cost - log2 раундов) или scrypt (cost - log2 N)
+    PASSWORD_HASH_ALGORITHM: str = "bcrypt"
+    PASSWORD_HASH_COST: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Адреса (через запятую, можно подсети) обратных прокси, которым доверяется
+    # X-Forwarded-For. Та же переменная, что у uvicorn --forwarded-allow-ips:
+    # без нее request.client - это адрес прокси, и все клиенты за ним делят
+    # один лимит частоты запросов
+    FORWARDED_ALLOW_IPS: Optional[str] = None
+
+    # Проверка занятости почты на форме регистрации (лимит - по IP клиента)
+    CHECK_EMAIL_RATE: float = 5
+    CHECK_EMAIL_BURST: int = 20
+    CHECK_EMAIL_CACHE_TTL: float = 30
+    EMAIL_FILTER_CAPACITY: int = 100000
+    EMAIL_FILTER_ERROR_RATE: float = 0.01
+    EMAIL_FILTER_REFRESH_INTERVAL: float = 30
+
+    # Напоминания о дедлайнах: одно письмо-дайджест на получателя за окно
+    NOTIFICATION_DIGEST_ENABLED: bool = True
+    NOTIFICATION_DIGEST_WINDOW_MINUTES: int = 1
+    NOTIFICATION_DEFAULT_LEAD_MINUTES: int = 24 * 60
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
     )
@@ -41,4 +186,10 @@ class Settings(BaseSettings):
         return (f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@"
                 f"{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}")
 
+    def get_db_replica_url(self) -> Optional[str]:
+        if not self.DB_REPLICA_HOST:
+            return None
+        return (f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@"
+                f"{self.DB_REPLICA_HOST}:{self.DB_REPLICA_PORT or self.DB_PORT}/{self.DB_NAME}")
+
 settings = Settings()
\ No newline at end of file
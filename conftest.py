@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from database import DATABASE_URL
+from models import Board, Task, ToDoList, User
+
+
+@pytest_asyncio.fixture
+async def rollback_session():
+    """
+    Сессия в базе с примененными миграциями, все изменения которой (включая
+    commit внутри проверяемых функций) откатываются после теста. Если база
+    недоступна, тест пропускается.
+    """
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    try:
+        connection = await engine.connect()
+    except (OSError, SQLAlchemyError) as e:
+        await engine.dispose()
+        pytest.skip(f"Database is not available: {e}")
+    transaction = await connection.begin()
+    session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        await session.close()
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def rollback_session_maker(rollback_session):
+    """
+    Фабрика сессий на соединении rollback_session - для кода, который сам
+    открывает сессии (фоновые задачи); их изменения тоже откатываются.
+    """
+    connection = await rollback_session.connection()
+
+    def make_session():
+        return AsyncSession(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+
+    return make_session
+
+
+@pytest_asyncio.fixture
+async def make_task(rollback_session):
+    """
+    Создает пользователя с доской, списком и задачей; возвращает (user, task).
+    """
+    async def make(deadline=None, list_deadline=None, lead_minutes=None):
+        user = User(
+            username="tester", email=f"tester-{uuid.uuid4().hex}@example.com", password="x",
+            reminder_lead_minutes=lead_minutes,
+        )
+        rollback_session.add(user)
+        await rollback_session.flush()
+        board = Board(title="Test board", content={"texts": []}, user_id=user.id)
+        rollback_session.add(board)
+        await rollback_session.flush()
+        todo_list = ToDoList(title="Test list", deadline=list_deadline, board_id=board.id)
+        rollback_session.add(todo_list)
+        await rollback_session.flush()
+        task = Task(title="Test task", deadline=deadline, completed=False, todo_list_id=todo_list.id)
+        rollback_session.add(task)
+        await rollback_session.commit()
+        return user, task
+
+    return make
@@ -0,0 +1,148 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Select, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Кука с временем (unix), до которого чтения клиента идут в основную базу
+PRIMARY_COOKIE = "db_primary_until"
+# Методы, которые ничего не пишут: только их чтения могут идти в реплику
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@dataclass
+class RequestWrites:
+    # Клиент недавно писал (реплика могла еще не получить его изменения)
+    # или запрос может писать: все его чтения идут в основную базу
+    pinned: bool = False
+    # Запрос что-то записал в базу
+    wrote: bool = False
+
+
+_request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+
+def _mark_written(session: Session) -> None:
+    session.info["wrote"] = True
+    request_writes = _request_writes.get()
+    if request_writes is not None:
+        request_writes.wrote = True
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет SELECT внутри replica_reads() в реплику
+    (info["replica_bind"]), а все остальное - в основную базу (bind).
+
+    Чтение идет в основную базу, если сессия уже что-то записала, запрос
+    может писать (метод не из SAFE_METHODS) или клиент писал в последние
+    DB_REPLICA_STICKY_SECONDS секунд (кука PRIMARY_COOKIE), поэтому
+    пользователь сразу видит свои изменения, а запись не опирается на
+    отстающие данные реплики.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if self._flushing:
+            _mark_written(self)
+        elif self._use_replica(clause):
+            return self.info["replica_bind"]
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _use_replica(self, clause) -> bool:
+        if self.info.get("replica_bind") is None or not self.info.get("replica_reads"):
+            return False
+        if not isinstance(clause, Select) or self.info.get("wrote"):
+            return False
+        request_writes = _request_writes.get()
+        return request_writes is None or not request_writes.pinned
+
+
+@contextmanager
+def replica_reads(session: AsyncSession):
+    """
+    Разрешает читать из реплики запросам внутри блока.
+    """
+    info = session.sync_session.info
+    previous = info.get("replica_reads", False)
+    info["replica_reads"] = True
+    try:
+        yield
+    finally:
+        info["replica_reads"] = previous
+
+
+def replica_read(func):
+    """
+    Декоратор функции только для чтения с параметром session: ее запросы
+    могут идти в реплику.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        session = signature.bind_partial(*args, **kwargs).arguments["session"]
+        with replica_reads(session):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def mark_orm_writes(orm_execute_state) -> None:
+    """
+    Обработчик do_orm_execute: INSERT/UPDATE/DELETE через session.execute
+    (без flush) тоже закрепляют сессию за основной базой.
+    """
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_written(orm_execute_state.session)
+
+
+event.listen(RoutingSession, "do_orm_execute", mark_orm_writes)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    ASGI-middleware "прочитай свою запись": если запрос что-то записал,
+    клиенту ставится кука PRIMARY_COOKIE на sticky_seconds секунд, и пока
+    она действует, его чтения не уходят в реплику. Запросы с методами не
+    из SAFE_METHODS читают из основной базы всегда, в том числе до первой
+    записи.
+    """
+
+    def __init__(self, app: ASGIApp, sticky_seconds: int):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        pinned_until = HTTPConnection(scope).cookies.get(PRIMARY_COOKIE, "")
+        request_writes = RequestWrites(
+            pinned=scope["method"] not in SAFE_METHODS
+            or pinned_until.isdigit() and int(pinned_until) > time.time()
+        )
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and request_writes.wrote:
+                until = int(time.time()) + self.sticky_seconds
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{PRIMARY_COOKIE}={until}; Max-Age={self.sticky_seconds}; Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        token = _request_writes.set(request_writes)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
@@ -0,0 +1,13 @@
+#!/bin/sh
+set -e
+
+# Пустая база (или созданная через metadata.create_all) сначала помечается
+# головами старой цепочки миграций: начальные ревизии рассчитаны на уже
+# существующие таблицы, а ревизия schema baseline создает недостающие
+current="$(alembic current)"
+if [ -z "$current" ]; then
+    alembic stamp 192a47cc8b64 6ece1f7e9dd6
+fi
+alembic upgrade head
+
+exec "$@"
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, HttpUrl
+from typing import Dict, List, Optional
 from uuid import UUID
 from fastapi import UploadFile
 import uuid
@@ -6,11 +7,36 @@ import uuid
 class ImageSchema(BaseModel):
     id: UUID
     file: str
-    
-    @property
-    def url(self) -> str:
-        from config import settings
-        return f"{settings.S3_ENDPOINT}/{settings.S3_BUCKET}/{self.file}"
+    variants: Optional[Dict[str, str]] = None
+    # Заполняются в with_urls() по результату S3StorageManager.generate_urls
+    url: Optional[str] = None
+    srcset: str = ""
+
+    def widths(self) -> Dict[str, str]:
+        """
+        Копии WebP по ширине. AVIF-копии (метки "avif:<ширина>") по ссылке не
+        выдаются: их отдает /image/media вместо WebP по заголовку Accept.
+        """
+        return {width: key for width, key in (self.variants or {}).items() if width.isdigit()}
+
+    def keys(self) -> List[str]:
+        """
+        Ключи объектов изображения, на которые нужны ссылки: оригинал и уменьшенные копии.
+        """
+        return [self.file, *self.widths().values()]
+
+    def with_urls(self, urls: Dict[str, str]) -> "ImageSchema":
+        """
+        Подставляет url и srcset (пустой, если копий нет) из готовых URL по ключам.
+        """
+        self.url = urls.get(self.file)
+        widths = self.widths()
+        if widths:
+            self.srcset = ", ".join(
+                f"{urls[key]} {width}w"
+                for width, key in sorted(widths.items(), key=lambda item: int(item[0]))
+            )
+        return self
     
     class Config:
         from_attributes = True
@@ -27,6 +53,16 @@ class ImageUploadResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PresignedUploadResponse(BaseModel):
+    url: str
+    fields: Dict[str, str]
+    key: str
+
+
+class CompleteUploadRequest(BaseModel):
+    key: str
+
+
 class ImageUpdate(ImageCreate):
     id: uuid.UUID
 
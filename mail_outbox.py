@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import aiosmtplib
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from mail_transport import BaseMailTransport, build_messages, mail_transport
+from models import OutboxEmail
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+# Итоги отправки писем из outbox (для /metrics); errors - сбои пачки целиком
+outbox_stats = {"sent": 0, "retried": 0, "failed": 0, "errors": 0}
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """
+    Экспоненциальная задержка перед повторной отправкой с небольшим случайным разбросом.
+    """
+    delay = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    Ошибки 5xx по самому письму (адресат отклонен, письмо не принято) не
+    исправятся повтором. Отказ в авторизации или отправителе - проблема
+    настроек, а не письма, поэтому такие письма повторяются.
+    """
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(is_permanent_error(refused) for refused in error.recipients)
+    if isinstance(error, (aiosmtplib.SMTPRecipientRefused, aiosmtplib.SMTPDataError)):
+        return 500 <= error.code < 600
+    return False
+
+
+class OutboxWorker:
+    """
+    Пул воркеров, разбирающих таблицу outbox.
+
+    Каждый воркер в короткой транзакции забирает пачку готовых к отправке писем через
+    SELECT ... FOR UPDATE SKIP LOCKED и откладывает их на время аренды, поэтому
+    несколько воркеров и процессов не отправляют одно письмо дважды. Скорость
+    отправки ограничена token bucket по квоте Gmail; ограничение действует в
+    пределах одного процесса.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        transport: BaseMailTransport,
+        bucket: TokenBucket,
+        workers: int = 2,
+        batch_size: int = 20,
+        poll_interval: float = 5,
+        max_attempts: int = 8,
+        lease: float = 300,
+    ):
+        self.session_maker = session_maker
+        self.transport = transport
+        self.bucket = bucket
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._tasks: List[asyncio.Task] = []
+
+    async def drain_once(self) -> int:
+        """
+        Отправляет одну пачку писем. Возвращает количество обработанных писем.
+
+        Письма забираются короткой транзакцией: next_attempt_at сдвигается на
+        lease секунд, и блокировки снимаются до отправки. SMTP-сессия не держит
+        соединение с базой; если процесс упадет посреди отправки, письма снова
+        станут доступны по истечении аренды. Результаты записываются второй
+        транзакцией. Если транспорт упал целиком, ошибка записывается всем
+        письмам пачки как неудачная попытка, а не ждет окончания аренды.
+        """
+        tokens = await self.bucket.acquire_up_to(self.batch_size)
+        async with self.session_maker() as session:
+            async with session.begin():
+                now = datetime.now()
+                query = (
+                    select(OutboxEmail)
+                    .where(OutboxEmail.status == "pending")
+                    .where(OutboxEmail.next_attempt_at <= now)
+                    .order_by(OutboxEmail.next_attempt_at)
+                    .limit(tokens)
+                    .with_for_update(skip_locked=True)
+                )
+                result = await session.execute(query)
+                emails = result.scalars().all()
+                self.bucket.release(tokens - len(emails))
+                if not emails:
+                    return 0
+                for email in emails:
+                    email.next_attempt_at = now + timedelta(seconds=self.lease)
+
+            messages = build_messages((email.recipient, email.subject, email.body) for email in emails)
+            try:
+                results = await self.transport.send_messages(messages)
+            except Exception as e:
+                logger.error(f"Outbox transport failed for a batch of {len(emails)} emails: {e}")
+                outbox_stats["errors"] += 1
+                results = [e] * len(emails)
+
+            try:
+                async with session.begin():
+                    now = datetime.now()
+                    outcomes = [self._apply_result(email, error, now) for email, error in zip(emails, results)]
+            except Exception as e:
+                # Письма уже отправлены; без записи результата они повторятся после аренды
+                # Ошибку считает _run
+                logger.error(f"Failed to record results of outbox emails {[email.id for email in emails]}: {e}")
+                raise
+        for outcome in outcomes:
+            outbox_stats[outcome] += 1
+        return len(emails)
+
+    def _apply_result(self, email: OutboxEmail, error: Optional[Exception], now: datetime) -> str:
+        """
+        Записывает результат отправки письма. Возвращает "sent", "retried" или "failed".
+        """
+        if error is None:
+            email.status = "sent"
+            email.sent_at = now
+            email.last_error = None
+            return "sent"
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        if email.attempts >= self.max_attempts or is_permanent_error(error):
+            email.status = "failed"
+            logger.error(f"Outbox email {email.id} to {email.recipient} failed permanently: {error}")
+            return "failed"
+        email.next_attempt_at = now + backoff_delay(email.attempts)
+        logger.warning(f"Outbox email {email.id} to {email.recipient} failed, attempt {email.attempts}: {error}")
+        return "retried"
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                outbox_stats["errors"] += 1
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def create_outbox_worker(session_maker: async_sessionmaker) -> OutboxWorker:
+    """
+    Создает воркер outbox с лимитом скорости по квоте settings.GMAIL_DAILY_QUOTA.
+    """
+    bucket = TokenBucket(
+        rate=settings.GMAIL_DAILY_QUOTA / 86400,
+        capacity=settings.GMAIL_BURST,
+    )
+    return OutboxWorker(
+        session_maker=session_maker,
+        transport=mail_transport,
+        bucket=bucket,
+        workers=settings.OUTBOX_WORKERS,
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        poll_interval=settings.OUTBOX_POLL_INTERVAL,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+        lease=settings.OUTBOX_LEASE,
+    )
@@ -0,0 +1,55 @@
+import os
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from config import settings
+
+EMAIL_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "email")
+
+# Общее окружение для всех писем. Скомпилированные шаблоны кешируются в памяти
+# окружения и на диске (bytecode cache), поэтому после перезапуска шаблоны
+# не компилируются заново. auto_reload выключен: шаблоны писем меняются только с деплоем.
+email_env = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    bytecode_cache=FileSystemBytecodeCache(settings.MAIL_TEMPLATE_CACHE_DIR),
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def render_email(template_name: str, **context) -> str:
+    """
+    Рендерит шаблон письма из templates/email.
+    """
+    return email_env.get_template(template_name).render(**context)
+
+
+@lru_cache(maxsize=1)
+def render_register_email() -> str:
+    """
+    Приветственное письмо одинаково для всех, поэтому рендерится один раз на процесс.
+    """
+    return render_email("register.html")
+
+
+@lru_cache(maxsize=1024)
+def render_deadline_email(message: str) -> str:
+    return render_email("deadline.html", message=message)
+
+
+@lru_cache(maxsize=1024)
+def _render_deadline_digest(messages: Tuple[str, ...]) -> str:
+    return render_email("deadline_digest.html", messages=messages)
+
+
+def render_deadline_digest(messages: Iterable[str]) -> str:
+    """
+    Собирает одно письмо со всеми приближающимися дедлайнами получателя.
+    Одинаковые наборы напоминаний (например, у владельца и участников доски)
+    рендерятся один раз.
+    """
+    return _render_deadline_digest(tuple(messages))
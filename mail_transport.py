@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import mailbox
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from email.message import Message
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosmtplib
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(recipient: str, subject: str, html_message: str) -> MIMEMultipart:
+    """
+    Собирает письмо с HTML-содержимым для указанного адресата.
+    """
+    msg = MIMEMultipart()
+    msg['From'] = settings.GMAIL_FROM
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_message, 'html'))
+    return msg
+
+
+def build_messages(items: Iterable[Tuple[str, str, str]]) -> List[MIMEMultipart]:
+    """
+    Собирает письма для пачки (адресат, тема, HTML). Для одинаковых HTML-тел
+    создается и кодируется одна MIME-часть, которая подключается ко всем письмам:
+    при сериализации вложенная часть не изменяется, поэтому ее можно разделять.
+    """
+    parts: Dict[str, MIMEText] = {}
+    messages = []
+    for recipient, subject, html_message in items:
+        part = parts.get(html_message)
+        if part is None:
+            part = parts[html_message] = MIMEText(html_message, 'html')
+        msg = MIMEMultipart()
+        msg['From'] = settings.GMAIL_FROM
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(part)
+        messages.append(msg)
+    return messages
+
+
+class BaseMailTransport(ABC):
+    """
+    Общий интерфейс доставки писем.
+
+    send_messages возвращает список той же длины, что и входной:
+    None для успешно отправленного письма или исключение, из-за которого
+    письмо не ушло.
+    """
+
+    @abstractmethod
+    async def send_message(self, message: Message) -> None:
+        ...
+
+    async def send_messages(self, messages: Iterable[Message]) -> List[Optional[Exception]]:
+        results = []
+        for message in messages:
+            try:
+                await self.send_message(message)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def close(self) -> None:
+        pass
+
+
+class SMTPPoolTransport(BaseMailTransport):
+    """
+    Асинхронная отправка через пул авторизованных SMTP-соединений.
+
+    Соединение открывается и проходит STARTTLS/LOGIN один раз, после чего
+    возвращается в пул и переиспользуется для следующих писем. Пачка писем
+    делится между не более чем `concurrency` соединениями, каждое из которых
+    отправляет свою часть подряд в рамках одной SMTP-сессии.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str,
+        password: str,
+        pool_size: int = 4,
+        concurrency: int = 4,
+        timeout: float = 30,
+        start_tls: bool = True,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.pool_size = max(1, pool_size)
+        self.concurrency = max(1, min(concurrency, self.pool_size))
+        self.timeout = timeout
+        self.start_tls = start_tls
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(self.pool_size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            start_tls=self.start_tls,
+        )
+        await client.connect()
+        await client.login(self.username, self.password)
+        return client
+
+    @staticmethod
+    async def _discard(client: aiosmtplib.SMTP) -> None:
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Выдает соединение из пула, при необходимости открывая новое.
+        Соединение, на котором произошла ошибка, в пул не возвращается.
+        """
+        async with self._slots:
+            client = None
+            while self._idle and client is None:
+                candidate = self._idle.pop()
+                if candidate.is_connected:
+                    client = candidate
+            if client is None:
+                client = await self._connect()
+            try:
+                yield client
+            except BaseException:
+                await self._discard(client)
+                raise
+            else:
+                self._idle.append(client)
+
+    async def send_message(self, message: Message) -> None:
+        async with self.connection() as client:
+            await client.send_message(message)
+
+    async def _send_chunk(self, messages: List[Message]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = []
+        pending = list(messages)
+        while pending:
+            connected = False
+            try:
+                async with self.connection() as client:
+                    connected = True
+                    while pending:
+                        try:
+                            await client.send_message(pending[0])
+                            results.append(None)
+                        except aiosmtplib.SMTPRecipientsRefused as e:
+                            # Отказ по адресату не ломает сессию
+                            results.append(e)
+                        pending.pop(0)
+            except Exception as e:
+                logger.error(f"SMTP session failed: {e}")
+                if not connected:
+                    # Не удалось даже подключиться - остальные письма не отправить
+                    results.extend([e] * len(pending))
+                    break
+                # Сессия оборвалась: текущее письмо помечаем ошибкой,
+                # остальные отправляем через новое соединение
+                results.append(e)
+                pending.pop(0)
+        return results
+
+    async def send_messages(self, messages: Iterable[Message]) -> List[Optional[Exception]]:
+        messages = list(messages)
+        if not messages:
+            return []
+        workers = min(self.concurrency, len(messages))
+        chunks = [messages[i::workers] for i in range(workers)]
+        chunk_results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks))
+
+        results: List[Optional[Exception]] = [None] * len(messages)
+        for offset, chunk_result in enumerate(chunk_results):
+            for position, result in enumerate(chunk_result):
+                results[offset + position * workers] = result
+        return results
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client in idle:
+            await self._discard(client)
+
+
+class FileMailSink(BaseMailTransport):
+    """
+    Складывает письма в локальный mbox-файл вместо отправки.
+    Используется в тестах и бенчмарках.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _write(self, message: Message) -> None:
+        box = mailbox.mbox(self.path)
+        try:
+            box.lock()
+            box.add(message)
+            box.flush()
+        finally:
+            box.unlock()
+            box.close()
+
+    async def send_message(self, message: Message) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._write, message)
+
+
+class MaildirMailSink(BaseMailTransport):
+    """
+    Складывает каждое письмо отдельным файлом в maildir-каталог.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._box = None
+
+    def _write(self, message: Message) -> None:
+        if self._box is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._box = mailbox.Maildir(self.path, create=True)
+        self._box.add(message)
+
+    async def send_message(self, message: Message) -> None:
+        await asyncio.to_thread(self._write, message)
+
+
+def create_mail_transport() -> BaseMailTransport:
+    """
+    Создает транспорт согласно settings.MAIL_BACKEND: smtp, file или maildir.
+    """
+    backend = settings.MAIL_BACKEND.lower()
+    if backend == "smtp":
+        return SMTPPoolTransport(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.GMAIL_FROM,
+            password=settings.GMAIL_PASSWORD,
+            pool_size=settings.SMTP_POOL_SIZE,
+            concurrency=settings.SMTP_CONCURRENCY,
+            timeout=settings.SMTP_TIMEOUT,
+        )
+    if backend == "file":
+        return FileMailSink(settings.MAIL_SINK_PATH)
+    if backend == "maildir":
+        return MaildirMailSink(settings.MAIL_SINK_PATH)
+    raise ValueError(f"Unknown MAIL_BACKEND: {settings.MAIL_BACKEND}")
+
+
+mail_transport = create_mail_transport()
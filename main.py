@@ -5,8 +5,15 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 from starlette.responses import HTMLResponse
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from router_notification import check_and_send_notifications
+from mail_transport import mail_transport
+from mail_outbox import create_outbox_worker
+from media_cleanup import create_media_cleaner
+from auth.email_lookup import email_lookup
+from db_routing import ReplicaStickinessMiddleware
+from upload_limits import FORM_OVERHEAD, UploadSizeLimitMiddleware
 from datetime import datetime, timedelta
 
 from database import *
@@ -14,6 +21,12 @@ from auth.transport.router_reg import router as reg_router
 from router_boards import router as board_router
 from router_profile import router as profile_router
 from router_image import  router as image_router
+from router_metrics import router as metrics_router
+from auth.password_hasher import password_hasher
+from backend.src.conf.image_transcoder import image_transcoder
+from backend.src.conf.s3_storages import media_storage
+from backend.src.conf.media_cache import media_cache
+import asyncio
 
 
 @asynccontextmanager
@@ -21,16 +34,46 @@ async def lifespan(app: FastAPI):
     """
     Контекстный менеджер, который управляет жизненным циклом приложения
     """
-    await create_tables(engine)
+    await check_schema_is_current(engine)
+    await warm_pool(engine, settings.DB_POOL_WARMUP)
+    if replica_engine is not None:
+        await warm_pool(replica_engine, settings.DB_POOL_WARMUP)
     print("База готова к работе")
+    await email_lookup.warm(async_session_maker)
+    await media_storage.start()
+    if settings.MEDIA_PROXY_ENABLED:
+        await asyncio.to_thread(media_cache.load)
+    outbox_worker.start()
     yield
+    await outbox_worker.stop()
+    await media_storage.close()
+    await mail_transport.close()
+    password_hasher.close()
+    image_transcoder.close()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
     print("Выключение")
 
+outbox_worker = create_outbox_worker(async_session_maker)
+media_cleaner = create_media_cleaner(async_session_maker)
+
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReplicaStickinessMiddleware, sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS)
+# Лимит тела только для маршрутов, принимающих изображения
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    path: settings.MAX_IMAGE_UPLOAD_SIZE + FORM_OVERHEAD
+    for path in ("/image/upload-image", "/image/storage-upload", "/board/main_page/{board_id}/add_image")
+})
+if settings.FORWARDED_ALLOW_IPS:
+    # Адрес клиента из X-Forwarded-For, если запрос пришел от доверенного прокси,
+    # даже когда сервер запущен без --proxy-headers
+    app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.FORWARDED_ALLOW_IPS)
 app.include_router(reg_router)
 app.include_router(board_router)
 app.include_router(profile_router)
 app.include_router(image_router)
+app.include_router(metrics_router)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -44,6 +87,9 @@ scheduler.add_job(
     seconds=30,  # проверяем каждые 30 секунд
     kwargs={'session': async_session_maker()}
 )
+# Удаление объектов S3 из очереди и поиск объектов без ссылок
+scheduler.add_job(media_cleaner.purge, 'interval', seconds=settings.MEDIA_PURGE_INTERVAL)
+scheduler.add_job(media_cleaner.collect_orphans, 'interval', seconds=settings.MEDIA_GC_INTERVAL)
 scheduler.start()
 
 @app.get("/", response_class=HTMLResponse)
@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Set
+
+from sqlalchemy import delete, func, select, true, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.src.conf.storage_backend import StorageBackend
+from backend.src.conf.s3_storages import media_storage
+from config import settings
+from models import Image, ImageBoard, PendingDeletion, StoredBlob
+
+logger = logging.getLogger(__name__)
+
+
+async def referenced_keys(keys: Iterable[str], session: AsyncSession) -> Set[str]:
+    """
+    Ключи из `keys`, на которые еще ссылаются изображения, счетчики объектов
+    или их уменьшенные копии.
+    """
+    keys = list(keys)
+    if not keys:
+        return set()
+    queries = [
+        select(StoredBlob.key).where(StoredBlob.key.in_(keys)),
+        select(Image.file).where(Image.file.in_(keys)),
+        select(ImageBoard.file).where(ImageBoard.file.in_(keys)),
+    ]
+    for model in (StoredBlob, Image, ImageBoard):
+        variant = func.json_each_text(model.variants).table_valued("value")
+        queries.append(
+            select(variant.c.value).select_from(model).join(variant, true()).where(variant.c.value.in_(keys))
+        )
+    result = await session.execute(union(*queries))
+    return set(result.scalars().all())
+
+
+class MediaCleaner:
+    """
+    Удаление ненужных объектов S3 в фоне.
+
+    purge() разбирает очередь PendingDeletion пачками по batch_size ключей:
+    пачка блокируется через SELECT ... FOR UPDATE SKIP LOCKED, ключи, на которые
+    снова появились ссылки, пропускаются, остальные удаляются одним запросом
+    DeleteObjects. Загрузка того же файла снимает его запись из очереди и ждет
+    конца транзакции очистки, поэтому свежий объект не удаляется.
+
+    collect_orphans() сверяет листинг бакета с таблицами и ставит в очередь
+    объекты без ссылок старше grace_period (например, после сбоя между PUT и
+    коммитом или брошенные прямые загрузки).
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        storage: StorageBackend,
+        batch_size: int = 1000,
+        grace_period: float = 86400,
+    ):
+        self.session_maker = session_maker
+        self.storage = storage
+        self.batch_size = max(1, min(batch_size, storage.delete_batch_size))
+        self.grace_period = grace_period
+
+    async def purge_once(self) -> tuple[int, int]:
+        """
+        Обрабатывает одну пачку очереди. Возвращает число обработанных записей
+        и число ключей, которые не удалось удалить (они остаются в очереди).
+        """
+        async with self.session_maker() as session:
+            async with session.begin():
+                rows = (await session.execute(
+                    select(PendingDeletion.id, PendingDeletion.key)
+                    .order_by(PendingDeletion.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )).all()
+                if not rows:
+                    return 0, 0
+
+                keys = [row.key for row in rows]
+                referenced = await referenced_keys(keys, session)
+                failed = set(await self.storage.delete_objects(key for key in keys if key not in referenced))
+                if failed:
+                    logger.error(f"Failed to delete {len(failed)} objects, will retry: {sorted(failed)[:10]}")
+                done = [row.id for row in rows if row.key not in failed]
+                if done:
+                    await session.execute(delete(PendingDeletion).where(PendingDeletion.id.in_(done)))
+        return len(rows), len(failed)
+
+    async def purge(self) -> int:
+        """
+        Разбирает очередь до конца. Возвращает число удаленных записей.
+        """
+        purged = 0
+        while True:
+            processed, failed = await self.purge_once()
+            purged += processed - failed
+            # Неудавшиеся ключи остаются в начале очереди: повтор - в следующий запуск
+            if processed < self.batch_size or failed:
+                break
+        if purged:
+            logger.info(f"Purged {purged} pending object deletions")
+        return purged
+
+    async def collect_orphans(self) -> int:
+        """
+        Ставит в очередь объекты бакета, на которые нет ссылок. Возвращает их число.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_period)
+        queued = 0
+        async for page in self.storage.list_objects():
+            candidates = [key for key, modified in page if modified < cutoff]
+            if not candidates:
+                continue
+            async with self.session_maker() as session:
+                async with session.begin():
+                    referenced = await referenced_keys(candidates, session)
+                    orphans = [key for key in candidates if key not in referenced]
+                    if orphans:
+                        result = await session.execute(
+                            pg_insert(PendingDeletion)
+                            .values([{"key": key} for key in orphans])
+                            .on_conflict_do_nothing(index_elements=[PendingDeletion.key])
+                            .returning(PendingDeletion.key)
+                        )
+                        queued += len(result.all())
+        if queued:
+            logger.info(f"Queued {queued} orphaned objects for deletion")
+        return queued
+
+
+def create_media_cleaner(session_maker: async_sessionmaker) -> MediaCleaner:
+    return MediaCleaner(
+        session_maker=session_maker,
+        storage=media_storage,
+        batch_size=settings.MEDIA_PURGE_BATCH_SIZE,
+        grace_period=settings.MEDIA_GC_GRACE_PERIOD,
+    )
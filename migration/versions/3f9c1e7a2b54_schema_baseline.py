@@ -0,0 +1,191 @@
+"""Schema baseline
+
+Revision ID: 3f9c1e7a2b54
+Revises: 192a47cc8b64, 6ece1f7e9dd6
+Create Date: 2026-10-19 12:00:00.000000
+
+Сливает две старые ветки миграций и приводит базу к текущей схеме моделей.
+Все операции идемпотентны: базы, созданные через metadata.create_all, и базы,
+прошедшие старую цепочку, после этой ревизии имеют одинаковую схему.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1e7a2b54'
+down_revision: Union[str, None] = ('192a47cc8b64', '6ece1f7e9dd6')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamps():
+    return [
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def _create_table_if_missing(tables, name, *columns) -> None:
+    if name not in tables:
+        op.create_table(name, *columns)
+
+
+def _add_column_if_missing(inspector, tables, table_name, column) -> None:
+    if table_name not in tables:
+        return
+    existing = {c['name'] for c in inspector.get_columns(table_name)}
+    if column.name not in existing:
+        op.add_column(table_name, column)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    _create_table_if_missing(
+        tables, 'users',
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('reminder_lead_minutes', sa.Integer(), nullable=True),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    _create_table_if_missing(
+        tables, 'outboxemails',
+        sa.Column('recipient', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('body', sa.String(), nullable=False),
+        sa.Column('dedup_key', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedup_key'),
+    )
+    _create_table_if_missing(
+        tables, 'boards',
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('content', sa.JSON(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'images',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('file', sa.String(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'issuedjwttokens',
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.String(length=36), nullable=False),
+        sa.Column('revoked', sa.Boolean(), nullable=False),
+        sa.Column('expired_time', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['subject_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('jti', 'id'),
+    )
+    _create_table_if_missing(
+        tables, 'board_collaborators',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('board_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['board_id'], ['boards.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'board_id'),
+    )
+    _create_table_if_missing(
+        tables, 'imageboards',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('file', sa.String(), nullable=True),
+        sa.Column('board_id', sa.Integer(), nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['board_id'], ['boards.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'todolists',
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('deadline', sa.DateTime(), nullable=True),
+        sa.Column('reminded_deadline', sa.DateTime(), nullable=True),
+        sa.Column('board_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['board_id'], ['boards.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'user_image_association',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('image_id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['image_id'], ['images.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'image_id'),
+    )
+    _create_table_if_missing(
+        tables, 'tasks',
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('deadline', sa.DateTime(), nullable=True),
+        sa.Column('todo_list_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['todo_list_id'], ['todolists.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'notifications',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('message', sa.String(), nullable=False),
+        sa.Column('send_at', sa.DateTime(), nullable=False),
+        sa.Column('sent', sa.Boolean(), nullable=False),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_table_if_missing(
+        tables, 'user_notification_association',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'notification_id'),
+    )
+
+    # Колонки, добавленные в модели после старых ревизий
+    _add_column_if_missing(inspector, tables, 'users', sa.Column('reminder_lead_minutes', sa.Integer(), nullable=True))
+    _add_column_if_missing(inspector, tables, 'todolists', sa.Column('reminded_deadline', sa.DateTime(), nullable=True))
+    _add_column_if_missing(inspector, tables, 'tasks', sa.Column('deadline', sa.DateTime(), nullable=True))
+    _add_column_if_missing(
+        inspector, tables, 'issuedjwttokens',
+        sa.Column('expired_time', sa.Integer(), server_default='0', nullable=False),
+    )
+
+    # У задачи теперь может быть несколько напоминаний
+    if 'notifications' in tables:
+        for constraint in inspector.get_unique_constraints('notifications'):
+            if constraint['column_names'] == ['task_id']:
+                op.drop_constraint(constraint['name'], 'notifications', type_='unique')
+
+
+def downgrade() -> None:
+    # Базовая ревизия только выравнивает схему; откат к двум старым веткам не поддерживается
+    pass
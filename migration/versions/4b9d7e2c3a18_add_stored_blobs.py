@@ -0,0 +1,50 @@
+"""Add stored blobs with reference counts
+
+Revision ID: 4b9d7e2c3a18
+Revises: e2b8f4a61c05
+Create Date: 2026-10-19 15:00:00.000000
+
+Таблица storedblobs хранит по строке на объект в S3 и число изображений,
+которые на него ссылаются. Счетчики заполняются по текущим images.file и
+imageboards.file, поэтому уже загруженные объекты тоже удаляются только
+вместе с последней ссылкой.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9d7e2c3a18'
+down_revision: Union[str, None] = 'e2b8f4a61c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'storedblobs' not in inspector.get_table_names():
+        op.create_table(
+            'storedblobs',
+            sa.Column('key', sa.String(), nullable=False),
+            sa.Column('ref_count', sa.Integer(), nullable=False),
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('key'),
+        )
+
+    op.execute(
+        "INSERT INTO storedblobs (key, ref_count) "
+        "SELECT file, count(*) FROM ("
+        "SELECT file FROM images WHERE file IS NOT NULL "
+        "UNION ALL SELECT file FROM imageboards WHERE file IS NOT NULL"
+        ") AS refs GROUP BY file "
+        "ON CONFLICT (key) DO UPDATE SET ref_count = EXCLUDED.ref_count"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('storedblobs')
@@ -0,0 +1,76 @@
+"""Add indexes on deadline, notification and foreign-key columns
+
+Revision ID: 8a4d2c6e1f93
+Revises: 3f9c1e7a2b54
+Create Date: 2026-10-19 12:10:00.000000
+
+Индексы строятся через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись
+в рабочие таблицы. CONCURRENTLY нельзя выполнять внутри транзакции, поэтому
+ревизия работает в autocommit_block. Индекс, оставшийся INVALID после
+прерванной сборки, удаляется и строится заново. Частичные индексы покрывают
+только строки, которые реально ищет планировщик: неотправленные напоминания,
+незавершенные задачи, письма в очереди.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d2c6e1f93'
+down_revision: Union[str, None] = '3f9c1e7a2b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ('ix_todolists_deadline', 'todolists', ['deadline'], 'deadline IS NOT NULL'),
+    ('ix_tasks_deadline_open', 'tasks', ['deadline'], 'completed = false'),
+    ('ix_notifications_send_at_pending', 'notifications', ['send_at'], 'sent = false'),
+    ('ix_outboxemails_pending', 'outboxemails', ['next_attempt_at'], "status = 'pending'"),
+    ('ix_boards_user_id', 'boards', ['user_id'], None),
+    ('ix_todolists_board_id', 'todolists', ['board_id'], None),
+    ('ix_tasks_todo_list_id', 'tasks', ['todo_list_id'], None),
+    ('ix_images_user_id', 'images', ['user_id'], None),
+    ('ix_imageboards_board_id', 'imageboards', ['board_id'], None),
+    ('ix_issuedjwttokens_subject_id', 'issuedjwttokens', ['subject_id'], None),
+    ('ix_notifications_task_id', 'notifications', ['task_id'], None),
+    ('ix_board_collaborators_board_id', 'board_collaborators', ['board_id'], None),
+    ('ix_user_notification_association_notification_id', 'user_notification_association', ['notification_id'], None),
+]
+
+
+def drop_invalid_index(name: str) -> None:
+    """
+    Удаляет индекс, оставшийся INVALID после прерванного CREATE INDEX
+    CONCURRENTLY: иначе if_not_exists молча сохранил бы его, а планировщик
+    такой индекс не использует.
+    """
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            drop_invalid_index(name)
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,34 @@
+"""Add image variants
+
+Revision ID: 9c3e5f1a7d26
+Revises: 4b9d7e2c3a18
+Create Date: 2026-10-19 16:00:00.000000
+
+Ключи уменьшенных копий изображений по ширине. У изображений, загруженных
+до этой ревизии, копий нет: шаблоны отдают им только исходный файл.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5f1a7d26'
+down_revision: Union[str, None] = '4b9d7e2c3a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('images', 'imageboards', 'storedblobs')
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if 'variants' not in {c['name'] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'variants')
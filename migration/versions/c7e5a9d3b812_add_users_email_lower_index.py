@@ -0,0 +1,43 @@
+"""Add unique index on lower(users.email)
+
+Revision ID: c7e5a9d3b812
+Revises: 8a4d2c6e1f93
+Create Date: 2026-10-19 13:00:00.000000
+
+Почты сохраняются в нижнем регистре, поэтому существующие строки уже
+удовлетворяют индексу. Индекс строится CONCURRENTLY вне транзакции;
+индекс, оставшийся INVALID после прерванной сборки, удаляется и строится заново.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e5a9d3b812'
+down_revision: Union[str, None] = '8a4d2c6e1f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        invalid = op.get_bind().execute(
+            sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('uq_users_email_lower')")
+        ).scalar()
+        if invalid:
+            op.drop_index('uq_users_email_lower', postgresql_concurrently=True)
+        op.create_index(
+            'uq_users_email_lower',
+            'users',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_users_email_lower', table_name='users', postgresql_concurrently=True, if_exists=True)
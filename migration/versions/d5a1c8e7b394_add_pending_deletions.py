@@ -0,0 +1,37 @@
+"""Add pending deletions
+
+Revision ID: d5a1c8e7b394
+Revises: 9c3e5f1a7d26
+Create Date: 2026-10-19 17:00:00.000000
+
+Очередь ключей S3 на удаление фоновой задачей.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1c8e7b394'
+down_revision: Union[str, None] = '9c3e5f1a7d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'pendingdeletions' not in inspector.get_table_names():
+        op.create_table(
+            'pendingdeletions',
+            sa.Column('key', sa.String(), nullable=False),
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('key'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('pendingdeletions')
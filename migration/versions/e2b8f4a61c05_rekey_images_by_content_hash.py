@@ -0,0 +1,164 @@
+"""Rekey stored images by content hash
+
+Revision ID: e2b8f4a61c05
+Revises: c7e5a9d3b812
+Create Date: 2026-10-19 14:00:00.000000
+
+Переносит объекты со старыми ключами вида "Users/avatar_3.webp" на ключи
+"<каталог>/<sha256 содержимого>.<расширение>" и обновляет images.file и
+imageboards.file. Для старых объектов хеш считается по сохраненному файлу
+(исходник уже недоступен), поэтому их ключ не совпадет с ключом повторной
+загрузки того же исходника - это влияет только на дедупликацию.
+
+Каждый ключ обрабатывается отдельно в autocommit: копия объекта, обновление
+строк, удаление старого объекта. Прерванную миграцию можно запустить снова:
+уже перенесенные ключи пропускаются. Объекты, которых нет в хранилище,
+остаются со старым ключом.
+
+Хранилище выбирается по STORAGE_BACKEND: s3 - бакет S3_BUCKET, local -
+файлы в LOCAL_STORAGE_DIR. С неизвестным хранилищем ключи не переносятся.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import shutil
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8f4a61c05'
+down_revision: Union[str, None] = 'c7e5a9d3b812'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(f"alembic.{revision}")
+
+CONTENT_KEY_RE = re.compile(r"^(?:.*/)?[0-9a-f]{64}(?:\.[A-Za-z0-9]+)?$")
+
+
+def _s3_client():
+    # Миграция не зависит от текущего кода хранилища: клиент собирается
+    # прямо из настроек, ACL - тот, с которым объекты загружались
+    import boto3
+    from config import settings
+
+    endpoint = settings.S3_ENDPOINT.strip().rstrip("/")
+    use_ssl = endpoint.startswith("https://")
+    domain = endpoint.split("://", 1)[-1]
+    client = boto3.client(
+        "s3",
+        endpoint_url=f"{'https' if use_ssl else 'http'}://{domain}",
+        use_ssl=use_ssl,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.S3_REGION,
+    )
+    return client, settings.S3_BUCKET, 'public-read'
+
+
+class _S3Objects:
+    def __init__(self):
+        self.client, self.bucket, self.acl = _s3_client()
+
+    def read(self, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            logger.warning(f"Skipping {key}: {e}")
+            return None
+
+    def copy(self, old_key: str, new_key: str) -> None:
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=new_key,
+            CopySource={"Bucket": self.bucket, "Key": old_key},
+            ACL=self.acl,
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class _LocalObjects:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except OSError as e:
+            logger.warning(f"Skipping {key}: {e}")
+            return None
+
+    def copy(self, old_key: str, new_key: str) -> None:
+        shutil.copyfile(self._path(old_key), self._path(new_key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def _object_store():
+    """
+    Хранилище объектов по STORAGE_BACKEND; None, если оно неизвестно.
+    """
+    from config import settings
+
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "s3":
+        return _S3Objects()
+    if backend == "local":
+        return _LocalObjects(settings.LOCAL_STORAGE_DIR)
+    return None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    keys = bind.execute(sa.text(
+        "SELECT file FROM images WHERE file IS NOT NULL "
+        "UNION SELECT file FROM imageboards WHERE file IS NOT NULL"
+    )).scalars().all()
+    keys = [key for key in keys if not CONTENT_KEY_RE.match(key)]
+    if not keys:
+        return
+
+    objects = _object_store()
+    if objects is None:
+        logger.warning(f"Unknown storage backend, {len(keys)} images keep their old keys")
+        return
+    with op.get_context().autocommit_block():
+        for old_key in keys:
+            body = objects.read(old_key)
+            if body is None:
+                continue
+
+            directory = posixpath.dirname(old_key)
+            extension = os.path.splitext(old_key)[1].lower()
+            new_key = f"{directory + '/' if directory else ''}{hashlib.sha256(body).hexdigest()}{extension}"
+
+            objects.copy(old_key, new_key)
+            for table in ("images", "imageboards"):
+                bind.execute(
+                    sa.text(f"UPDATE {table} SET file = :new_key WHERE file = :old_key"),
+                    {"new_key": new_key, "old_key": old_key},
+                )
+            objects.delete(old_key)
+            logger.info(f"Rekeyed {old_key} -> {new_key}")
+
+
+def downgrade() -> None:
+    # Новые ключи остаются рабочими и после отката схемы
+    pass
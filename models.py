@@ -7,7 +7,9 @@
     ForeignKey,
     JSON,
     Table,
+    Index,
     func,
+    text,
 )
 from sqlalchemy.orm import (
     DeclarativeBase,
@@ -51,6 +53,7 @@ board_collaborators = Table(
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
     Column("board_id", Integer, ForeignKey("boards.id"), primary_key=True),
+    Index("ix_board_collaborators_board_id", "board_id"),
 )
 
 
@@ -63,6 +66,7 @@ user_notification_association = Table(
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
     Column("notification_id", Integer, ForeignKey("notifications.id"), primary_key=True),
+    Index("ix_user_notification_association_notification_id", "notification_id"),
 )
 
 
@@ -83,9 +87,16 @@ user_image_association = Table(
 # =============================
 
 class User(Base):
+    __table_args__ = (
+        # Почта сравнивается без учета регистра; индекс используется в проверках существования
+        Index("uq_users_email_lower", func.lower(text("email")), unique=True),
+    )
+
     username: Mapped[str] = mapped_column(String, nullable=False)
     email: Mapped[str] = mapped_column(String, unique=True, nullable=False)
     password: Mapped[str] = mapped_column(String, nullable=False)
+    # За сколько минут до дедлайна напоминать (None - значение по умолчанию из настроек)
+    reminder_lead_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     # Доски, которыми владеет
     owned_boards: Mapped[List["Board"]] = relationship(
@@ -129,7 +140,7 @@ class User(Base):
 class Board(Base):
     title: Mapped[str] = mapped_column(String, nullable=False)
     content: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
 
     owner: Mapped["User"] = relationship(
         "User",
@@ -166,7 +177,9 @@ class Image(Base):
     id: Mapped[UUID] = mapped_column(pgUUID(as_uuid=True), primary_key=True, default=uuid4)
 
     file: Mapped[Optional[str]] = mapped_column(String, nullable=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    # Ключи уменьшенных копий по ширине в пикселях, включая сам file
+    variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
     user: Mapped["User"] = relationship("User", secondary=user_image_association, back_populates="images", lazy="joined")
     
     @property
@@ -175,8 +188,8 @@ class Image(Base):
 
     @property
     def url(self):
-        from config import settings
-        return f"{settings.S3_ENDPOINT}/{settings.S3_BUCKET}/{self.file}"
+        # Для приватного бакета None: ссылку подписывает storage.generate_urls
+        return self.storage.public_url(self.file)
 
 
     
@@ -184,7 +197,7 @@ class Image(Base):
 
 class IssuedJWTToken(Base):
     jti: Mapped[str] = mapped_column(String(36), primary_key=True)
-    subject_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    subject_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     subject: Mapped["User"] = relationship("User", back_populates="tokens", lazy="joined")
 
     device_id: Mapped[str] = mapped_column(String(36))
@@ -194,10 +207,16 @@ class IssuedJWTToken(Base):
 
 
 class ToDoList(Base):
+    __table_args__ = (
+        Index("ix_todolists_deadline", "deadline", postgresql_where=text("deadline IS NOT NULL")),
+    )
+
     title: Mapped[str] = mapped_column(String, nullable=True)
     deadline: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Дедлайн, о котором уже отправлено напоминание
+    reminded_deadline: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
-    board_id: Mapped[int] = mapped_column(ForeignKey('boards.id'), nullable=False)
+    board_id: Mapped[int] = mapped_column(ForeignKey('boards.id'), nullable=False, index=True)
     board: Mapped["Board"] = relationship("Board", back_populates="todo_lists", lazy="joined")
 
     tasks: Mapped[List["Task"]] = relationship(
@@ -212,8 +231,10 @@ class ImageBoard(Base):
     
     id: Mapped[UUID] = mapped_column(pgUUID, primary_key=True, default=uuid.uuid4)
     file: Mapped[str] = mapped_column(FilePath(_file_storage), nullable=True)
+    # Ключи уменьшенных копий по ширине в пикселях, включая сам file
+    variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
 
-    board_id: Mapped[int] = mapped_column(Integer, ForeignKey("boards.id"))
+    board_id: Mapped[int] = mapped_column(Integer, ForeignKey("boards.id"), index=True)
     board: Mapped["Board"] = relationship("Board", back_populates="images", lazy="joined")
 
     @property
@@ -222,31 +243,39 @@ class ImageBoard(Base):
 
     @property
     def url(self):
-        from config import settings
-        return f"http://{settings.MINIO_DOMAIN}/{settings.MINIO_MEDIA_BUCKET}/{self.file}"
+        # Для приватного бакета None: ссылку подписывает storage.generate_urls
+        return self.storage.public_url(self.file)
 
 class Task(Base):
+    __table_args__ = (
+        Index("ix_tasks_deadline_open", "deadline", postgresql_where=text("completed = false")),
+    )
+
     title: Mapped[str] = mapped_column(String, nullable=False)
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
     deadline: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
-    todo_list_id: Mapped[int] = mapped_column(ForeignKey("todolists.id"), nullable=False)
+    todo_list_id: Mapped[int] = mapped_column(ForeignKey("todolists.id"), nullable=False, index=True)
     todo_list: Mapped["ToDoList"] = relationship("ToDoList", back_populates="tasks", lazy="joined")
 
-    # Связь "один-ко-одному" с Notification
-    notification: Mapped["Notification"] = relationship(
+    # Напоминания о дедлайне задачи (по одному на каждое время отправки)
+    notifications: Mapped[List["Notification"]] = relationship(
         "Notification",
         back_populates="task",
-        uselist=False,
-        lazy="joined"
+        cascade="all, delete-orphan",
+        lazy="select"
     )
 
 
 class Notification(Base):
+    __table_args__ = (
+        Index("ix_notifications_send_at_pending", "send_at", postgresql_where=text("sent = false")),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
-    # Связь "один-ко-одному" с Task
-    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"), unique=True, nullable=False)
-    task: Mapped["Task"] = relationship("Task", back_populates="notification", lazy="joined")
+    # Связь "многие-к-одному" с Task
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id"), nullable=False, index=True)
+    task: Mapped["Task"] = relationship("Task", back_populates="notifications", lazy="joined")
 
     message: Mapped[str] = mapped_column(String, nullable=False)
     send_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -260,3 +289,46 @@ class Notification(Base):
         lazy="joined"
     )
 
+
+class OutboxEmail(Base):
+    """
+    Исходящее письмо. Записывается в той же транзакции, что и бизнес-изменение,
+    и отправляется воркером из mail_outbox.
+    """
+    __table_args__ = (
+        Index("ix_outboxemails_pending", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
+
+    recipient: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(String, nullable=False)
+
+    # Ключ идемпотентности: повторная постановка того же письма игнорируется
+    dedup_key: Mapped[Optional[str]] = mapped_column(String, unique=True, nullable=True)
+
+    # pending -> sent | failed
+    status: Mapped[str] = mapped_column(String, default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class StoredBlob(Base):
+    """
+    Объект в S3 и число изображений (Image, ImageBoard), которые на него ссылаются.
+    Ключ объекта зависит от содержимого, поэтому повторная загрузка того же файла
+    только увеличивает ref_count; объект удаляется вместе с последней ссылкой.
+    """
+    key: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Уменьшенные копии объекта; удаляются вместе с ним
+    variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+
+class PendingDeletion(Base):
+    """
+    Ключ объекта S3, который больше не нужен. Объекты удаляются фоновой
+    задачей пачками (media_cleanup.purge_pending_deletions), а не в запросе.
+    """
+    key: Mapped[str] = mapped_column(String, unique=True, nullable=False)
@@ -0,0 +1,131 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, union
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import Board, Notification, Task, ToDoList, User, board_collaborators, user_notification_association
+
+logger = logging.getLogger(__name__)
+
+
+def _board_members(board_id: int):
+    """
+    Подзапрос с ID владельца и всех участников доски.
+    """
+    return union(
+        select(Board.user_id.label("user_id")).where(Board.id == board_id),
+        select(board_collaborators.c.user_id.label("user_id")).where(board_collaborators.c.board_id == board_id),
+    ).subquery()
+
+
+async def plan_task_reminders(
+    task_id: int,
+    title: str,
+    deadline: Optional[datetime],
+    board_id: int,
+    session: AsyncSession,
+) -> int:
+    """
+    Создает напоминания о дедлайне задачи для всех участников доски.
+
+    Участники группируются по времени отправки (дедлайн минус их reminder_lead_minutes),
+    на каждое время создается одна запись Notification. Все записи notifications и
+    user_notification_association вставляются двумя многострочными INSERT. Коммит
+    выполняет вызывающий код.
+
+    :param task_id: ID задачи.
+    :param title: Название задачи для текста напоминания.
+    :param deadline: Дедлайн задачи; если None, ничего не создается.
+    :param board_id: ID доски, участникам которой отправляются напоминания.
+    :param session: Асинхронная сессия SQLAlchemy.
+    :return: Количество созданных записей Notification.
+    :raises RuntimeError: Если произошла ошибка базы данных.
+    """
+    if deadline is None:
+        return 0
+    try:
+        members = _board_members(board_id)
+        result = await session.execute(
+            select(User.id, User.reminder_lead_minutes).join(members, members.c.user_id == User.id)
+        )
+        board_title = await session.scalar(select(Board.title).where(Board.id == board_id))
+
+        now = datetime.now()
+        users_by_send_at: Dict[datetime, List[int]] = {}
+        for user_id, lead_minutes in result.all():
+            if lead_minutes is None:
+                lead_minutes = settings.NOTIFICATION_DEFAULT_LEAD_MINUTES
+            send_at = deadline - timedelta(minutes=lead_minutes)
+            if send_at > now:
+                users_by_send_at.setdefault(send_at, []).append(user_id)
+        if not users_by_send_at:
+            return 0
+
+        message = f'Задача "{title}" должна быть выполнена к {deadline.strftime("%d.%m %H:%M")}. Доска: {board_title}'
+        result = await session.execute(
+            insert(Notification)
+            .values([
+                {"task_id": task_id, "message": message, "send_at": send_at, "sent": False}
+                for send_at in users_by_send_at
+            ])
+            .returning(Notification.id, Notification.send_at)
+        )
+        associations = [
+            {"user_id": user_id, "notification_id": notification_id}
+            for notification_id, send_at in result.all()
+            for user_id in users_by_send_at[send_at]
+        ]
+        await session.execute(insert(user_notification_association).values(associations))
+        return len(users_by_send_at)
+    except SQLAlchemyError as e:
+        logger.error(f"Error planning reminders for task_id={task_id}: {e}")
+        raise RuntimeError("An error occurred while planning reminders.") from e
+
+
+async def cancel_task_reminders(task_ids: List[int], session: AsyncSession) -> None:
+    """
+    Удаляет еще не отправленные напоминания указанных задач. Коммит выполняет вызывающий код.
+    """
+    if not task_ids:
+        return
+    pending = select(Notification.id).where(Notification.task_id.in_(task_ids), Notification.sent.is_(False))
+    await session.execute(
+        delete(user_notification_association).where(user_notification_association.c.notification_id.in_(pending))
+    )
+    await session.execute(
+        delete(Notification).where(Notification.task_id.in_(task_ids), Notification.sent.is_(False))
+    )
+
+
+async def reschedule_task_reminders(task_ids: List[int], session: AsyncSession) -> int:
+    """
+    Пересоздает неотправленные напоминания задач после изменения дедлайна.
+    Дедлайном задачи считается ее собственный дедлайн, а если его нет - дедлайн списка.
+
+    :return: Количество созданных записей Notification.
+    """
+    if not task_ids:
+        return 0
+    try:
+        await cancel_task_reminders(task_ids, session)
+        result = await session.execute(
+            select(
+                Task.id,
+                Task.title,
+                func.coalesce(Task.deadline, ToDoList.deadline).label("deadline"),
+                ToDoList.board_id,
+            )
+            .join(ToDoList, ToDoList.id == Task.todo_list_id)
+            .where(Task.id.in_(task_ids), Task.completed.is_(False))
+        )
+        planned = 0
+        for task_id, title, deadline, board_id in result.all():
+            planned += await plan_task_reminders(task_id, title, deadline, board_id, session)
+        return planned
+    except SQLAlchemyError as e:
+        logger.error(f"Error rescheduling reminders for task_ids={task_ids}: {e}")
+        raise RuntimeError("An error occurred while rescheduling reminders.") from e
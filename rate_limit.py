@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости "token bucket": `rate` токенов в секунду,
+    не больше `capacity` накопленных токенов.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire_up_to(self, tokens: int) -> int:
+        """
+        Ждет хотя бы один токен и забирает столько, сколько доступно, но не больше `tokens`.
+        """
+        while True:
+            async with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    taken = min(tokens, int(self._tokens))
+                    self._tokens -= taken
+                    return taken
+                wait = (1 - self._tokens) / self.rate
+            # Ожидание без блокировки: токен, который за это время заберет
+            # другой воркер, будет замечен при повторной проверке
+            await asyncio.sleep(wait)
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """
+        Забирает `tokens` токенов без ожидания. Возвращает False, если их не хватает.
+        """
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def release(self, tokens: int) -> None:
+        """
+        Возвращает неиспользованные токены.
+        """
+        self._tokens = min(self.capacity, self._tokens + tokens)
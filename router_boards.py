@@ -12,10 +12,10 @@ from auth.middlewares.jwt.service import check_access_token
 import time
 from database import *
 from datetime import datetime, timedelta
-from router_notification import send_email_before_deadline
-from sqlalchemy.sql import select
-from models import Notification
-from fastapi import HTTPException
+from notification_planner import plan_task_reminders
+from fastapi import BackgroundTasks, HTTPException
+from image_schemas import CompleteUploadRequest
+from router_image import check_uploaded_key
 
 templates = Jinja2Templates(directory="templates")
 
@@ -25,6 +25,18 @@ router = APIRouter(
     dependencies=[Security(check_access_token)]
 )
 
+
+def _parse_deadline(deadline_str: str | None) -> datetime | None:
+    """
+    Разбирает дедлайн в формате "%Y-%m-%d %H:%M" из тела запроса.
+    """
+    if not deadline_str:
+        return None
+    try:
+        return datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid deadline format")
+
 @router.post("/main_page/add_board")
 async def create_new_board(request: Request, boardName = Form(), session: AsyncSession = Depends(get_session)):
     """
@@ -63,15 +75,16 @@ async def board_page(board_id: str, request: Request, session: AsyncSession = De
     
     # Получаем URL последнего изображения
     image_url = None
+    image_srcset = ""
     print(user_images)
     if user_images:
         latest_image = user_images[-1]
         # Используем свойство url из ImageSchema
         image_url = latest_image.url
+        image_srcset = latest_image.srcset
     
+    # Шаблону нужны url и srcset каждого изображения
     board_images = await get_images_by_board_id(int(board_id), session=session)
-    images_url = [image.url for image in board_images]
-    print(images_url)
     return templates.TemplateResponse(
         "article.html",
         {   
@@ -81,9 +94,10 @@ async def board_page(board_id: str, request: Request, session: AsyncSession = De
             "texts": board.content["texts"],
             "todo_lists": board.todo_lists,
             "username" : user.username,
-            "board_images" : images_url,
+            "board_images" : board_images,
             "title" : board.title,
-            "image_url" : image_url
+            "image_url" : image_url,
+            "image_srcset" : image_srcset
         }
     )
 
@@ -146,54 +160,15 @@ async def add_todo_list_on_board(
     print('title', title)
     text = data.get("text")
     print('text', text)
-    deadline_str = data.get("deadline") 
-    print('deadline_str', deadline_str)
-    deadline = None
-    if deadline_str:
-        try:
-            deadline = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
-            
-            board = await get_board_with_todo_lists(int(board_id), session)
-            query = (
-                select(User)
-                .join(board_collaborators)
-                .where(board_collaborators.c.board_id == int(board_id))
-            )
-            result = await session.execute(query)
-            users = result.scalars().all()
-            
-            notification_time = deadline - timedelta(hours=24)
-            print('notification_time', notification_time)
-            print("notification_time", notification_time)
-            print("deadline", deadline) 
-            if notification_time > datetime.now():
-                for user in users:
-                    subject = f"Deadline Reminder: {text}"
-                    message = f"""
-                    <html>
-                        <body>
-                            <h2>Task Deadline Reminder</h2>
-                            <p>Your task "{text}" is due tomorrow at {deadline.strftime('%H:%M')}</p>
-                            <p>Board: {board.title}</p>
-                        </body>
-                    </html>
-                    """
-                    
-                    notification = Notification(
-                        user_id=user.id,
-                        email=user.email,
-                        subject=subject,
-                        message=message,
-                        scheduled_time=notification_time,
-                        sent=False
-                    )
-                    session.add(notification)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail="Invalid deadline format")      
+    deadline = _parse_deadline(data.get("deadline"))
+    print('deadline', deadline)
     to_do_list_id = await create_todo_list(int(board_id), title, deadline, session)
     print('to_do_list_id', to_do_list_id)
     to_do_list_new_item = await create_task(to_do_list_id, text, deadline, session)
     print('to_do_list_new_item', to_do_list_new_item)
+    if deadline:
+        await plan_task_reminders(to_do_list_new_item, text, deadline, int(board_id), session)
+        await session.commit()
     return {"to_do_list_id": to_do_list_id, "to_do_list_new_item" : to_do_list_new_item }
 
 @router.post("/main_page/{board_id}/add_to_do_list_item")
@@ -207,50 +182,7 @@ async def add_todo_list_item_on_board(
     """
     text = data.get("text")
     to_do_list_id = data.get("to_do_list_id")
-    deadline_str = data.get("deadline") 
-    
-    deadline = None
-    if deadline_str:
-        try:
-            deadline = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
-            
-            board = await get_board_with_todo_lists(int(board_id), session)
-            query = (
-                select(User)
-                .join(board_collaborators)
-                .where(board_collaborators.c.board_id == int(board_id))
-            )
-            result = await session.execute(query)
-            users = result.scalars().all()
-            
-            notification_time = deadline - timedelta(hours=24)
-            print("notification_time", notification_time)
-            print("deadline", deadline) 
-            if notification_time > datetime.now():
-                for user in users:
-                    subject = f"Deadline Reminder: {text}"
-                    message = f"""
-                    <html>
-                        <body>
-                            <h2>Task Deadline Reminder</h2>
-                            <p>Your task "{text}" is due tomorrow at {deadline.strftime('%H:%M')}</p>
-                            <p>Board: {board.title}</p>
-                        </body>
-                    </html>
-                    """
-                    
-                    notification = Notification(
-                        user_id=user.id,
-                        email=user.email,
-                        subject=subject,
-                        message=message,
-                        scheduled_time=notification_time,
-                        sent=False
-                    )
-                    session.add(notification)
-                
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail="Invalid deadline format")
+    deadline = _parse_deadline(data.get("deadline"))
     
     to_do_list_new_item = await create_task(
         int(to_do_list_id), 
@@ -258,6 +190,8 @@ async def add_todo_list_item_on_board(
         deadline=deadline, 
         session=session
     )
+    if deadline:
+        await plan_task_reminders(to_do_list_new_item, text, deadline, int(board_id), session)
     
     await session.commit()
     
@@ -278,12 +212,13 @@ async def update_todo_list_item(
     task_id = data.get("to_do_list_item_id")
     completed = data.get("completed")
     text = data.get("text")
+    deadline = _parse_deadline(data.get("deadline"))
     
     await update_task(
         task_id=int(task_id),
         new_title=text,
         completed=completed,
-        new_deadline=None,
+        new_deadline=deadline,
         session=session
     )
     return {"status": "success"}
@@ -319,21 +254,22 @@ async def delete_todo_list_on_board(
     return {"status": "success"}
 
 @router.post("/main_page/{board_id}/update_to_do_list")
-async def update_todo_list(
+async def update_todo_list_on_board(
     board_id: str,
     data: Dict = Body(...),
     session: AsyncSession = Depends(get_session)
 ):
     """
-    Updates a todo list's title
+    Updates a todo list's title and deadline
     """
     todo_list_id = data.get("to_do_list_id")
     title = data.get("title")
+    deadline = _parse_deadline(data.get("deadline"))
     
     await update_todo_list(
         todo_list_id=int(todo_list_id),
         new_title=title,
-        new_deadline=None,
+        new_deadline=deadline,
         session=session
     )
 
@@ -353,3 +289,24 @@ async def add_image_on_board(board_id: str, file: UploadFile, session: AsyncSess
     await save_image_on_board(int(board_id), file, session)
     return {'status': 'success'}    
 
+
+@router.post("/main_page/{board_id}/complete_image_upload")
+async def complete_board_image_upload(
+    board_id: str,
+    request: Request,
+    data: CompleteUploadRequest,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Добавляет на доску изображение, загруженное браузером напрямую в бакет
+    (см. /image/upload-url). Конвертация выполняется в фоне.
+    """
+    await check_uploaded_key(data.key, request.state.user.id)
+    board = await session.get(Board, int(board_id))
+    if not board:
+        raise HTTPException(status_code=404, detail="Board not found")
+    image = await save_uploaded_image(ImageBoard, data.key, session, board_id=board.id)
+    background_tasks.add_task(process_uploaded_image, ImageBoard, image.id, "Boards")
+    return {'status': 'success'}
+
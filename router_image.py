@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Security
-from fastapi.responses import JSONResponse, RedirectResponse
-from typing import Annotated
-from database import get_session, save_user_image, get_images_by_user_id, delete_image
-from image_schemas import ImageUploadResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, UploadFile, HTTPException, Security
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
+from typing import Annotated, Optional
+from database import (
+    get_session, save_user_image, get_images_by_user_id, delete_image, save_uploaded_image, process_uploaded_image,
+    replace_user_images, get_image_url as get_stored_image_url,
+)
+from image_schemas import ImageUploadResponse, PresignedUploadResponse, CompleteUploadRequest
+from models import Image
+from backend.src.conf.s3_storages import media_storage
+from backend.src.conf.media_cache import CachedFileResponse, MediaCache, is_content_key, media_cache
+import asyncio
+import mimetypes
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from auth.middlewares.jwt.service import check_access_token
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from starlette.requests import Request
 from config import settings
 
@@ -49,7 +59,8 @@ async def upload_user_image(
     """
     try:
         print(f"Uploading file: {file.filename}, size: {file.size}, content_type: {file.content_type}")
-        if file.size > 5 * 1024 * 1024:
+        # Размер известен не всегда; при чтении файла лимит проверяется еще раз
+        if file.size is not None and file.size > settings.MAX_IMAGE_UPLOAD_SIZE:
             raise HTTPException(
                 status_code=413,
                 detail="File too large. Maximum size is 5MB"
@@ -65,20 +76,18 @@ async def upload_user_image(
         user = request.state.user
         print(f"User ID: {user.id}")
 
-        list_images = await get_images_by_user_id(user_id=user.id, session=session)
-        if len(list_images) > 0:
-            for image in list_images:
-                await delete_image(image_id=image.id, session=session)
-        
         image = await save_user_image(user_id=user.id, file=file, session=session)
         print(f"Image saved: {image.id}")
+        await replace_user_images(user_id=user.id, keep_image_id=image.id, session=session)
         
-        image_url = image.url
+        image_url = await image.storage.generate_url(image.file)
         return ImageUploadResponse(
             id=image.id,
             file=image.file,
             url=image_url
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_user_image: {str(e)}")
         print(f"Error type: {type(e)}")
@@ -87,17 +96,174 @@ async def upload_user_image(
         raise HTTPException(status_code=500, detail="Internal server error") from e
     
 
+@router.post("/upload-url", response_model=PresignedUploadResponse)
+async def create_upload_url(request: Request) -> PresignedUploadResponse:
+    """
+    Выдает presigned POST для загрузки изображения из браузера напрямую в бакет.
+    После загрузки браузер вызывает /image/complete-upload или
+    /board/main_page/{board_id}/complete_image_upload с полученным key.
+    """
+    post = await media_storage.presigned_post(request.state.user.id, expiration=settings.PRESIGNED_UPLOAD_TTL)
+    return PresignedUploadResponse(**post)
+
+
+@router.post("/storage-upload", status_code=204)
+async def receive_storage_upload(request: Request) -> Response:
+    """
+    Прием формы presigned POST хранилищем, которое не принимает загрузки
+    само (локальный диск). Поля формы - из /image/upload-url, файл - в поле file.
+    """
+    form = await request.form()
+    file = form.get("file")
+    if not isinstance(file, StarletteUploadFile):
+        raise HTTPException(status_code=400, detail="File is required")
+    fields = {name: value for name, value in form.items() if isinstance(value, str)}
+    await media_storage.receive_post(fields, file)
+    return Response(status_code=204)
+
+
+async def check_uploaded_key(key: str, user_id: int) -> None:
+    """
+    Проверяет, что объект загружен этим пользователем по выданной ему политике.
+    """
+    if not key.startswith(media_storage.upload_prefix(user_id)) or ".." in key:
+        raise HTTPException(status_code=403, detail="Upload does not belong to the user")
+    if await media_storage.object_size(key) is None:
+        raise HTTPException(status_code=400, detail="File was not uploaded")
+
+
+@router.post("/complete-upload", response_model=ImageUploadResponse)
+async def complete_user_image_upload(
+    request: Request,
+    data: CompleteUploadRequest,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session)
+) -> ImageUploadResponse:
+    """
+    Делает загруженный напрямую файл фото пользователя. Конвертация
+    выполняется в фоне; до ее окончания отдается загруженный оригинал.
+    """
+    user = request.state.user
+    await check_uploaded_key(data.key, user.id)
+
+    image = await save_uploaded_image(Image, data.key, session, user_id=user.id)
+    await replace_user_images(user_id=user.id, keep_image_id=image.id, session=session)
+
+    background_tasks.add_task(process_uploaded_image, Image, image.id, "Users")
+    return ImageUploadResponse(id=image.id, file=image.file, url=await image.storage.generate_url(image.file))
+
+
 @router.get("/get-image-url/{image_id}")
 async def get_image_url(image_id: str, session: AsyncSession = Depends(get_session)):
-    url = await get_image_url(image_id, session)
+    url = await get_stored_image_url(image_id, session)
     return {"url": url}
 
+def media_file_response(
+    path: str, key: str, accel_path: Optional[str] = None, vary: bool = False, cache: Optional[MediaCache] = None,
+) -> Response:
+    """
+    Ответ с локальным файлом объекта key: через nginx (X-Accel-Redirect на
+    accel_path), если он задан, иначе чтение файла приложением.
+    vary - ответ выбран по заголовку Accept; cache - кеш, в котором файл
+    закреплен: закрепление снимается, когда файл отдан.
+    """
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable" if is_content_key(key)
+        else "public, max-age=300",
+    }
+    if vary:
+        headers["Vary"] = "Accept"
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    if accel_path:
+        headers["X-Accel-Redirect"] = accel_path
+        if cache is not None:
+            # Файл открывает nginx уже после ответа, держать закрепление незачем
+            cache.release(path)
+        return Response(headers=headers, media_type=media_type)
+    if cache is not None:
+        return CachedFileResponse(cache, path, media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def accepts_media_type(accept: str, media_type: str) -> bool:
+    """
+    Явно ли клиент принимает media_type (с q > 0). Маски image/* и */* не
+    учитываются: их присылают и браузеры без поддержки формата.
+    """
+    for item in accept.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        if name.lower() != media_type:
+            continue
+        for param in params:
+            param_name, _, value = param.partition("=")
+            if param_name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def media_candidates(file_path: str, accept: str) -> list[str]:
+    """
+    Ключи, которыми можно ответить на запрос file_path, в порядке предпочтения:
+    для WebP-изображения сначала AVIF-версия, если клиент ее принимает.
+    """
+    if file_path.endswith(".webp") and accepts_media_type(accept, "image/avif"):
+        return [media_storage.avif_key(file_path), file_path]
+    return [file_path]
+
+
 @router.get("/media/{file_path:path}")
-async def get_media(file_path: str):
+async def get_media(file_path: str, request: Request):
     """
-    Получение медиа-файла из S3
+    Получение медиа-файла из хранилища.
+
+    Локальное хранилище (STORAGE_BACKEND=local) отдает файл с диска. Для S3
+    в режиме MEDIA_PROXY_ENABLED файл отдается из локального кеша (с поддержкой
+    Range); объекты с ключом по хешу содержимого кешируются браузером навсегда.
+    Без прокси и для слишком больших файлов - редирект в хранилище.
+
+    Вместо WebP отдается AVIF-версия изображения, если она есть и клиент
+    указал image/avif в Accept; такие ответы помечаются Vary: Accept.
     """
-    url = f"{settings.S3_ENDPOINT}/{settings.S3_BUCKET}/{file_path}"
-    return RedirectResponse(url)
+    candidates = media_candidates(file_path, request.headers.get("accept", ""))
+    vary = file_path.endswith(".webp")
+
+    if media_storage.local_path(file_path) is not None:
+        for key in candidates:
+            local_path = media_storage.local_path(key)
+            if not await asyncio.to_thread(os.path.isfile, local_path):
+                continue
+            accel_path = None
+            if settings.LOCAL_STORAGE_ACCEL_PREFIX:
+                relative = os.path.relpath(local_path, media_storage.root).replace(os.sep, "/")
+                accel_path = f"{settings.LOCAL_STORAGE_ACCEL_PREFIX}{relative}"
+            return media_file_response(local_path, key, accel_path, vary)
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if not settings.MEDIA_PROXY_ENABLED:
+        return RedirectResponse(await media_storage.generate_url(file_path, direct=True))
+
+    for key in candidates[:-1]:
+        try:
+            path = await media_cache.get(key, media_storage)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            continue
+        if path is not None:
+            break
+    else:
+        key = file_path
+        path = await media_cache.get(file_path, media_storage)
+    if path is None:
+        return RedirectResponse(await media_storage.generate_url(file_path, direct=True))
+
+    accel_path = None
+    if settings.MEDIA_CACHE_ACCEL_PREFIX:
+        accel_path = f"{settings.MEDIA_CACHE_ACCEL_PREFIX}{os.path.basename(path)}"
+    return media_file_response(path, key, accel_path, vary, cache=media_cache)
 
 
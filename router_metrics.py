@@ -0,0 +1,48 @@
+import hmac
+
+from fastapi import APIRouter, HTTPException, Security
+from fastapi.security.api_key import APIKeyHeader
+
+from auth.password_hasher import password_hasher
+from backend.src.conf.image_transcoder import image_transcoder
+from backend.src.conf.media_cache import media_cache
+from config import settings
+from database import engine, pool_stats, replica_engine, uploaded_image_stats
+from mail_outbox import outbox_stats
+
+
+async def check_metrics_token(
+    authorization_header: str = Security(APIKeyHeader(name='Authorization', auto_error=False)),
+) -> None:
+    """
+    Пускает к метрикам только с общим токеном METRICS_TOKEN: они раскрывают
+    устройство пулов и кешей. Без настроенного токена эндпоинта нет.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = (authorization_header or "").removeprefix("Bearer ")
+    if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+    dependencies=[Security(check_metrics_token)]
+)
+
+
+@router.get("")
+async def get_metrics():
+    """
+    Метрики внутренних подсистем: очереди, задержки и размеры пулов.
+    """
+    return {
+        "password_hasher": password_hasher.stats(),
+        "image_transcoder": image_transcoder.stats(),
+        "media_cache": media_cache.stats(),
+        "uploaded_images": dict(uploaded_image_stats),
+        "outbox": dict(outbox_stats),
+        "database_pool": pool_stats(engine),
+        "database_replica_pool": pool_stats(replica_engine) if replica_engine is not None else None,
+    }
@@ -1,129 +1,128 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
+from collections import defaultdict
+from sqlalchemy import or_, update
 from sqlalchemy.sql import select
 from config import settings
-from models import Notification, Board, ToDoList, Task, User
+from database import enqueue_emails, get_board_recipients
+from mail_templates import render_deadline_digest, render_deadline_email, render_register_email
+from models import Notification, Board, ToDoList, Task, User, user_notification_association
 
-def send_email_after_register(email, subject, message):
-    try:
-        # Создаем объект MIMEMultipart
-        msg = MIMEMultipart()
-        msg['From'] = settings.GMAIL_FROM
-        msg['To'] = email
-        msg['Subject'] = subject
-
-        # Добавляем HTML-контент
-        html_message = f"""
-        <html>
-            <body>
-                <h1>Привет!</h1>
-                <p>Ты успешно зарегистрировался в MindSpace.</p>
-                <p>Теперь ты можешь начать использовать нашу платформу для управления задачами и проектами.</p>
-                <p>Если у тебя возникнут вопросы или нужна помощь, обращайся к нам.</p>
-                <p>Спасибо, что выбрал MindSpace!</p>
-            </body>
-        </html>
-        """
-        msg.attach(MIMEText(html_message, 'html'))
-
-        # Создаем SMTP-соединение
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        
-        # Логинимся
-        server.login(settings.GMAIL_FROM, settings.GMAIL_PASSWORD)
-        
-        # Отправляем письмо
-        server.send_message(msg)
-        
-        # Закрываем соединение
-        server.quit()
-        
-        return True
-    except Exception as e:
-        print(f"Ошибка при отправке email: {str(e)}")
-        return False
 
+async def queue_email_after_register(email, subject, message, session: AsyncSession):
+    """
+    Ставит приветственное письмо в outbox. Коммит выполняет вызывающий код,
+    вместе с созданием пользователя.
+    """
+    await enqueue_emails([{
+        "recipient": email,
+        "subject": subject,
+        "body": render_register_email(),
+        "dedup_key": f"register:{email.lower()}",
+    }], session)
 
-def send_email_before_deadline(email, subject, message):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = settings.GMAIL_FROM
-        msg['To'] = email
-        msg['Subject'] = subject
-
-        # Обновляем HTML-контент для уведомления о дедлайне
-        html_message = f"""
-        <html>
-            <body>
-                <h1>Уведомление о дедлайне!</h1>
-                <p>{message}</p>
-                <p>Пожалуйста, проверьте вашу задачу.</p>
-            </body>
-        </html>
-        """
-        msg.attach(MIMEText(html_message, 'html'))
 
-        # Создаем SMTP-соединение
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        
-        # Логинимся
-        server.login(settings.GMAIL_FROM, settings.GMAIL_PASSWORD)
-        
-        # Отправляем письмо
-        server.send_message(msg)
-        
-        # Закрываем соединение
-        server.quit()
-        
-        return True
-    except Exception as e:
-        print(f"Ошибка при отправке email: {str(e)}")
-        return False
+async def queue_email_before_deadline(email, subject, message, session: AsyncSession, dedup_key=None):
+    """
+    Ставит письмо о дедлайне в outbox. Коммит выполняет вызывающий код.
+    """
+    await enqueue_emails([{
+        "recipient": email,
+        "subject": subject,
+        "body": render_deadline_email(message),
+        "dedup_key": dedup_key,
+    }], session)
 
 
 async def check_and_send_notifications(session: AsyncSession):
     """
-    Проверяет TodoLists с приближающимися дедлайнами и отправляет уведомления
+    Проверяет TodoLists с приближающимися дедлайнами и запланированные напоминания
+    (Notification), срок отправки которых наступил, и ставит письма в outbox.
+
+    В режиме дайджеста (settings.NOTIFICATION_DIGEST_ENABLED) все напоминания получателя
+    за окно NOTIFICATION_DIGEST_WINDOW_MINUTES попадают в одно письмо. Отобранные строки
+    блокируются (SKIP LOCKED) и помечаются отправленными в той же транзакции, поэтому
+    повторный запуск не отправит напоминание еще раз.
     """
     try:
-        # Получаем текущее время
         now = datetime.now()
-        # Получаем время через 1 минуту
-        deadline_before = now + timedelta(minutes=1)
-        
-        # Получаем все доски с их todo-листами, у которых скоро дедлайн
+        deadline_before = now + timedelta(minutes=settings.NOTIFICATION_DIGEST_WINDOW_MINUTES)
+
         query = (
-            select(Board)
-            .join(Board.todo_lists)
+            select(
+                ToDoList.id,
+                ToDoList.title,
+                ToDoList.deadline,
+                ToDoList.board_id,
+                Board.title.label("board_title"),
+            )
+            .join(Board, Board.id == ToDoList.board_id)
             .where(
                 ToDoList.deadline <= deadline_before,
                 ToDoList.deadline > now,  # только будущие дедлайны
+                or_(ToDoList.reminded_deadline.is_(None), ToDoList.reminded_deadline != ToDoList.deadline),
             )
+            .order_by(ToDoList.deadline)
+            .with_for_update(of=ToDoList, skip_locked=True)
         )
-        
         result = await session.execute(query)
-        boards = result.unique().scalars().all()
-        
-        for board in boards:
-            for todo_list in board.todo_lists:
-                if todo_list.deadline and now < todo_list.deadline <= deadline_before:
-                    # Получаем email владельца доски
-                    owner = await session.get(User, board.user_id)
-                    if owner:
-                        subject = "Приближается дедлайн списка задач!"
-                        message = f"Список задач '{todo_list.title}' должен быть выполнен через 1 минуту!"
-                        send_email_before_deadline(owner.email, subject, message)
-                        
-                        # Отправляем уведомления всем участникам доски
-                        for collaborator in board.collaborators:
-                            if collaborator.id != owner.id:  # не отправляем повторно владельцу
-                                send_email_before_deadline(collaborator.email, subject, message)
-        
+        due_lists = result.all()
+
+        query = (
+            select(Notification.id, Notification.message, User.email)
+            .join(user_notification_association, user_notification_association.c.notification_id == Notification.id)
+            .join(User, User.id == user_notification_association.c.user_id)
+            .where(Notification.sent.is_(False), Notification.send_at <= deadline_before)
+            .order_by(Notification.send_at)
+            .with_for_update(of=Notification, skip_locked=True)
+        )
+        result = await session.execute(query)
+        due_notifications = result.all()
+
+        if not due_lists and not due_notifications:
+            await session.commit()
+            return
+
+        messages_by_recipient = defaultdict(list)
+        recipients = await get_board_recipients(list({item.board_id for item in due_lists}), session)
+        for item in due_lists:
+            message = (f"Список задач '{item.title}' ({item.board_title}) должен быть выполнен "
+                       f"к {item.deadline.strftime('%d.%m %H:%M')}!")
+            for email in recipients.get(item.board_id, []):
+                messages_by_recipient[email].append(message)
+        for notification in due_notifications:
+            messages_by_recipient[notification.email].append(notification.message)
+
+        emails = []
+        for email, messages in messages_by_recipient.items():
+            if settings.NOTIFICATION_DIGEST_ENABLED:
+                subject = "Приближается дедлайн!" if len(messages) == 1 \
+                    else f"Приближаются дедлайны: {len(messages)}"
+                emails.append({"recipient": email, "subject": subject, "body": render_deadline_digest(messages)})
+                continue
+            for message in messages:
+                emails.append({
+                    "recipient": email,
+                    "subject": "Приближается дедлайн!",
+                    "body": render_deadline_email(message),
+                })
+
+        # Письма отправит воркер outbox с повторами и ограничением скорости
+        await enqueue_emails(emails, session)
+        if due_lists:
+            await session.execute(
+                update(ToDoList)
+                .where(ToDoList.id.in_([item.id for item in due_lists]))
+                .values(reminded_deadline=ToDoList.deadline)
+            )
+        if due_notifications:
+            await session.execute(
+                update(Notification)
+                .where(Notification.id.in_({notification.id for notification in due_notifications}))
+                .values(sent=True)
+            )
+        await session.commit()
+
     except Exception as e:
+        await session.rollback()
         print(f"Ошибка при проверке и отправке уведомлений: {str(e)}")
-
@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import HTMLResponse
 from passlib.context import CryptContext
 from auth.middlewares.jwt.service import check_access_token
-from hashlib import sha256
+from auth.password_hasher import password_hasher
 from database import *
 from auth.service import AuthService
 from auth.middlewares.jwt.base.auth import JWTAuth
@@ -27,10 +27,6 @@ router = APIRouter(
 )
 
 
-def get_sha256_hash(line: str) -> str:
-    return sha256(str.encode(line)).hexdigest()
-
-
 @router.get("/main_page", response_class=HTMLResponse)
 async def main_page(request: Request, session: AsyncSession = Depends(get_session)):
     """
@@ -52,14 +48,16 @@ async def main_page(request: Request, session: AsyncSession = Depends(get_sessio
 
     # Получаем URL последнего изображения
     image_url = None
+    image_srcset = ""
     print(user_images)
     if user_images:
         latest_image = user_images[-1]
         # Используем свойство url из ImageSchema
         image_url = latest_image.url
+        image_srcset = latest_image.srcset
     return templates.TemplateResponse("main_page.html",
                                       {"request": request, "username": user.username, "links": context,
-                                       "image_url": image_url})
+                                       "image_url": image_url, "image_srcset": image_srcset})
 
 
 @router.post("/main_page/profile/change_name")
@@ -71,13 +69,22 @@ async def profile_page_change_name(request: Request, first_name=Form(), session:
                             status_code=status.HTTP_302_FOUND)
 
 
+@router.post("/main_page/profile/change_reminder_lead")
+async def profile_page_change_reminder_lead(request: Request, reminder_lead_minutes: int = Form(gt=0),
+                                            session: AsyncSession = Depends(get_session)):
+    user = request.state.user
+    await change_reminder_lead(int(user.id), reminder_lead_minutes, session=session)
+    return RedirectResponse("/profile/main_page/profile/",
+                            status_code=status.HTTP_302_FOUND)
+
+
 @router.post("/main_page/profile/change_password")
 async def profile_page_change_password(request: Request, old_password=Form(), new_password=Form(),
                                        session: AsyncSession = Depends(get_session)):
     user = request.state.user
     user_id = user.id
-    if user.password == get_sha256_hash(old_password):
-        await change_password(int(user_id), get_sha256_hash(new_password), session=session)
+    if await password_hasher.verify(old_password, user.password):
+        await change_password(int(user_id), await password_hasher.hash(new_password), session=session)
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Текущий пароль введен неверно!")
     return RedirectResponse("/login",
@@ -93,11 +100,13 @@ async def profile_page(request: Request, session: AsyncSession = Depends(get_ses
 
     # Получаем URL последнего изображения
     image_url = None
+    image_srcset = ""
     print(user_images)
     if user_images:
         latest_image = user_images[-1]
         # Используем свойство url из ImageSchema
         image_url = latest_image.url
+        image_srcset = latest_image.srcset
 
     print(f"Image URL: {image_url}")
 
@@ -106,7 +115,8 @@ async def profile_page(request: Request, session: AsyncSession = Depends(get_ses
         {
             "request": request,
             "username": user.username,
-            "image_url": image_url
+            "image_url": image_url,
+            "image_srcset": image_srcset
         }
     )
 
@@ -1,13 +1,12 @@
-from typing import Type
-
 from sqlalchemy.types import String, TypeDecorator
-from backend.src.conf.s3_client import S3StorageManager
+from backend.src.conf.storage_backend import StorageBackend
 
 
 class FilePath(TypeDecorator):
     impl = String
+    cache_ok = True
 
-    def __init__(self, storage: Type[S3StorageManager], *args, **kwargs):
+    def __init__(self, storage: StorageBackend, *args, **kwargs):
         self._storage = storage
         super().__init__(*args, **kwargs)
 
@@ -19,9 +18,5 @@ class FilePath(TypeDecorator):
         return value
 
     def process_result_value(self, value, dialect):
-        return value
-
-    async def async_process_result_value(self, value):
-        if value is not None:
-            return await self.storage.generate_url(value)
+        # URL строятся пачкой через storage.generate_urls, а не для каждой строки
         return value
\ No newline at end of file
@@ -0,0 +1,32 @@
+// Загрузка изображения из браузера напрямую в хранилище по presigned POST.
+// Возвращает ключ загруженного объекта для запроса завершения загрузки.
+async function uploadToStorage(file) {
+    const policyResponse = await fetch('/image/upload-url', { method: 'POST' });
+    if (!policyResponse.ok) throw new Error('Could not get upload URL');
+    const policy = await policyResponse.json();
+
+    const formData = new FormData();
+    for (const [name, value] of Object.entries(policy.fields)) {
+        formData.append(name, value);
+    }
+    // Поля политики должны идти до файла
+    formData.append('Content-Type', file.type);
+    formData.append('file', file);
+
+    const storageResponse = await fetch(policy.url, { method: 'POST', body: formData });
+    if (!storageResponse.ok) throw new Error('Upload to storage failed');
+    return policy.key;
+}
+
+async function completeUpload(url, key) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        },
+        body: JSON.stringify({ key })
+    });
+    if (!response.ok) throw new Error('Upload failed');
+    return response.json();
+}
@@ -11,16 +11,11 @@ document.getElementById('uploadForm').addEventListener('submit', async function(
     event.preventDefault();
     const boardId = window.location.pathname.split('/')[3];
 
-    const formData = new FormData(this);
+    const file = document.getElementById('file_input').files[0];
+    if (!file) return;
     try {
-        const response = await fetch(`/board/main_page/${boardId}/add_image`, {
-            method: 'POST',
-            body: formData
-        });
-
-        if (!response.ok) throw new Error('Upload failed');
-
-        const result = await response.json();
+        const key = await uploadToStorage(file);
+        const result = await completeUpload(`/board/main_page/${boardId}/complete_image_upload`, key);
         console.log('Upload successful:', result);
 
         this.reset();
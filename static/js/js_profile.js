@@ -1,3 +1,14 @@
+function setPhoto(id, src, srcset) {
+    // srcset важнее src, поэтому при подмене фото его нужно снять или вернуть
+    const photo = document.getElementById(id);
+    photo.src = src;
+    if (srcset) {
+        photo.setAttribute('srcset', srcset);
+    } else {
+        photo.removeAttribute('srcset');
+    }
+}
+
 async function uploadImage(event) {
     event.preventDefault();
     const file = event.target.files[0];
@@ -6,17 +17,18 @@ async function uploadImage(event) {
 
     const currentMainSrc = document.getElementById('user_photo_main').src;
     const currentHeaderSrc = document.getElementById('user_photo_header').src;
+    const currentSrcset = document.getElementById('user_photo_main').getAttribute('srcset');
 
     try {
         const reader = new FileReader();
         reader.onload = function(e) {
-            document.getElementById('user_photo_main').src = e.target.result;
-            document.getElementById('user_photo_header').src = e.target.result;
+            setPhoto('user_photo_main', e.target.result);
+            setPhoto('user_photo_header', e.target.result);
 
             const confirmButton = document.createElement('button');
             confirmButton.textContent = 'Сохранить фото';
             confirmButton.className = 'confirm-photo-btn';
-            confirmButton.onclick = () => confirmUpload(file, currentMainSrc, currentHeaderSrc);
+            confirmButton.onclick = () => confirmUpload(file, currentMainSrc, currentHeaderSrc, currentSrcset);
 
             const photoInfo = document.querySelector('.photo_info');
 
@@ -34,28 +46,14 @@ async function uploadImage(event) {
     }
 }
 
-async function confirmUpload(file, currentMainSrc, currentHeaderSrc) {
-    const formData = new FormData();
-    formData.append('file', file);
-
+async function confirmUpload(file, currentMainSrc, currentHeaderSrc, currentSrcset) {
     try {
-        const response = await fetch('/image/upload-image', {
-            method: 'POST',
-            body: formData,
-            headers: {
-                'Accept': 'application/json'
-            }
-        });
-
-        if (!response.ok) {
-            throw new Error('Upload failed');
-        }
-
-        const data = await response.json();
+        const key = await uploadToStorage(file);
+        const data = await completeUpload('/image/complete-upload', key);
         if (data.url) {
             const finalUrl = data.url;
-            document.getElementById('user_photo_main').src = finalUrl;
-            document.getElementById('user_photo_header').src = finalUrl;
+            setPhoto('user_photo_main', finalUrl);
+            setPhoto('user_photo_header', finalUrl);
 
             const confirmButton = document.querySelector('.confirm-photo-btn');
             if (confirmButton) {
@@ -69,8 +67,8 @@ async function confirmUpload(file, currentMainSrc, currentHeaderSrc) {
             throw new Error('No URL in response');
         }
     } catch (error) {
-        document.getElementById('user_photo_main').src = currentMainSrc;
-        document.getElementById('user_photo_header').src = currentHeaderSrc;
+        setPhoto('user_photo_main', currentMainSrc, currentSrcset);
+        setPhoto('user_photo_header', currentHeaderSrc, currentSrcset);
         console.error('Upload error:', error);
         displayError("Произошла ошибка при загрузке изображения. Maximum file size: 5MB");
     }
@@ -1,6 +1,10 @@
 async function checkEmailExists(email) {
     try {
-        const response = await fetch(`/users/check_email/${email}`);
+        const response = await fetch(`/users/check_email/${encodeURIComponent(email)}`);
+        if (!response.ok) {
+            // Проверка на сервере при отправке формы все равно найдет занятый email
+            return false;
+        }
         const data = await response.json();
         return data.exists;
     } catch (error) {
@@ -0,0 +1,136 @@
+import io
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import select
+from starlette.datastructures import UploadFile
+
+from backend.src.conf.storage_backend import StorageBackend
+from backend.src.crud.blob_crud import stored_blob_dao
+from models import PendingDeletion, StoredBlob
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Хранилище в памяти; store() только запоминает ключ, без конвертации.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stored = []
+
+    async def store(self, upload):
+        self.stored.append(upload.key)
+        upload.variants = {"8": upload.key, "4": self.variant_key(upload.key, 4)}
+        return upload.key
+
+    async def put_objects(self, objects, content_type):
+        pass
+
+    @asynccontextmanager
+    async def open_object(self, key):
+        yield 0, iter(())
+
+    async def object_size(self, key):
+        return None
+
+    async def delete_object(self, key):
+        pass
+
+    async def delete_objects(self, keys):
+        return []
+
+    async def list_objects(self, prefix=""):
+        yield []
+
+    def storage_url(self, key):
+        return None
+
+    async def _sign_urls(self, keys, expiration):
+        return {}
+
+    async def presigned_post(self, owner_id, expiration=600):
+        return {}
+
+
+def image_file():
+    # PNG-сигнатура достаточна для определения типа; содержимое уникально для теста
+    return UploadFile(io.BytesIO(b"\x89PNG\r\n\x1a\n" + os.urandom(32)), filename="image.png")
+
+
+async def ref_count(session, key):
+    return await session.scalar(select(StoredBlob.ref_count).where(StoredBlob.key == key))
+
+
+async def pending_keys(session, keys):
+    return set(await session.scalars(select(PendingDeletion.key).where(PendingDeletion.key.in_(keys))))
+
+
+@pytest.mark.asyncio
+async def test_same_file_is_stored_once(rollback_session):
+    storage, file = MemoryStorage(), image_file()
+    content = file.file.getvalue()
+
+    key, variants = await stored_blob_dao.store_file(file=file, storage=storage, path="Boards", db_session=rollback_session)
+    same_key, same_variants = await stored_blob_dao.store_file(
+        file=UploadFile(io.BytesIO(content), filename="copy.png"), storage=storage, path="Boards",
+        db_session=rollback_session,
+    )
+
+    assert same_key == key and same_variants == variants
+    assert storage.stored == [key]
+    assert await ref_count(rollback_session, key) == 2
+
+
+@pytest.mark.asyncio
+async def test_last_release_queues_object_and_variants(rollback_session):
+    storage = MemoryStorage()
+    key, variants = await stored_blob_dao.store_file(
+        file=image_file(), storage=storage, path="Boards", db_session=rollback_session
+    )
+    await stored_blob_dao.acquire(key=key, db_session=rollback_session)
+
+    assert await stored_blob_dao.release_many(keys=[key], db_session=rollback_session) == []
+    assert await ref_count(rollback_session, key) == 1
+
+    pending = await stored_blob_dao.release_many(keys=[key], db_session=rollback_session)
+
+    assert set(pending) == set(variants.values())
+    assert await ref_count(rollback_session, key) is None
+    assert await pending_keys(rollback_session, pending) == set(pending)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_release_one_reference_each(rollback_session):
+    storage = MemoryStorage()
+    key, _ = await stored_blob_dao.store_file(file=image_file(), storage=storage, path="Boards", db_session=rollback_session)
+    await stored_blob_dao.acquire(key=key, db_session=rollback_session)
+
+    pending = await stored_blob_dao.release_many(keys=[key, key], db_session=rollback_session)
+
+    assert key in pending
+
+
+@pytest.mark.asyncio
+async def test_untracked_key_is_queued(rollback_session):
+    key = f"Boards/legacy_{os.urandom(8).hex()}.webp"
+
+    assert await stored_blob_dao.release(key=key, db_session=rollback_session)
+    assert await pending_keys(rollback_session, [key]) == {key}
+
+
+@pytest.mark.asyncio
+async def test_upload_takes_object_back_from_deletion_queue(rollback_session):
+    storage, file = MemoryStorage(), image_file()
+    content = file.file.getvalue()
+    key, _ = await stored_blob_dao.store_file(file=file, storage=storage, path="Boards", db_session=rollback_session)
+    await stored_blob_dao.release(key=key, db_session=rollback_session)
+
+    await stored_blob_dao.store_file(
+        file=UploadFile(io.BytesIO(content), filename="again.png"), storage=storage, path="Boards",
+        db_session=rollback_session,
+    )
+
+    assert storage.stored == [key, key]
+    assert await pending_keys(rollback_session, [key, storage.variant_key(key, 4)]) == set()
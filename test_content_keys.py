@@ -0,0 +1,84 @@
+import hashlib
+import importlib.util
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+from backend.src.conf.local_storage import LocalStorageManager
+from backend.src.conf.media_cache import is_content_key
+from config import settings
+
+MIGRATION_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "migration", "versions", "e2b8f4a61c05_rekey_images_by_content_hash.py"
+)
+
+
+def png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    return Storage()
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("rekey_images_by_content_hash", MIGRATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.asyncio
+async def test_key_is_sha256_of_source_content(storage):
+    content = png("red")
+
+    upload = await storage.prepare_upload(UploadFile(io.BytesIO(content), filename="avatar.png"), "Users")
+
+    assert upload.key == f"Users/{hashlib.sha256(content).hexdigest()}.webp"
+    assert upload.content == content
+
+
+@pytest.mark.asyncio
+async def test_same_content_gets_same_key_regardless_of_name(storage):
+    first = await storage.prepare_upload(UploadFile(io.BytesIO(png("red")), filename="a.png"), "Boards")
+    second = await storage.prepare_upload(UploadFile(io.BytesIO(png("red")), filename="b.png"), "Boards")
+    other = await storage.prepare_upload(UploadFile(io.BytesIO(png("blue")), filename="a.png"), "Boards")
+
+    assert first.key == second.key
+    assert first.key != other.key
+
+
+@pytest.mark.asyncio
+async def test_non_image_is_rejected(storage):
+    with pytest.raises(HTTPException) as error:
+        await storage.prepare_upload(UploadFile(io.BytesIO(b"plain text" * 1000), filename="a.png"))
+
+    assert error.value.status_code == 400
+
+
+def test_content_keys_are_recognized():
+    digest = hashlib.sha256(b"x").hexdigest()
+
+    assert is_content_key(f"Users/{digest}.webp")
+    assert is_content_key(f"Boards/{digest}_w400.webp")
+    assert not is_content_key("Users/avatar_3.webp")
+    assert load_migration().CONTENT_KEY_RE.match(f"Boards/{digest}.webp")
+    assert not load_migration().CONTENT_KEY_RE.match("Boards/photo.webp")
+
+
+def test_migration_builds_its_client_from_settings():
+    client, bucket, acl = load_migration()._s3_client()
+
+    assert bucket == settings.S3_BUCKET
+    assert acl == "public-read"
+    assert client.meta.endpoint_url.endswith(settings.S3_ENDPOINT.split("://", 1)[-1].rstrip("/"))
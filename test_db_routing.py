@@ -0,0 +1,138 @@
+import time
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+import db_routing
+from config import settings
+from database import create_engine
+from db_routing import PRIMARY_COOKIE, ReplicaStickinessMiddleware, RoutingSession, replica_read, replica_reads
+from models import User
+
+
+@pytest_asyncio.fixture
+async def session_maker(monkeypatch):
+    """
+    Основная база и "реплика" - два пула к одной базе, различимые по application_name.
+    """
+    engines = {}
+    for name in ("primary", "replica"):
+        monkeypatch.setattr(settings, "DB_APPLICATION_NAME", name)
+        engines[name] = create_engine()
+    try:
+        async with engines["primary"].connect():
+            pass
+    except (OSError, SQLAlchemyError) as e:
+        pytest.skip(f"Database is not available: {e}")
+    try:
+        yield async_sessionmaker(
+            engines["primary"], sync_session_class=RoutingSession,
+            info={"replica_bind": engines["replica"].sync_engine},
+        )
+    finally:
+        for engine in engines.values():
+            await engine.dispose()
+
+
+async def served_by(session) -> str:
+    return await session.scalar(select(func.current_setting("application_name")))
+
+
+@replica_read
+async def read(session) -> str:
+    return await served_by(session)
+
+
+@pytest.mark.asyncio
+async def test_only_marked_reads_go_to_replica(session_maker):
+    async with session_maker() as session:
+        assert await served_by(session) == "primary"
+        with replica_reads(session):
+            assert await served_by(session) == "replica"
+        assert await read(session=session) == "replica"
+        assert await served_by(session) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_reads_after_write_stay_on_primary(session_maker):
+    async with session_maker() as session:
+        session.add(User(username="r", email=f"routing-{time.time_ns()}@example.com", password="x"))
+        await session.flush()
+
+        assert await read(session) == "primary"
+        await session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_pinned_client_reads_from_primary(session_maker):
+    token = db_routing._request_writes.set(db_routing.RequestWrites(pinned=True))
+    try:
+        async with session_maker() as session:
+            assert await read(session) == "primary"
+    finally:
+        db_routing._request_writes.reset(token)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(ReplicaStickinessMiddleware, sticky_seconds=5)
+
+    @app.get("/read")
+    async def read_endpoint():
+        return {"pinned": db_routing._request_writes.get().pinned}
+
+    @app.post("/write")
+    async def write_endpoint():
+        db_routing._mark_written(Session())
+        return {}
+
+    return TestClient(app)
+
+
+def test_write_pins_client_to_primary(client):
+    assert client.get("/read").json() == {"pinned": False}
+    assert PRIMARY_COOKIE not in client.cookies
+
+    response = client.post("/write")
+
+    assert "Max-Age=5" in response.headers["set-cookie"]
+    assert client.get("/read").json() == {"pinned": True}
+
+
+def test_expired_cookie_does_not_pin(client):
+    client.cookies.set(PRIMARY_COOKIE, str(int(time.time()) - 1))
+
+    assert client.get("/read").json() == {"pinned": False}
+
+
+@pytest.mark.asyncio
+async def test_reads_in_write_request_go_to_primary(session_maker):
+    app = FastAPI()
+    app.add_middleware(ReplicaStickinessMiddleware, sticky_seconds=5)
+
+    @app.get("/users")
+    async def list_users():
+        async with session_maker() as session:
+            return {"read_from": await read(session)}
+
+    @app.post("/users")
+    async def add_user():
+        async with session_maker() as session:
+            # Как add_collaborator: сначала чтение через replica_read, потом запись
+            read_from = await read(session)
+            session.add(User(username="r", email=f"routing-{time.time_ns()}@example.com", password="x"))
+            await session.flush()
+            await session.rollback()
+            return {"read_from": read_from}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/users")).json() == {"read_from": "replica"}
+        assert (await client.post("/users")).json() == {"read_from": "primary"}
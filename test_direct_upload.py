@@ -0,0 +1,173 @@
+import io
+import time
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete, select
+
+import database
+from backend.src.conf.local_storage import LocalStorageManager
+from config import settings
+from models import ImageBoard
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    return Storage()
+
+
+async def receive(storage, fields, content=PNG):
+    await storage.receive_post(fields, UploadFile(io.BytesIO(content)))
+
+
+@pytest.mark.asyncio
+async def test_signed_upload_is_stored_under_policy_key(storage):
+    policy = await storage.presigned_post(owner_id=7)
+
+    await receive(storage, {**policy["fields"], "Content-Type": "image/png"})
+
+    assert policy["key"].startswith("staging/uploads/7/")
+    assert await storage.read_object(policy["key"], 1024) == PNG
+
+
+@pytest.mark.asyncio
+async def test_tampered_or_expired_policy_is_rejected(storage):
+    fields = (await storage.presigned_post(owner_id=7))["fields"]
+
+    for bad_fields in (
+        {**fields, "key": "staging/uploads/8/other"},
+        {**fields, "signature": "0" * 64},
+        {**fields, "expires": str(int(time.time()) + 3600)},
+    ):
+        with pytest.raises(HTTPException) as error:
+            await receive(storage, {**bad_fields, "Content-Type": "image/png"})
+        assert error.value.status_code == 403
+
+    expires = str(int(time.time()) - 1)
+    expired = {**fields, "expires": expires, "signature": storage._post_signature(fields["key"], expires)}
+    with pytest.raises(HTTPException) as error:
+        await receive(storage, {**expired, "Content-Type": "image/png"})
+    assert error.value.detail == "Upload policy expired"
+
+
+@pytest.mark.asyncio
+async def test_only_images_are_accepted(storage):
+    fields = (await storage.presigned_post(owner_id=7))["fields"]
+
+    for content_type, content in (("text/plain", PNG), ("image/png", b"plain text")):
+        with pytest.raises(HTTPException) as error:
+            await receive(storage, {**fields, "Content-Type": content_type}, content)
+        assert error.value.status_code == 400
+    assert await storage.object_size(fields["key"]) is None
+
+
+class FlakyStore:
+    """
+    Подменяет stored_blob_dao.store_file: первые failures вызовов падают с error.
+    """
+
+    def __init__(self, failures, error=RuntimeError("storage is unavailable")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, file, storage, path, db_session):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return f"{path}processed.webp", {"400": f"{path}processed.webp"}
+
+
+@pytest_asyncio.fixture
+async def staged_image(rollback_session, rollback_session_maker, make_task, storage, monkeypatch):
+    """
+    Запись ImageBoard, указывающая на загруженный в staging файл; фоновая
+    обработка работает в той же откатываемой транзакции.
+    """
+    monkeypatch.setattr(database, "async_session_maker", rollback_session_maker)
+    monkeypatch.setattr(ImageBoard, "_file_storage", storage)
+    monkeypatch.setattr(settings, "UPLOAD_PROCESS_RETRY_DELAY", 0)
+    monkeypatch.setattr(settings, "UPLOAD_PROCESS_ATTEMPTS", 3)
+    for name in database.uploaded_image_stats:
+        monkeypatch.setitem(database.uploaded_image_stats, name, 0)
+
+    user, task = await make_task()
+    board_id = (await task.awaitable_attrs.todo_list).board_id
+    key = f"{storage.upload_prefix(user.id)}upload"
+    await storage.put_objects({key: PNG}, "image/png")
+    image = await database.save_uploaded_image(ImageBoard, key, rollback_session, board_id=board_id)
+    return image.id, key
+
+
+async def stored_file(session, image_id):
+    return await session.scalar(
+        select(ImageBoard.file).where(ImageBoard.id == image_id).execution_options(populate_existing=True)
+    )
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_retried(rollback_session, staged_image, storage, monkeypatch):
+    image_id, key = staged_image
+    store = FlakyStore(failures=1)
+    monkeypatch.setattr(database.stored_blob_dao, "store_file", store)
+
+    await database.process_uploaded_image(ImageBoard, image_id, "Boards/")
+
+    assert store.calls == 2
+    assert await stored_file(rollback_session, image_id) == "Boards/processed.webp"
+    assert await storage.object_size(key) is None
+    assert database.uploaded_image_stats == {"processed": 1, "rejected": 0, "retried": 1, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_image_is_dropped_after_last_attempt(rollback_session, staged_image, storage, monkeypatch):
+    image_id, key = staged_image
+    store = FlakyStore(failures=10)
+    monkeypatch.setattr(database.stored_blob_dao, "store_file", store)
+
+    await database.process_uploaded_image(ImageBoard, image_id, "Boards/")
+
+    assert store.calls == 3
+    assert await stored_file(rollback_session, image_id) is None
+    assert await storage.object_size(key) is None
+    assert database.uploaded_image_stats == {"processed": 0, "rejected": 0, "retried": 2, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_invalid_image_is_dropped_without_retry(rollback_session, staged_image, storage, monkeypatch):
+    image_id, key = staged_image
+    store = FlakyStore(failures=1, error=HTTPException(status_code=400, detail="Invalid image file"))
+    monkeypatch.setattr(database.stored_blob_dao, "store_file", store)
+
+    await database.process_uploaded_image(ImageBoard, image_id, "Boards/")
+
+    assert store.calls == 1
+    assert await stored_file(rollback_session, image_id) is None
+    assert await storage.object_size(key) is None
+    assert database.uploaded_image_stats["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_image_removed_while_processing_is_not_restored(rollback_session, staged_image, storage, monkeypatch):
+    image_id, key = staged_image
+    store = FlakyStore(failures=0)
+
+    async def store_and_remove(file, storage, path, db_session):
+        # Запись удаляют, пока идет конвертация: обработка ее не держит
+        await rollback_session.execute(delete(ImageBoard).where(ImageBoard.id == image_id))
+        await rollback_session.commit()
+        return await store(file, storage, path, db_session)
+
+    monkeypatch.setattr(database.stored_blob_dao, "store_file", store_and_remove)
+
+    await database.process_uploaded_image(ImageBoard, image_id, "Boards/")
+
+    assert await stored_file(rollback_session, image_id) is None
+    assert await storage.object_size(key) is None
+    assert database.uploaded_image_stats["processed"] == 0
@@ -0,0 +1,101 @@
+import pytest
+
+from auth import email_lookup as email_lookup_module
+from auth.email_lookup import BloomFilter, EmailLookup, IPRateLimiter
+
+
+class FakeUsers:
+    """
+    Подменяет запросы EmailLookup к базе списком почт.
+    """
+
+    def __init__(self, emails):
+        self.emails = list(emails)
+        self.exists_calls = []
+
+    async def get_emails_after(self, last_id, session):
+        return len(self.emails), self.emails[last_id:]
+
+    async def email_exists(self, email, session):
+        self.exists_calls.append(email)
+        return email in self.emails
+
+
+class FakeSessionMaker:
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = FakeUsers(["taken@example.com"])
+    monkeypatch.setattr(email_lookup_module, "get_emails_after", users.get_emails_after)
+    monkeypatch.setattr(email_lookup_module, "email_exists", users.email_exists)
+    return users
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"user{i}@example.com")
+
+    assert all(f"user{i}@example.com" in bloom for i in range(10000))
+    false_positives = sum(f"other{i}@example.com" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_free_email_is_answered_without_database(users):
+    lookup = EmailLookup(capacity=100, error_rate=0.001, cache_ttl=60, refresh_interval=60)
+    await lookup.warm(FakeSessionMaker())
+
+    assert not await lookup.is_registered("free@example.com", None)
+    assert users.exists_calls == []
+
+
+@pytest.mark.asyncio
+async def test_taken_email_is_checked_once_and_cached(users):
+    lookup = EmailLookup(capacity=100, error_rate=0.001, cache_ttl=60, refresh_interval=60)
+    await lookup.warm(FakeSessionMaker())
+
+    assert await lookup.is_registered("Taken@Example.com", None)
+    assert await lookup.is_registered("taken@example.com", None)
+    assert users.exists_calls == ["taken@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_added_and_refreshed_emails_become_taken(users):
+    lookup = EmailLookup(capacity=100, error_rate=0.001, cache_ttl=60, refresh_interval=0)
+    await lookup.warm(FakeSessionMaker())
+
+    lookup.add("New@example.com")
+    assert await lookup.is_registered("new@example.com", None)
+
+    # Регистрация в другом процессе попадает в фильтр при обновлении
+    users.emails.append("elsewhere@example.com")
+    assert await lookup.is_registered("elsewhere@example.com", None)
+
+
+def test_rate_limiter_allows_burst_per_address():
+    limiter = IPRateLimiter(rate=0.001, burst=2)
+
+    assert limiter.allow("10.0.0.1") and limiter.allow("10.0.0.1")
+    assert not limiter.allow("10.0.0.1")
+    assert limiter.allow("10.0.0.2")
+
+
+def test_rate_limiter_evicts_least_recently_seen_address():
+    limiter = IPRateLimiter(rate=0.001, burst=1, max_clients=2)
+    limiter.allow("10.0.0.1")
+    limiter.allow("10.0.0.2")
+    limiter.allow("10.0.0.1")
+
+    limiter.allow("10.0.0.3")
+
+    assert list(limiter._buckets) == ["10.0.0.1", "10.0.0.3"]
@@ -0,0 +1,93 @@
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from backend.src.conf import image_transcoder, storage_backend
+from backend.src.conf.image_transcoder import (
+    ImageRejected, ImageTranscoder, TranscodeTimeout, TranscoderBusy, transcode_to_webp_variants,
+)
+from backend.src.conf.local_storage import LocalStorageManager
+
+
+def encode(image, image_format, **params) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=image_format, **params)
+    return output.getvalue()
+
+
+def animation(size, frames) -> bytes:
+    images = [Image.new("RGB", size, (i * 10, 0, 0)) for i in range(frames)]
+    return encode(images[0], "GIF", save_all=True, append_images=images[1:])
+
+
+def allocate(size):
+    return len(bytearray(size))
+
+
+def test_frame_limit():
+    with pytest.raises(ImageRejected, match="frames"):
+        transcode_to_webp_variants(animation((10, 10), 5), (), max_frames=4)
+
+
+def test_pixel_limit_counts_all_frames():
+    content = animation((100, 100), 5)
+
+    with pytest.raises(ImageRejected, match="pixels"):
+        transcode_to_webp_variants(content, (), max_pixels=49_999)
+    assert transcode_to_webp_variants(content, (), max_pixels=50_000)[1] == 100
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale():
+    content = encode(Image.new("RGB", (2000, 1000), "green"), "JPEG")
+
+    # 2 млн пикселей оригинала больше лимита, но декодируется 1/4 масштаба
+    original, width, _, _ = transcode_to_webp_variants(content, (), max_pixels=200_000, max_dimension=500)
+
+    assert width == 500
+    with pytest.raises(ImageRejected):
+        transcode_to_webp_variants(content, (), max_pixels=200_000, max_dimension=1000)
+
+
+@pytest.mark.skipif(image_transcoder.resource is None, reason="RLIMIT_AS is not available")
+@pytest.mark.asyncio
+async def test_worker_memory_is_limited():
+    transcoder = ImageTranscoder(max_workers=1, memory_limit=512 * 1024 * 1024)
+    try:
+        with pytest.raises(MemoryError):
+            await transcoder.run(allocate, 1024 * 1024 * 1024)
+        assert await transcoder.run(allocate, 1024) == 1024
+    finally:
+        transcoder.close()
+
+    assert transcoder.stats()["out_of_memory"] == 1
+
+
+class FailingTranscoder:
+    def __init__(self, error):
+        self.error = error
+
+    async def to_webp_variants(self, file_content, widths, preset):
+        raise self.error
+
+
+@pytest.mark.parametrize("error, status_code", [
+    (ImageRejected("too many pixels"), 413),
+    (Image.DecompressionBombError("bomb"), 413),
+    (MemoryError(), 413),
+    (TranscoderBusy(), 503),
+    (TranscodeTimeout(), 504),
+    (RuntimeError("codec crashed"), 500),
+])
+@pytest.mark.asyncio
+async def test_transcoding_errors_map_to_http_status(tmp_path, monkeypatch, error, status_code):
+    monkeypatch.setattr(storage_backend, "image_transcoder", FailingTranscoder(error))
+
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    with pytest.raises(HTTPException) as raised:
+        await Storage()._convert_to_webp(b"image")
+
+    assert raised.value.status_code == status_code
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from backend.src.conf.image_transcoder import ImageRejected, ImageTranscoder, TranscodeTimeout, TranscoderBusy
+
+
+def png(size=(64, 48)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def make_transcoder():
+    transcoders = []
+
+    def make(**kwargs):
+        transcoder = ImageTranscoder(**kwargs)
+        transcoders.append(transcoder)
+        return transcoder
+
+    yield make
+    for transcoder in transcoders:
+        transcoder.close()
+
+
+@pytest.mark.asyncio
+async def test_image_is_transcoded_in_pool(make_transcoder):
+    transcoder = make_transcoder(max_workers=1)
+
+    webp = await transcoder.to_webp(png())
+
+    with Image.open(io.BytesIO(webp)) as image:
+        assert (image.format, image.size) == ("WEBP", (64, 48))
+    assert transcoder.stats()["jobs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately(make_transcoder):
+    transcoder = make_transcoder(max_workers=1, queue_size=0)
+    running = asyncio.create_task(transcoder.run(time.sleep, 0.5))
+    await asyncio.sleep(0)
+
+    with pytest.raises(TranscoderBusy):
+        await transcoder.run(time.sleep, 0)
+
+    await running
+    assert transcoder.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_timed_out_job_restarts_pool(make_transcoder):
+    transcoder = make_transcoder(max_workers=1, timeout=0.5)
+
+    with pytest.raises(TranscodeTimeout):
+        await transcoder.run(time.sleep, 30)
+
+    # Следующая задача выполняется в новом пуле
+    assert await transcoder.run(time.sleep, 0) is None
+    stats = transcoder.stats()
+    assert (stats["timeouts"], stats["restarts"], stats["failures"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_oversized_image_is_rejected_before_decoding(make_transcoder):
+    transcoder = make_transcoder(max_workers=1, max_pixels=1000)
+
+    with pytest.raises(ImageRejected):
+        await transcoder.to_webp(png())
+
+    stats = transcoder.stats()
+    assert (stats["oversized"], stats["failures"]) == (1, 0)
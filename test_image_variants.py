@@ -0,0 +1,99 @@
+import io
+import uuid
+
+import pytest
+from PIL import Image
+
+from backend.src.conf import storage_backend
+from backend.src.conf.image_transcoder import EncodingPreset, ImageTranscoder, transcode_to_webp_variants
+from backend.src.conf.local_storage import LocalStorageManager
+from backend.src.conf.storage_backend import PreparedUpload
+from image_schemas import ImageSchema
+
+
+def png(size) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, "blue").save(output, format="PNG")
+    return output.getvalue()
+
+
+def gif(size, colors) -> bytes:
+    output = io.BytesIO()
+    images = [Image.new("RGB", size, color) for color in colors]
+    images[0].save(output, format="GIF", save_all=True, append_images=images[1:], duration=50, loop=0)
+    return output.getvalue()
+
+
+def webp_size(content: bytes):
+    with Image.open(io.BytesIO(content)) as image:
+        return image.format, image.size, getattr(image, "n_frames", 1)
+
+
+def test_variants_keep_aspect_ratio_and_skip_upscaling():
+    original, width, variants, avif = transcode_to_webp_variants(png((1000, 500)), (160, 400, 1000, 2000))
+
+    assert width == 1000
+    assert webp_size(original)[:2] == ("WEBP", (1000, 500))
+    assert sorted(variants) == [160, 400]
+    assert webp_size(variants[160])[1] == (160, 80)
+    assert webp_size(variants[400])[1] == (400, 200)
+    assert avif == {}
+
+
+def test_original_is_limited_by_max_dimension():
+    original, width, variants, _ = transcode_to_webp_variants(
+        png((600, 1200)), (100,), max_dimension=400
+    )
+
+    assert (width, webp_size(original)[1]) == (200, (200, 400))
+    assert webp_size(variants[100])[1] == (100, 200)
+
+
+def test_animation_stays_animated_and_variants_are_static():
+    original, width, variants, _ = transcode_to_webp_variants(gif((300, 300), ("red", "green", "blue")), (100,))
+
+    assert webp_size(original) == ("WEBP", (300, 300), 3)
+    assert webp_size(variants[100]) == ("WEBP", (100, 100), 1)
+
+
+def test_srcset_lists_webp_widths_in_ascending_order():
+    image = ImageSchema(id=uuid.uuid4(), file="a.webp", variants={
+        "800": "a.webp", "160": "a_w160.webp", "400": "a_w400.webp", "avif:800": "a.avif",
+    })
+
+    assert set(image.keys()) == {"a.webp", "a_w160.webp", "a_w400.webp"}
+    image.with_urls({key: f"/m/{key}" for key in image.keys()})
+
+    assert image.url == "/m/a.webp"
+    assert image.srcset == "/m/a_w160.webp 160w, /m/a_w400.webp 400w, /m/a.webp 800w"
+
+
+def test_image_without_variants_has_no_srcset():
+    image = ImageSchema(id=uuid.uuid4(), file="old.webp").with_urls({"old.webp": "/m/old.webp"})
+
+    assert (image.url, image.srcset) == ("/m/old.webp", "")
+
+
+@pytest.mark.asyncio
+async def test_store_writes_original_and_variants(tmp_path, monkeypatch):
+    transcoder = ImageTranscoder(max_workers=1)
+    monkeypatch.setattr(storage_backend, "image_transcoder", transcoder)
+
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+        variant_widths = (160, 400, 800)
+        encoding_presets = {}
+
+    storage = Storage()
+    upload = PreparedUpload(key="Boards/abc.webp", content=bytearray(png((500, 250))))
+    try:
+        key = await storage.store(upload)
+    finally:
+        transcoder.close()
+
+    assert key == "Boards/abc.webp"
+    assert upload.variants == {"500": key, "400": "Boards/abc_w400.webp", "160": "Boards/abc_w160.webp"}
+    assert sorted(path.name for path in (tmp_path / "Boards").iterdir()) == [
+        "abc.webp", "abc_w160.webp", "abc_w400.webp",
+    ]
+    assert EncodingPreset() == storage.encoding_preset(key)
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from backend.src.conf import s3_storages
+from backend.src.conf.local_storage import LocalStorageManager
+from backend.src.conf.s3_client import S3StorageManager
+from backend.src.conf.storage_backend import StorageBackend
+from config import settings
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+        delete_batch_size = 2
+
+    return Storage()
+
+
+async def read(storage, key):
+    async with storage.open_object(key) as (size, chunks):
+        return size, b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_objects_round_trip(storage, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    await storage.put_objects({"Boards/a.webp": b"0123456789", "Boards/empty.webp": b""}, "image/webp")
+
+    assert await read(storage, "Boards/a.webp") == (10, b"0123456789")
+    assert await read(storage, "Boards/empty.webp") == (0, b"")
+    assert await storage.object_size("Boards/a.webp") == 10
+    # Временные файлы записи не остаются
+    assert sorted(os.listdir(os.path.join(storage.root, "Boards"))) == ["a.webp", "empty.webp"]
+
+    with pytest.raises(HTTPException) as error:
+        await storage.read_object("Boards/a.webp", 5)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_missing_object_is_not_found(storage):
+    with pytest.raises(HTTPException) as error:
+        await read(storage, "Boards/missing.webp")
+
+    assert error.value.status_code == 404
+    assert await storage.object_size("Boards/missing.webp") is None
+
+
+@pytest.mark.asyncio
+async def test_keys_cannot_escape_root(storage):
+    for key in ("../outside.webp", "Boards/../../outside.webp", "/etc/passwd"):
+        with pytest.raises(HTTPException) as error:
+            storage.local_path(key)
+        assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_unfinished_files_are_not_served(storage):
+    with pytest.raises(HTTPException):
+        storage.local_path("Boards/a.webp.tmp-0123")
+
+    assert storage.local_path("Boards/a.webp") == os.path.join(storage.root, "Boards", "a.webp")
+
+
+@pytest.mark.asyncio
+async def test_listing_is_paged_and_filtered_by_prefix(storage):
+    await storage.put_objects({f"Boards/{i}.webp": b"x" for i in range(3)}, "image/webp")
+    await storage.put_objects({"Users/u.webp": b"x"}, "image/webp")
+
+    pages = [page async for page in storage.list_objects("Boards/")]
+
+    assert [len(page) for page in pages] == [2, 1]
+    assert sorted(key for page in pages for key, _ in page) == ["Boards/0.webp", "Boards/1.webp", "Boards/2.webp"]
+
+
+@pytest.mark.asyncio
+async def test_delete_is_idempotent(storage):
+    await storage.put_objects({"Boards/a.webp": b"x", "Boards/b.webp": b"x"}, "image/webp")
+
+    assert await storage.delete_objects(["Boards/a.webp", "Boards/a.webp", "Boards/missing.webp"]) == []
+    await storage.delete_object("Boards/b.webp")
+    await storage.delete_object("Boards/b.webp")
+
+    assert [page async for page in storage.list_objects()] == []
+
+
+def test_storage_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_backend_is_chosen_by_settings(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "Local")
+    assert s3_storages.storage_backend_class() is LocalStorageManager
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "s3")
+    assert s3_storages.storage_backend_class() is S3StorageManager
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "ftp")
+    with pytest.raises(ValueError):
+        s3_storages.storage_backend_class()
+
+
+async def respond(response):
+    scope = {"type": "http", "method": "GET", "headers": []}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, receive, send)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_media_file_response_hands_file_to_nginx_or_reads_it(tmp_path):
+    from router_image import media_file_response
+
+    path = tmp_path / "a.webp"
+    path.write_bytes(b"webp")
+
+    accel = media_file_response(str(path), "a.webp", accel_path="/protected/a.webp")
+    plain = await respond(media_file_response(str(path), "a.webp"))
+
+    assert accel.headers["X-Accel-Redirect"] == "/protected/a.webp"
+    assert accel.body == b""
+    assert b"".join(message.get("body", b"") for message in plain) == b"webp"
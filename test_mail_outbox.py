@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import aiosmtplib
+import pytest
+from sqlalchemy import select
+
+import mail_outbox
+from config import settings
+from mail_outbox import OutboxWorker, backoff_delay, is_permanent_error
+from models import OutboxEmail
+from rate_limit import TokenBucket
+
+
+def make_worker(max_attempts=3):
+    return OutboxWorker(session_maker=None, transport=None, bucket=TokenBucket(1, 1), max_attempts=max_attempts)
+
+
+def make_email():
+    return OutboxEmail(id=1, recipient="a@x.com", subject="s", body="b", status="pending", attempts=0)
+
+
+def test_backoff_delay_grows_and_is_capped():
+    base, cap = settings.OUTBOX_BACKOFF_BASE, settings.OUTBOX_BACKOFF_MAX
+
+    first = backoff_delay(1)
+    assert timedelta(seconds=base * 0.8) <= first <= timedelta(seconds=base * 1.2)
+    assert backoff_delay(100) <= timedelta(seconds=cap * 1.2)
+
+
+def test_permanent_errors():
+    assert is_permanent_error(aiosmtplib.SMTPRecipientRefused(550, "no such user", "a@x.com"))
+    assert not is_permanent_error(aiosmtplib.SMTPRecipientRefused(451, "try later", "a@x.com"))
+    assert is_permanent_error(aiosmtplib.SMTPDataError(554, "rejected"))
+    assert not is_permanent_error(aiosmtplib.SMTPAuthenticationError(535, "bad credentials"))
+    assert not is_permanent_error(aiosmtplib.SMTPServerDisconnected("lost"))
+
+
+def test_permanent_error_requires_all_recipients_refused_permanently():
+    permanent = aiosmtplib.SMTPRecipientRefused(550, "no such user", "a@x.com")
+    temporary = aiosmtplib.SMTPRecipientRefused(451, "try later", "b@x.com")
+
+    assert is_permanent_error(aiosmtplib.SMTPRecipientsRefused([permanent]))
+    assert not is_permanent_error(aiosmtplib.SMTPRecipientsRefused([permanent, temporary]))
+    assert not is_permanent_error(aiosmtplib.SMTPRecipientsRefused([]))
+
+
+def test_apply_result_marks_sent():
+    email, now = make_email(), datetime.now()
+    email.last_error = "previous"
+
+    make_worker()._apply_result(email, None, now)
+
+    assert email.status == "sent" and email.sent_at == now and email.last_error is None
+
+
+def test_apply_result_reschedules_temporary_error():
+    email, now = make_email(), datetime.now()
+
+    make_worker()._apply_result(email, aiosmtplib.SMTPServerDisconnected("lost"), now)
+
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.next_attempt_at > now
+    assert email.last_error == "lost"
+
+
+def test_apply_result_fails_permanent_error_at_once():
+    email = make_email()
+
+    make_worker()._apply_result(email, aiosmtplib.SMTPDataError(554, "rejected"), datetime.now())
+
+    assert email.status == "failed" and email.attempts == 1
+
+
+def test_apply_result_fails_after_max_attempts():
+    email = make_email()
+    worker = make_worker(max_attempts=2)
+
+    worker._apply_result(email, aiosmtplib.SMTPServerDisconnected("lost"), datetime.now())
+    worker._apply_result(email, aiosmtplib.SMTPServerDisconnected("lost"), datetime.now())
+
+    assert email.status == "failed" and email.attempts == 2
+
+
+class BrokenTransport:
+    async def send_messages(self, messages):
+        raise aiosmtplib.SMTPConnectError("connection refused")
+
+
+@pytest.mark.asyncio
+async def test_transport_failure_is_recorded_for_the_whole_batch(rollback_session, rollback_session_maker, monkeypatch):
+    for name in mail_outbox.outbox_stats:
+        monkeypatch.setitem(mail_outbox.outbox_stats, name, 0)
+    # Раньше любых других ожидающих писем
+    emails = [
+        OutboxEmail(recipient=f"{i}@x.com", subject="s", body="b", next_attempt_at=datetime(2000, 1, 1))
+        for i in range(2)
+    ]
+    rollback_session.add_all(emails)
+    await rollback_session.commit()
+    worker = OutboxWorker(
+        session_maker=rollback_session_maker, transport=BrokenTransport(), bucket=TokenBucket(1, 2), batch_size=2,
+    )
+
+    assert await worker.drain_once() == 2
+
+    rows = (await rollback_session.execute(
+        select(OutboxEmail.status, OutboxEmail.attempts, OutboxEmail.next_attempt_at)
+        .where(OutboxEmail.id.in_([email.id for email in emails]))
+    )).all()
+    assert [(status, attempts) for status, attempts, _ in rows] == [("pending", 1)] * 2
+    # Повтор по backoff, а не по окончании аренды
+    assert all(next_attempt_at < datetime.now() + timedelta(seconds=worker.lease) for *_, next_attempt_at in rows)
+    assert mail_outbox.outbox_stats == {"sent": 0, "retried": 2, "failed": 0, "errors": 1}
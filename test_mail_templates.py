@@ -0,0 +1,37 @@
+import mail_templates
+from mail_templates import render_deadline_digest, render_deadline_email, render_register_email
+
+
+def test_deadline_email_escapes_message():
+    body = render_deadline_email("<b>Board</b> & co")
+
+    assert "&lt;b&gt;Board&lt;/b&gt; &amp; co" in body
+    assert "<b>Board</b>" not in body
+
+
+def test_digest_lists_every_message_in_order():
+    body = render_deadline_digest(["first", "second", "third"])
+
+    assert body.index("first") < body.index("second") < body.index("third")
+
+
+def test_same_digest_is_rendered_once(monkeypatch):
+    calls = []
+    render_email = mail_templates.render_email
+
+    def counting_render(template_name, **context):
+        calls.append(template_name)
+        return render_email(template_name, **context)
+
+    monkeypatch.setattr(mail_templates, "render_email", counting_render)
+    mail_templates._render_deadline_digest.cache_clear()
+
+    first = render_deadline_digest(iter(["a", "b"]))
+    second = render_deadline_digest(["a", "b"])
+
+    assert first == second
+    assert calls == ["deadline_digest.html"]
+
+
+def test_register_email_is_cached():
+    assert render_register_email() is render_register_email()
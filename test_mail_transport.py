@@ -0,0 +1,136 @@
+import asyncio
+import mailbox
+
+import aiosmtplib
+import pytest
+
+from mail_transport import BaseMailTransport, MaildirMailSink, SMTPPoolTransport, build_message, build_messages
+
+
+class FakeSMTP:
+    """
+    SMTP-клиент без сети: запоминает отправленные письма.
+    """
+
+    def __init__(self, fail_on=()):
+        self.is_connected = True
+        self.sent = []
+        self.fail_on = set(fail_on)
+        self.closed = False
+
+    async def send_message(self, message):
+        await asyncio.sleep(0)
+        recipient = message['To']
+        if recipient in self.fail_on:
+            self.is_connected = False
+            raise aiosmtplib.SMTPServerDisconnected("connection lost")
+        if recipient.startswith("refused"):
+            raise aiosmtplib.SMTPRecipientsRefused([])
+        self.sent.append(recipient)
+
+    async def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def make_transport(clients, **kwargs):
+    transport = SMTPPoolTransport("localhost", 25, "user", "password", **kwargs)
+
+    async def connect():
+        await asyncio.sleep(0)
+        client = clients.pop(0)
+        if isinstance(client, Exception):
+            raise client
+        return client
+
+    transport._connect = connect
+    return transport
+
+
+def test_base_transport_is_abstract():
+    with pytest.raises(TypeError):
+        BaseMailTransport()
+
+
+def test_build_messages_shares_equal_bodies():
+    messages = build_messages([("a@x.com", "s", "<p>1</p>"), ("b@x.com", "s", "<p>1</p>"), ("c@x.com", "s", "<p>2</p>")])
+    assert [m['To'] for m in messages] == ["a@x.com", "b@x.com", "c@x.com"]
+    assert messages[0].get_payload()[0] is messages[1].get_payload()[0]
+    assert messages[0].get_payload()[0] is not messages[2].get_payload()[0]
+
+
+@pytest.mark.asyncio
+async def test_send_messages_keeps_input_order_across_connections():
+    clients = [FakeSMTP(), FakeSMTP()]
+    transport = make_transport(list(clients), pool_size=2, concurrency=2)
+    messages = [build_message(f"user{i}@x.com", "s", "body") for i in range(5)]
+
+    results = await transport.send_messages(messages)
+
+    assert results == [None] * 5
+    # Письма делятся между соединениями через одно
+    assert clients[0].sent == ["user0@x.com", "user2@x.com", "user4@x.com"]
+    assert clients[1].sent == ["user1@x.com", "user3@x.com"]
+    assert len(transport._idle) == 2
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused_between_batches():
+    client = FakeSMTP()
+    transport = make_transport([client], pool_size=1, concurrency=1)
+
+    await transport.send_messages([build_message("a@x.com", "s", "body")])
+    await transport.send_messages([build_message("b@x.com", "s", "body")])
+
+    assert client.sent == ["a@x.com", "b@x.com"]
+    await transport.close()
+    assert client.closed and transport._idle == []
+
+
+@pytest.mark.asyncio
+async def test_refused_recipient_does_not_break_session():
+    client = FakeSMTP()
+    transport = make_transport([client], pool_size=1, concurrency=1)
+    messages = [build_message(r, "s", "body") for r in ("a@x.com", "refused@x.com", "b@x.com")]
+
+    results = await transport.send_messages(messages)
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], aiosmtplib.SMTPRecipientsRefused)
+    assert client.sent == ["a@x.com", "b@x.com"]
+
+
+@pytest.mark.asyncio
+async def test_broken_session_continues_on_new_connection():
+    broken, fresh = FakeSMTP(fail_on={"b@x.com"}), FakeSMTP()
+    transport = make_transport([broken, fresh], pool_size=1, concurrency=1)
+    messages = [build_message(r, "s", "body") for r in ("a@x.com", "b@x.com", "c@x.com")]
+
+    results = await transport.send_messages(messages)
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], aiosmtplib.SMTPServerDisconnected)
+    assert broken.closed
+    assert fresh.sent == ["c@x.com"]
+
+
+@pytest.mark.asyncio
+async def test_connect_failure_fails_whole_chunk():
+    error = aiosmtplib.SMTPConnectError("refused")
+    transport = make_transport([error], pool_size=1, concurrency=1)
+
+    results = await transport.send_messages([build_message(r, "s", "body") for r in ("a@x.com", "b@x.com")])
+
+    assert results == [error, error]
+
+
+@pytest.mark.asyncio
+async def test_maildir_sink_writes_one_file_per_message(tmp_path):
+    sink = MaildirMailSink(str(tmp_path / "mail"))
+
+    await sink.send_messages([build_message("a@x.com", "Hello", "body"), build_message("b@x.com", "Hi", "body")])
+
+    box = mailbox.Maildir(str(tmp_path / "mail"), create=False)
+    assert sorted(message['To'] for message in box) == ["a@x.com", "b@x.com"]
@@ -0,0 +1,149 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from backend.src.conf.local_storage import LocalStorageManager
+from backend.src.conf.media_cache import CachedFileResponse, MediaCache, is_content_key
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class CountingStorage(LocalStorageManager):
+        """
+        Исходное хранилище, считающее скачивания.
+        """
+        root_dir = str(tmp_path / "origin")
+
+        def __init__(self):
+            super().__init__()
+            self.opened = []
+
+        @asynccontextmanager
+        async def open_object(self, key):
+            self.opened.append(key)
+            # Скачивание не мгновенное: одновременные запросы успевают встретиться
+            await asyncio.sleep(0.01)
+            async with super().open_object(key) as result:
+                yield result
+
+    return CountingStorage()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MediaCache(str(tmp_path / "cache"), max_bytes=250, max_object_size=200, negative_ttl=60)
+
+
+async def put(storage, **objects):
+    await storage.put_objects({f"{key}.webp": content for key, content in objects.items()}, "image/webp")
+
+
+@pytest.mark.asyncio
+async def test_object_is_downloaded_once(cache, storage):
+    await put(storage, a=b"a" * 100)
+
+    paths = await asyncio.gather(*(cache.get("a.webp", storage) for _ in range(10)))
+    assert await cache.get("a.webp", storage) == paths[0]
+
+    assert storage.opened == ["a.webp"]
+    assert len(set(paths)) == 1 and paths[0].endswith(".webp")
+    with open(paths[0], "rb") as file:
+        assert file.read() == b"a" * 100
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_file_is_evicted(cache, storage):
+    await put(storage, a=b"a" * 100, b=b"b" * 100, c=b"c" * 100)
+    path_a = await cache.get("a.webp", storage)
+    path_b = await cache.get("b.webp", storage)
+    cache.release(await cache.get("a.webp", storage))
+    cache.release(path_a)
+    cache.release(path_b)
+
+    cache.release(await cache.get("c.webp", storage))
+
+    assert os.path.exists(path_a) and not os.path.exists(path_b)
+    stats = cache.stats()
+    assert (stats["files"], stats["bytes"], stats["evictions"], stats["pinned"]) == (2, 200, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_file_in_use_is_not_evicted(cache, storage):
+    await put(storage, a=b"a" * 100, b=b"b" * 100, c=b"c" * 100)
+    path_a = await cache.get("a.webp", storage)
+    path_b = await cache.get("b.webp", storage)
+    cache.release(path_b)
+
+    # a давнее b, но его еще отдают: вытесняется b
+    cache.release(await cache.get("c.webp", storage))
+
+    assert os.path.exists(path_a) and not os.path.exists(path_b)
+    assert cache.stats()["pinned"] == 1
+
+
+@pytest.mark.asyncio
+async def test_response_releases_file_after_sending(cache, storage):
+    await put(storage, a=b"a" * 100)
+    path = await cache.get("a.webp", storage)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": []}
+    await CachedFileResponse(cache, path)(scope, receive, send)
+
+    assert b"".join(message.get("body", b"") for message in messages) == b"a" * 100
+    assert cache.stats()["pinned"] == 0
+
+
+@pytest.mark.asyncio
+async def test_large_object_is_not_cached(cache, storage):
+    await put(storage, big=b"x" * 201)
+
+    assert await cache.get("big.webp", storage) is None
+    assert cache.stats()["bypassed"] == 1
+    assert cache.stats()["files"] == 0
+
+
+@pytest.mark.asyncio
+async def test_missing_object_is_remembered(cache, storage):
+    for _ in range(3):
+        with pytest.raises(HTTPException) as error:
+            await cache.get("missing.avif", storage)
+        assert error.value.status_code == 404
+
+    assert storage.opened == ["missing.avif"]
+    assert cache.stats()["not_found"] == 2
+
+
+@pytest.mark.asyncio
+async def test_index_survives_restart_in_lru_order(tmp_path, cache, storage):
+    await put(storage, a=b"a" * 100, b=b"b" * 100)
+    path_a = await cache.get("a.webp", storage)
+    path_b = await cache.get("b.webp", storage)
+    os.utime(path_a, (1000, 1000))
+    os.utime(path_b, (2000, 2000))
+    # Недокачанный файл удаляется при загрузке индекса
+    open(os.path.join(cache.directory, "partial.webp.tmp-1"), "wb").close()
+
+    restarted = MediaCache(cache.directory, max_bytes=150, max_object_size=100)
+    await restarted.get("b.webp", storage)
+
+    assert sorted(os.listdir(cache.directory)) == [os.path.basename(path_b)]
+    assert storage.opened == ["a.webp", "b.webp"]
+
+
+def test_content_keys_are_recognised():
+    digest = "0123456789abcdef" * 4
+
+    assert is_content_key(f"Boards/{digest}.webp")
+    assert is_content_key(f"Boards/{digest}_w400.webp")
+    assert not is_content_key("Users/avatar.webp")
@@ -0,0 +1,100 @@
+import os
+import time
+
+import pytest
+from sqlalchemy import select
+
+from backend.src.conf.local_storage import LocalStorageManager
+from media_cleanup import MediaCleaner, referenced_keys
+from models import ImageBoard, PendingDeletion, StoredBlob
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+        def __init__(self):
+            super().__init__()
+            self.broken_keys = set()
+
+        async def delete_objects(self, keys):
+            keys = list(keys)
+            failed = await super().delete_objects(key for key in keys if key not in self.broken_keys)
+            return failed + [key for key in keys if key in self.broken_keys]
+
+    return Storage()
+
+
+async def put(storage, *keys, age=0):
+    await storage.put_objects({key: b"x" for key in keys}, "image/webp")
+    for key in keys:
+        modified = time.time() - age
+        os.utime(storage._path(key), (modified, modified))
+
+
+async def queued(session, keys):
+    return set(await session.scalars(select(PendingDeletion.key).where(PendingDeletion.key.in_(keys))))
+
+
+@pytest.mark.asyncio
+async def test_referenced_keys_include_variants(rollback_session, make_task):
+    _, task = await make_task()
+    board_id = (await task.awaitable_attrs.todo_list).board_id
+    rollback_session.add_all([
+        StoredBlob(key="Boards/blob.webp", ref_count=1, variants={"160": "Boards/blob_w160.webp"}),
+        ImageBoard(file="Boards/image.webp", variants={"400": "Boards/image_w400.webp"}, board_id=board_id),
+    ])
+    await rollback_session.flush()
+
+    keys = ["Boards/blob.webp", "Boards/blob_w160.webp", "Boards/image.webp", "Boards/image_w400.webp", "Boards/gone.webp"]
+
+    assert await referenced_keys(keys, rollback_session) == set(keys[:4])
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_only_unreferenced_objects(rollback_session, rollback_session_maker, storage):
+    keys = ["Boards/old.webp", "Boards/reused.webp"]
+    await put(storage, *keys)
+    rollback_session.add_all([PendingDeletion(key=key) for key in keys])
+    # Файл загрузили снова, пока он ждал удаления
+    rollback_session.add(StoredBlob(key="Boards/reused.webp", ref_count=1))
+    await rollback_session.commit()
+
+    purged = await MediaCleaner(rollback_session_maker, storage, batch_size=1).purge()
+
+    assert purged == 2
+    assert await storage.object_size("Boards/old.webp") is None
+    assert await storage.object_size("Boards/reused.webp") == 1
+    assert await queued(rollback_session, keys) == set()
+
+
+@pytest.mark.asyncio
+async def test_failed_deletions_stay_queued(rollback_session, rollback_session_maker, storage):
+    keys = ["Boards/a.webp", "Boards/b.webp"]
+    await put(storage, *keys)
+    storage.broken_keys.add("Boards/b.webp")
+    rollback_session.add_all([PendingDeletion(key=key) for key in keys])
+    await rollback_session.commit()
+
+    cleaner = MediaCleaner(rollback_session_maker, storage)
+
+    assert await cleaner.purge_once() == (2, 1)
+    assert await queued(rollback_session, keys) == {"Boards/b.webp"}
+
+
+@pytest.mark.asyncio
+async def test_old_unreferenced_objects_are_queued(rollback_session, rollback_session_maker, storage):
+    await put(storage, "Boards/orphan.webp", "Boards/kept.webp", age=7200)
+    await put(storage, "Boards/fresh.webp")
+    rollback_session.add(StoredBlob(key="Boards/kept.webp", ref_count=1))
+    await rollback_session.commit()
+
+    cleaner = MediaCleaner(rollback_session_maker, storage, grace_period=3600)
+
+    assert await cleaner.collect_orphans() == 1
+    # Повторный проход не дублирует записи очереди
+    assert await cleaner.collect_orphans() == 0
+    assert await queued(rollback_session, ["Boards/orphan.webp", "Boards/kept.webp", "Boards/fresh.webp"]) == {
+        "Boards/orphan.webp"
+    }
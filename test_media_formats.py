@@ -0,0 +1,115 @@
+import io
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import router_image
+from auth.middlewares.jwt.service import check_access_token
+from backend.src.conf.image_transcoder import EncodingPreset, ImageTranscoder, avif_supported, transcode_to_webp_variants
+from backend.src.conf.local_storage import LocalStorageManager
+from config import settings
+from router_image import accepts_media_type, media_candidates
+
+DIGEST = "ab" * 32
+
+
+@pytest.mark.parametrize("accept, accepted", [
+    ("image/avif,image/webp,*/*", True),
+    ("IMAGE/AVIF;q=0.8", True),
+    ("image/avif;q=0", False),
+    ("image/avif;q=oops", False),
+    ("image/*,*/*;q=0.8", False),
+    ("", False),
+])
+def test_accepts_media_type(accept, accepted):
+    assert accepts_media_type(accept, "image/avif") is accepted
+
+
+def test_avif_is_preferred_only_for_webp():
+    assert media_candidates("Boards/a.webp", "image/avif") == ["Boards/a.avif", "Boards/a.webp"]
+    assert media_candidates("Boards/a.webp", "image/webp") == ["Boards/a.webp"]
+    assert media_candidates("Boards/a.png", "image/avif") == ["Boards/a.png"]
+
+
+def test_presets_are_chosen_by_directory(tmp_path):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+        encoding_presets = {"Users": EncodingPreset(quality=50, method=6)}
+
+    storage = Storage()
+
+    assert storage.encoding_preset("Users/a.webp") == EncodingPreset(quality=50, method=6)
+    assert storage.encoding_preset("Boards/a.webp") == EncodingPreset()
+
+
+def test_lower_quality_preset_gives_smaller_files():
+    image = Image.effect_noise((256, 256), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+
+    high = transcode_to_webp_variants(output.getvalue(), (), preset=EncodingPreset(quality=95))[0]
+    low = transcode_to_webp_variants(output.getvalue(), (), preset=EncodingPreset(quality=30))[0]
+
+    assert len(low) < len(high)
+
+
+def test_avif_request_without_codec_falls_back_to_webp(caplog):
+    transcoder = ImageTranscoder(max_workers=1)
+    transcoder._avif_supported = False
+
+    with caplog.at_level(logging.WARNING):
+        for _ in range(2):
+            assert transcoder._checked_preset(EncodingPreset(avif=True)) == EncodingPreset(avif=False)
+
+    assert len([record for record in caplog.records if "AVIF" in record.message]) == 1
+
+
+@pytest.mark.skipif(not avif_supported(), reason="Pillow has no AVIF codec")
+def test_avif_versions_are_encoded_for_every_width():
+    output = io.BytesIO()
+    Image.new("RGB", (800, 400), "red").save(output, format="PNG")
+
+    _, _, _, avif = transcode_to_webp_variants(output.getvalue(), (400,), preset=EncodingPreset(avif=True))
+
+    assert sorted(avif) == [400, 800]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    storage = Storage()
+    monkeypatch.setattr(router_image, "media_storage", storage)
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_ACCEL_PREFIX", None)
+    (tmp_path / "Boards").mkdir()
+    (tmp_path / "Boards" / f"{DIGEST}.webp").write_bytes(b"webp")
+    (tmp_path / "Boards" / f"{DIGEST}.avif").write_bytes(b"avif")
+    (tmp_path / "Boards" / "old.webp").write_bytes(b"old webp")
+
+    app = FastAPI()
+    app.include_router(router_image.router)
+    # Проверка токена покрыта отдельно; здесь важен только выбор файла
+    app.dependency_overrides[check_access_token] = lambda: None
+    return TestClient(app)
+
+
+def test_media_is_negotiated_by_accept(client):
+    avif = client.get(f"/image/media/Boards/{DIGEST}.webp", headers={"Accept": "image/avif,image/webp"})
+    webp = client.get(f"/image/media/Boards/{DIGEST}.webp", headers={"Accept": "image/webp"})
+
+    assert (avif.content, avif.headers["content-type"]) == (b"avif", "image/avif")
+    assert (webp.content, webp.headers["content-type"]) == (b"webp", "image/webp")
+    assert avif.headers["vary"] == webp.headers["vary"] == "Accept"
+    assert "immutable" in avif.headers["cache-control"]
+
+
+def test_missing_avif_falls_back_to_webp(client):
+    response = client.get("/image/media/Boards/old.webp", headers={"Accept": "image/avif"})
+
+    assert response.content == b"old webp"
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert client.get("/image/media/Boards/missing.webp").status_code == 404
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.src.conf import storage_backend
+from backend.src.conf.local_storage import LocalStorageManager
+from config import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Подменяется модуль time только в storage_backend, а не часы event loop
+    monkeypatch.setattr(storage_backend, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def storage(tmp_path):
+    class PrivateStorage(LocalStorageManager):
+        """
+        Хранилище без постоянных URL: каждая ссылка подписывается.
+        """
+        root_dir = str(tmp_path)
+
+        def __init__(self):
+            super().__init__()
+            self.sign_calls = []
+
+        def storage_url(self, key):
+            return None
+
+        async def _sign_urls(self, keys, expiration):
+            self.sign_calls.append(list(keys))
+            return {key: f"https://s3/{key}?v={len(self.sign_calls)}&e={expiration}" for key in keys}
+
+    return PrivateStorage()
+
+
+@pytest.mark.asyncio
+async def test_keys_are_signed_in_one_batch(storage, clock):
+    urls = await storage.generate_urls(["a", "b", None, "a", "", "c"])
+
+    assert storage.sign_calls == [["a", "b", "c"]]
+    assert list(urls) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_signed_url_is_reused_for_half_its_lifetime(storage, clock):
+    first = await storage.generate_url("a", expiration=600)
+    clock.now += 299
+    assert await storage.generate_url("a", expiration=600) == first
+
+    # Ссылка с другим сроком подписывается отдельно
+    assert await storage.generate_url("a", expiration=60) != first
+
+    clock.now += 1
+    assert await storage.generate_url("a", expiration=600) != first
+    assert storage.sign_calls == [["a"], ["a"], ["a"]]
+
+
+@pytest.mark.asyncio
+async def test_only_missing_keys_are_signed(storage, clock):
+    await storage.generate_urls(["a", "b"])
+    await storage.generate_urls(["a", "b", "c"])
+
+    assert storage.sign_calls == [["a", "b"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded(storage, clock, monkeypatch):
+    monkeypatch.setattr(settings, "S3_URL_CACHE_SIZE", 2)
+
+    await storage.generate_urls(["a", "b"])
+    await storage.generate_urls(["c"])
+
+    assert [key for key, _ in storage._url_cache] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_permanent_urls_are_not_signed(tmp_path, monkeypatch):
+    class PublicStorage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    storage = PublicStorage()
+    assert await storage.generate_urls(["Boards/a.webp"]) == {"Boards/a.webp": "/image/media/Boards/a.webp"}
+
+    monkeypatch.setattr(storage, "media_proxy_prefix", "/proxy/")
+    assert await storage.generate_url("Boards/a.webp") == "/proxy/Boards/a.webp"
+    assert await storage.generate_url("Boards/a.webp", direct=True) == "/image/media/Boards/a.webp"
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import uuid
+
+import pytest
+import pytest_asyncio
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from alembic.script import ScriptDirectory
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from config import settings
+from database import ALEMBIC_INI_PATH, DATABASE_URL, MIGRATIONS_PATH, check_schema_is_current
+from models import Base
+
+
+def script_directory() -> ScriptDirectory:
+    alembic_config = AlembicConfig(ALEMBIC_INI_PATH)
+    alembic_config.set_main_option("script_location", MIGRATIONS_PATH)
+    return ScriptDirectory.from_config(alembic_config)
+
+
+def test_migrations_have_single_head():
+    assert len(script_directory().get_heads()) == 1
+
+
+@pytest.mark.asyncio
+async def test_migrated_schema_matches_models(rollback_session):
+    connection = await rollback_session.connection()
+
+    await check_schema_is_current(connection.engine)
+    diff = await connection.run_sync(
+        lambda sync_connection: compare_metadata(MigrationContext.configure(sync_connection), Base.metadata)
+    )
+
+    assert diff == []
+
+
+@pytest_asyncio.fixture
+async def scratch_schema():
+    """
+    Соединение с search_path на временной схеме: ревизии с CONCURRENTLY
+    выполняются вне транзакции, поэтому откатить их нельзя, и схема удаляется.
+    """
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    schema = f"test_{uuid.uuid4().hex}"
+    try:
+        connection = await engine.connect()
+    except (OSError, SQLAlchemyError) as e:
+        await engine.dispose()
+        pytest.skip(f"Database is not available: {e}")
+    try:
+        await connection.exec_driver_sql(f"CREATE SCHEMA {schema}")
+        await connection.exec_driver_sql(f"SET search_path TO {schema}")
+        await connection.commit()
+        yield connection
+    finally:
+        await connection.rollback()
+        await connection.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+        await connection.commit()
+        await connection.close()
+        await engine.dispose()
+
+
+async def run_upgrade(connection, module) -> None:
+    def upgrade(sync_connection):
+        context = MigrationContext.configure(sync_connection)
+        with Operations.context(context), context.begin_transaction():
+            module.upgrade()
+
+    await connection.run_sync(upgrade)
+
+
+async def index_is_valid(connection, name: str):
+    result = await connection.exec_driver_sql(f"SELECT indisvalid FROM pg_index WHERE indexrelid = '{name}'::regclass")
+    return result.scalar()
+
+
+async def make_invalid_index(connection, table: str, name: str, column: str) -> None:
+    """
+    Индекс в том состоянии, в котором его оставляет прерванный CREATE INDEX CONCURRENTLY.
+    """
+    await connection.exec_driver_sql(f"CREATE TABLE {table} ({column} text)")
+    await connection.exec_driver_sql(f"CREATE INDEX {name} ON {table} ({column})")
+    await connection.exec_driver_sql(f"UPDATE pg_index SET indisvalid = false WHERE indexrelid = '{name}'::regclass")
+    await connection.commit()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_index_build_is_redone(scratch_schema, monkeypatch):
+    module = script_directory().get_revision("8a4d2c6e1f93").module
+    await make_invalid_index(scratch_schema, "todolists", "ix_todolists_deadline", "deadline")
+    monkeypatch.setattr(module, "INDEXES", [module.INDEXES[0]])
+
+    await run_upgrade(scratch_schema, module)
+
+    assert await index_is_valid(scratch_schema, "ix_todolists_deadline")
+
+
+@pytest.mark.asyncio
+async def test_interrupted_email_index_build_is_redone(scratch_schema):
+    module = script_directory().get_revision("c7e5a9d3b812").module
+    await make_invalid_index(scratch_schema, "users", "uq_users_email_lower", "email")
+
+    await run_upgrade(scratch_schema, module)
+
+    assert await index_is_valid(scratch_schema, "uq_users_email_lower")
+
+
+async def legacy_images(connection, *keys):
+    await connection.exec_driver_sql("CREATE TABLE images (file text)")
+    await connection.exec_driver_sql("CREATE TABLE imageboards (file text)")
+    for key in keys:
+        table = "images" if key.startswith("Users/") else "imageboards"
+        await connection.exec_driver_sql(f"INSERT INTO {table} VALUES ('{key}')")
+    await connection.commit()
+
+
+async def image_files(connection):
+    result = await connection.exec_driver_sql("SELECT file FROM images UNION ALL SELECT file FROM imageboards")
+    return sorted(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_rekey_renames_files_in_local_storage(scratch_schema, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(settings, "LOCAL_STORAGE_DIR", str(tmp_path))
+    (tmp_path / "Users").mkdir()
+    (tmp_path / "Users" / "avatar_3.webp").write_bytes(b"avatar")
+    await legacy_images(scratch_schema, "Users/avatar_3.webp", "Boards/missing.webp")
+
+    await run_upgrade(scratch_schema, script_directory().get_revision("e2b8f4a61c05").module)
+
+    new_key = f"Users/{hashlib.sha256(b'avatar').hexdigest()}.webp"
+    assert await image_files(scratch_schema) == ["Boards/missing.webp", new_key]
+    assert os.listdir(tmp_path / "Users") == [os.path.basename(new_key)]
+
+
+@pytest.mark.asyncio
+async def test_rekey_is_skipped_for_unknown_storage(scratch_schema, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "ftp")
+    await legacy_images(scratch_schema, "Users/avatar_3.webp")
+
+    await run_upgrade(scratch_schema, script_directory().get_revision("e2b8f4a61c05").module)
+
+    assert await image_files(scratch_schema) == ["Users/avatar_3.webp"]
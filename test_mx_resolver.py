@@ -0,0 +1,107 @@
+import asyncio
+import socket
+import threading
+import time
+
+import dns.exception
+import dns.message
+import dns.rcode
+import dns.rrset
+import pytest
+
+from auth.mx_resolver import MXResolver
+from auth.transport import router_reg
+
+
+class StubNameserver:
+    """
+    DNS-сервер на UDP для тестов: example.com - с MX, nomx.example.com - без
+    записей, servfail.example.com - SERVFAIL, остальные домены - NXDOMAIN.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            data, address = self.sock.recvfrom(4096)
+            query = dns.message.from_wire(data)
+            name = query.question[0].name.to_text()
+            self.queries.append(name)
+            # Ответ с задержкой, чтобы одновременные запросы успели встретиться
+            time.sleep(0.05)
+            response = dns.message.make_response(query)
+            if name == "example.com.":
+                response.answer.append(dns.rrset.from_text(name, 120, "IN", "MX", "5 mx.example.com."))
+            elif name == "servfail.example.com.":
+                response.set_rcode(dns.rcode.SERVFAIL)
+            elif name != "nomx.example.com.":
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            self.sock.sendto(response.to_wire(), address)
+
+
+@pytest.fixture(scope="module")
+def nameserver():
+    return StubNameserver()
+
+
+@pytest.fixture
+def resolver(nameserver):
+    nameserver.queries.clear()
+    return MXResolver(nameservers=["127.0.0.1"], port=nameserver.port, timeout=1, positive_ttl=60, negative_ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_answers(resolver):
+    assert await resolver.has_mx("example.com")
+    assert not await resolver.has_mx("nomx.example.com")
+    assert not await resolver.has_mx("missing.example.com")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_query(resolver, nameserver):
+    results = await asyncio.gather(*(resolver.has_mx("example.com") for _ in range(20)))
+
+    assert all(results)
+    assert nameserver.queries == ["example.com."]
+
+
+@pytest.mark.asyncio
+async def test_answers_are_cached_case_insensitively(resolver, nameserver):
+    await resolver.has_mx("example.com")
+    await resolver.has_mx("missing.example.com")
+
+    assert await resolver.has_mx("EXAMPLE.com.")
+    assert not await resolver.has_mx("missing.example.com")
+    assert nameserver.queries == ["example.com.", "missing.example.com."]
+
+
+@pytest.mark.asyncio
+async def test_positive_answer_is_cached_for_record_ttl(nameserver):
+    resolver = MXResolver(nameservers=["127.0.0.1"], port=nameserver.port, timeout=1, positive_ttl=3600)
+
+    await resolver.has_mx("example.com")
+    expires_at, _ = resolver._cache["example.com"]
+
+    assert 60 < expires_at - time.monotonic() <= 120
+
+
+@pytest.mark.asyncio
+async def test_server_failure_raises_and_is_not_cached(resolver, nameserver):
+    with pytest.raises(dns.exception.DNSException):
+        await resolver.has_mx("servfail.example.com")
+
+    assert "servfail.example.com" not in resolver._cache
+
+
+@pytest.mark.asyncio
+async def test_email_domain_check_fails_open_on_dns_errors(resolver, monkeypatch):
+    monkeypatch.setattr(router_reg, "mx_resolver", resolver)
+
+    assert await router_reg.is_valid_email_domain("user@example.com")
+    assert not await router_reg.is_valid_email_domain("user@missing.example.com")
+    assert await router_reg.is_valid_email_domain("user@servfail.example.com")
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from database import update_task
+from models import Notification, User, board_collaborators, user_notification_association
+from notification_planner import plan_task_reminders, reschedule_task_reminders
+
+
+async def reminders(session, task_id):
+    result = await session.execute(
+        select(Notification.send_at, func.count(user_notification_association.c.user_id))
+        .join(user_notification_association, user_notification_association.c.notification_id == Notification.id)
+        .where(Notification.task_id == task_id, Notification.sent.is_(False))
+        .group_by(Notification.send_at)
+        .order_by(Notification.send_at)
+    )
+    return result.all()
+
+
+@pytest.mark.asyncio
+async def test_members_with_same_lead_share_one_notification(rollback_session, make_task):
+    deadline = datetime.now().replace(microsecond=0) + timedelta(days=3)
+    owner, task = await make_task(lead_minutes=60)
+    collaborator = User(username="c", email=f"c-{owner.email}", password="x", reminder_lead_minutes=60)
+    early_bird = User(username="e", email=f"e-{owner.email}", password="x", reminder_lead_minutes=24 * 60)
+    rollback_session.add_all([collaborator, early_bird])
+    await rollback_session.flush()
+    board_id = (await task.awaitable_attrs.todo_list).board_id
+    await rollback_session.execute(board_collaborators.insert().values([
+        {"user_id": collaborator.id, "board_id": board_id},
+        {"user_id": early_bird.id, "board_id": board_id},
+    ]))
+
+    planned = await plan_task_reminders(task.id, task.title, deadline, board_id, rollback_session)
+
+    assert planned == 2
+    assert await reminders(rollback_session, task.id) == [
+        (deadline - timedelta(days=1), 1),
+        (deadline - timedelta(hours=1), 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reminders_in_the_past_are_skipped(rollback_session, make_task):
+    _, task = await make_task(lead_minutes=60)
+    board_id = (await task.awaitable_attrs.todo_list).board_id
+
+    planned = await plan_task_reminders(
+        task.id, task.title, datetime.now() + timedelta(minutes=30), board_id, rollback_session
+    )
+
+    assert planned == 0
+
+
+@pytest.mark.asyncio
+async def test_reschedule_uses_list_deadline_when_task_has_none(rollback_session, make_task):
+    list_deadline = datetime.now().replace(microsecond=0) + timedelta(days=3)
+    _, task = await make_task(list_deadline=list_deadline, lead_minutes=60)
+
+    assert await reschedule_task_reminders([task.id], rollback_session) == 1
+    assert await reminders(rollback_session, task.id) == [(list_deadline - timedelta(hours=1), 1)]
+
+
+@pytest.mark.asyncio
+async def test_update_task_replans_on_deadline_change_completion_and_reopen(rollback_session, make_task):
+    _, task = await make_task(lead_minutes=60)
+    deadline = datetime.now().replace(microsecond=0) + timedelta(days=3)
+
+    await update_task(task.id, None, deadline, None, rollback_session)
+    assert len(await reminders(rollback_session, task.id)) == 1
+
+    await update_task(task.id, None, deadline + timedelta(days=1), None, rollback_session)
+    assert await reminders(rollback_session, task.id) == [(deadline + timedelta(days=1) - timedelta(hours=1), 1)]
+
+    await update_task(task.id, None, None, True, rollback_session)
+    assert await reminders(rollback_session, task.id) == []
+
+    await update_task(task.id, None, None, False, rollback_session)
+    assert len(await reminders(rollback_session, task.id)) == 1
+
+
+@pytest.mark.asyncio
+async def test_reminder_text_is_in_russian(rollback_session, make_task):
+    deadline = datetime(2100, 3, 5, 18, 30)
+    _, task = await make_task(lead_minutes=60)
+    board_id = (await task.awaitable_attrs.todo_list).board_id
+
+    await plan_task_reminders(task.id, task.title, deadline, board_id, rollback_session)
+
+    message = await rollback_session.scalar(select(Notification.message).where(Notification.task_id == task.id))
+    assert message == 'Задача "Test task" должна быть выполнена к 05.03 18:30. Доска: Test board'
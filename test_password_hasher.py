@@ -0,0 +1,80 @@
+import hashlib
+
+import pytest
+
+from auth.password_hasher import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(algorithm="bcrypt", cost=4, max_workers=2)
+    yield hasher
+    hasher.close()
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        PasswordHasher(algorithm="md5")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("algorithm, cost", [("bcrypt", 4), ("scrypt", 10)])
+async def test_hash_and_verify(algorithm, cost):
+    hasher = PasswordHasher(algorithm=algorithm, cost=cost, max_workers=1)
+    try:
+        hashed = await hasher.hash("secret")
+
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+        assert not hasher.needs_rehash(hashed)
+    finally:
+        hasher.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_sha256_hash_is_verified_and_needs_rehash(hasher):
+    legacy = hashlib.sha256(b"secret").hexdigest()
+
+    assert await hasher.verify("secret", legacy)
+    assert not await hasher.verify("wrong", legacy)
+    assert hasher.needs_rehash(legacy)
+    assert hasher.stats()["legacy_verifications"] == 2
+
+
+@pytest.mark.asyncio
+async def test_hash_with_other_cost_or_algorithm_needs_rehash(hasher):
+    stronger = PasswordHasher(algorithm="bcrypt", cost=5, max_workers=1)
+    scrypt = PasswordHasher(algorithm="scrypt", cost=10, max_workers=1)
+    try:
+        assert hasher.needs_rehash(await stronger.hash("secret"))
+        assert hasher.needs_rehash(await scrypt.hash("secret"))
+        assert scrypt.needs_rehash(await hasher.hash("secret"))
+    finally:
+        stronger.close()
+        scrypt.close()
+
+
+@pytest.mark.asyncio
+async def test_empty_or_corrupted_hash_does_not_verify(hasher):
+    assert not await hasher.verify("secret", "")
+    assert not await hasher.verify("secret", "$2b$04$broken")
+
+
+@pytest.mark.asyncio
+async def test_dummy_hash_is_created_once_and_matches_nothing(hasher):
+    dummy = await hasher.dummy_hash()
+
+    assert await hasher.dummy_hash() == dummy
+    assert not hasher.needs_rehash(dummy)
+    assert not await hasher.verify("", dummy)
+
+
+@pytest.mark.asyncio
+async def test_stats_count_pool_operations(hasher):
+    hashed = await hasher.hash("secret")
+    await hasher.verify("secret", hashed)
+
+    stats = hasher.stats()
+    assert stats["operations"] == 2
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert stats["max_hash_seconds"] > 0
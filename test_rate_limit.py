@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Подменяется модуль time только в rate_limit, а не часы event loop
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_takes_what_is_available(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+
+    assert await bucket.acquire_up_to(3) == 3
+    assert await bucket.acquire_up_to(10) == 2
+    assert not bucket.try_acquire()
+
+    clock.now += 2
+    assert await bucket.acquire_up_to(10) == 2
+
+
+def test_token_bucket_refill_and_release_are_capped(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert bucket.try_acquire(3)
+
+    clock.now += 100
+    assert not bucket.try_acquire(4)
+    assert bucket.try_acquire(3)
+
+    bucket.release(10)
+    assert bucket.try_acquire(3)
+    assert not bucket.try_acquire()
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_tokens_does_not_hold_the_lock():
+    bucket = TokenBucket(rate=20, capacity=1)
+    assert bucket.try_acquire()
+
+    waiters = asyncio.gather(bucket.acquire_up_to(1), bucket.acquire_up_to(1))
+    await asyncio.sleep(0.01)
+    assert not bucket._lock.locked()
+
+    assert await asyncio.wait_for(waiters, timeout=1) == [1, 1]
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from config import settings
+from models import Notification, OutboxEmail, user_notification_association
+from router_notification import check_and_send_notifications
+
+
+async def add_due_notifications(session, make_task, messages):
+    user, task = await make_task()
+    notification_ids = []
+    for message in messages:
+        notification = Notification(task_id=task.id, message=message, send_at=datetime.now() - timedelta(minutes=1))
+        session.add(notification)
+        await session.flush()
+        notification_ids.append(notification.id)
+    await session.execute(insert(user_notification_association).values([
+        {"user_id": user.id, "notification_id": notification_id} for notification_id in notification_ids
+    ]))
+    await session.commit()
+    return user.email, notification_ids
+
+
+async def outbox_for(session, email):
+    result = await session.execute(select(OutboxEmail).where(OutboxEmail.recipient == email))
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_digest_sends_one_email_per_recipient(rollback_session, make_task, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_ENABLED", True)
+    email, notification_ids = await add_due_notifications(rollback_session, make_task, ["first reminder", "second reminder"])
+
+    await check_and_send_notifications(rollback_session)
+
+    emails = await outbox_for(rollback_session, email)
+    assert len(emails) == 1
+    assert emails[0].subject == "Приближаются дедлайны: 2"
+    assert "first reminder" in emails[0].body and "second reminder" in emails[0].body
+    sent = await rollback_session.scalars(select(Notification.sent).where(Notification.id.in_(notification_ids)))
+    assert all(sent)
+
+
+@pytest.mark.asyncio
+async def test_without_digest_every_reminder_is_a_separate_email(rollback_session, make_task, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_ENABLED", False)
+    email, _ = await add_due_notifications(rollback_session, make_task, ["first reminder", "second reminder"])
+
+    await check_and_send_notifications(rollback_session)
+
+    assert len(await outbox_for(rollback_session, email)) == 2
+
+
+@pytest.mark.asyncio
+async def test_sent_reminders_are_not_sent_again(rollback_session, make_task, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_ENABLED", True)
+    email, _ = await add_due_notifications(rollback_session, make_task, ["only reminder"])
+
+    await check_and_send_notifications(rollback_session)
+    await check_and_send_notifications(rollback_session)
+
+    assert len(await outbox_for(rollback_session, email)) == 1
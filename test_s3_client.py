@@ -0,0 +1,67 @@
+import pytest
+
+from backend.src.conf.s3_client import S3AsyncClient
+from config import settings
+
+
+class FakeClientContext:
+    def __init__(self, counters):
+        self.counters = counters
+        self.client = object()
+
+    async def __aenter__(self):
+        self.counters["opened"] += 1
+        return self.client
+
+    async def __aexit__(self, *exc_info):
+        self.counters["closed"] += 1
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    counters = {"opened": 0, "closed": 0}
+    monkeypatch.setattr(S3AsyncClient, "_create_client", lambda self: FakeClientContext(counters))
+    yield counters
+    S3AsyncClient._shared_client = None
+    S3AsyncClient._shared_client_context = None
+
+
+@pytest.mark.parametrize("endpoint, url, use_ssl", [
+    ("s3.example.com", "http://s3.example.com", False),
+    ("http://minio:9000/", "http://minio:9000", False),
+    ("https://s3.example.com", "https://s3.example.com", True),
+])
+def test_endpoint_url(monkeypatch, endpoint, url, use_ssl):
+    monkeypatch.setattr(settings, "S3_ENDPOINT", endpoint)
+
+    client = S3AsyncClient()
+
+    assert client.endpoint_url == url
+    assert client.use_ssl is use_ssl
+
+
+@pytest.mark.asyncio
+async def test_without_shared_client_each_operation_opens_its_own(counters):
+    storage = S3AsyncClient()
+
+    async with storage.client:
+        pass
+    async with storage.client:
+        pass
+
+    assert counters == {"opened": 2, "closed": 2}
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_opened_once_and_reused(counters):
+    storage, other = S3AsyncClient(), S3AsyncClient()
+    await storage.start()
+    await storage.start()
+
+    async with storage.client as first, other.client as second:
+        assert first is second
+    assert counters == {"opened": 1, "closed": 0}
+
+    await storage.close()
+    assert counters == {"opened": 1, "closed": 1}
+    assert S3AsyncClient._shared_client is None
@@ -0,0 +1,93 @@
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from backend.src.conf.local_storage import LocalStorageManager
+from config import settings
+from upload_limits import UploadSizeLimitMiddleware
+
+LIMIT = 1024
+BOUNDARY = "testboundary"
+
+
+def multipart(content: bytes) -> bytes:
+    return (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n'
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/boards/{board_id}/upload": LIMIT})
+
+    @app.post("/boards/{board_id}/upload")
+    async def upload(file: UploadFile):
+        return {"size": len(await file.read())}
+
+    @app.post("/attachments")
+    async def attachment(file: UploadFile):
+        return {"size": len(await file.read())}
+
+    @app.post("/json")
+    async def json_body(payload: dict):
+        return {"keys": len(payload)}
+
+    return TestClient(app)
+
+
+def post(client, body, chunked=False, url="/boards/1/upload"):
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    # Генератор передается без Content-Length (Transfer-Encoding: chunked)
+    content = iter([body[i:i + 256] for i in range(0, len(body), 256)]) if chunked else body
+    return client.post(url, content=content, headers=headers)
+
+
+def test_small_upload_passes(client):
+    response = post(client, multipart(b"x" * 100))
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_declared_oversized_body_is_rejected_before_reading(client):
+    response = post(client, multipart(b"x" * LIMIT))
+
+    assert response.status_code == 413
+
+
+def test_chunked_oversized_body_is_cut_off(client):
+    assert post(client, multipart(b"x" * 100), chunked=True).status_code == 200
+    assert post(client, multipart(b"x" * LIMIT), chunked=True).status_code == 413
+
+
+def test_routes_without_limit_are_not_limited(client):
+    response = post(client, multipart(b"x" * LIMIT * 2), url="/attachments")
+
+    assert response.json() == {"size": LIMIT * 2}
+
+
+def test_non_multipart_bodies_are_not_limited(client):
+    payload = {f"key{i}": "x" * 100 for i in range(20)}
+
+    assert client.post("/json", json=payload).json() == {"keys": 20}
+
+
+@pytest.mark.asyncio
+async def test_read_chunks_stops_at_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 100)
+
+    class Storage(LocalStorageManager):
+        root_dir = str(tmp_path)
+
+    storage = Storage()
+    chunks = []
+    with pytest.raises(HTTPException) as error:
+        async for chunk in storage._read_chunks(UploadFile(io.BytesIO(b"x" * 1000)), 250):
+            chunks.append(chunk)
+
+    assert error.value.status_code == 413
+    assert [len(chunk) for chunk in chunks] == [100, 100]
@@ -0,0 +1,61 @@
+import uuid
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from database import email_exists, get_emails_after, get_user_credentials
+from models import User
+
+
+async def add_user(session, email):
+    user = User(username="login", email=email, password="hash")
+    session.add(user)
+    await session.commit()
+    return user
+
+
+@pytest.mark.asyncio
+async def test_credentials_are_found_case_insensitively(rollback_session):
+    email = f"Login-{uuid.uuid4().hex}@Example.com"
+    user = await add_user(rollback_session, email)
+
+    credentials = await get_user_credentials(email.upper(), rollback_session)
+
+    assert tuple(credentials) == (user.id, "hash")
+    assert await email_exists(email.lower(), rollback_session)
+    assert await get_user_credentials(f"missing-{email}", rollback_session) is None
+    assert not await email_exists(f"missing-{email}", rollback_session)
+
+
+@pytest.mark.asyncio
+async def test_emails_differing_only_in_case_are_rejected(rollback_session):
+    email = f"dup-{uuid.uuid4().hex}@example.com"
+    await add_user(rollback_session, email)
+
+    with pytest.raises(IntegrityError):
+        await add_user(rollback_session, email.upper())
+
+
+@pytest.mark.asyncio
+async def test_login_query_uses_lower_email_index(rollback_session):
+    await rollback_session.execute(text("SET LOCAL enable_seqscan = off"))
+    query = select(User.id, User.password).where(func.lower(User.email) == "someone@example.com")
+    compiled = query.compile(rollback_session.bind, compile_kwargs={"literal_binds": True})
+
+    plan = "\n".join((await rollback_session.execute(text(f"EXPLAIN {compiled}"))).scalars())
+
+    assert "uq_users_email_lower" in plan
+
+
+@pytest.mark.asyncio
+async def test_emails_after_returns_newer_lowercased_emails(rollback_session):
+    email = f"After-{uuid.uuid4().hex}@Example.com"
+    user = await add_user(rollback_session, email)
+
+    last_id, emails = await get_emails_after(user.id - 1, rollback_session)
+
+    assert email.lower() in emails
+    assert all(address == address.lower() for address in emails)
+    assert last_id >= user.id
+    assert await get_emails_after(last_id, rollback_session) == (last_id, [])
@@ -0,0 +1,68 @@
+from typing import Dict, Optional
+
+from starlette.exceptions import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Запас на границы и заголовки частей формы сверх размера самого файла
+FORM_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI-middleware, ограничивающее размер тела multipart-запросов к
+    маршрутам из limits: шаблон пути (как в роутере, например
+    "/board/main_page/{board_id}/add_image") -> максимальный размер тела.
+    Остальные запросы не ограничиваются.
+
+    Starlette разбирает форму до вызова обработчика и сохраняет файл во
+    временный SpooledTemporaryFile, поэтому лимиты StorageBackend._read_chunks
+    срабатывают уже после приема всего тела. Здесь запрос с Content-Length
+    больше лимита получает 413 до чтения тела, а тело без Content-Length
+    (chunked) обрывается с 413, как только прочитано больше лимита. Принятое
+    тело по-прежнему сохраняется Starlette целиком, но не больше лимита
+    (в памяти - до 1 МБ, остальное на диске).
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = [(compile_path(path)[0], max_body_size) for path, max_body_size in limits.items()]
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for regex, max_body_size in self.limits:
+            if regex.match(path):
+                return max_body_size
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        max_body_size = self._limit_for(scope["path"])
+        if max_body_size is None or not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_body_size:
+            response = PlainTextResponse("Request body too large", status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    # FastAPI пробрасывает HTTPException из разбора тела как есть
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, receive_limited, send)